@@ -0,0 +1,339 @@
+"""
+Parameter Sweep Backtester
+Runs StratergyDirectIOCBoxDynamicStrikes over a grid of params against a
+recorded session, one process per combination, and tabulates the results
+
+Every run gets its own throwaway redis-server (unix socket in a temp dir)
+seeded from the day's reference.json, a ReplayClock and a SimulatedExchange,
+so runs are isolated from each other and never read or write the production
+Redis or shared depth book. Replayed ticks go into an in-process MarketCache
+the strategy reads directly; the private Redis only holds reference data,
+params and order records.
+
+Usage:
+    # once per recorded day, while the production Redis still has the day's mapper (read only)
+    python backtest_sweep.py snapshot --date 20250811
+
+    python backtest_sweep.py run --date 20250811 --grid grid.json [--params base.json]
+                             [--processes 4] [--start-at 09:20] [--end-hour 15]
+                             [--timeout 3600] [--out-dir backtests]
+
+grid.json maps param names to the values to try, e.g.
+    {"itm_steps": [1, 2, 3], "otm_steps": [3, 4], "pricing_method": ["depth", "average"],
+     "depth_index": [0, 1], "case_decision_observation_time": [30, 60]}
+desired_spread/exit_desired_spread follow itm/otm steps as in 4_leg_run.py
+unless the grid sets them.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import orjson
+import pandas as pd
+import redis
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "nuvama", "websocket"))
+
+from clock import ReplayClock  # flat import: TickDataSimulator checks for this ReplayClock class
+from sim_exchange import SimulatedExchange
+from tick_data_utils import TickDataSimulator
+from replay_targets import MarketCache
+
+
+REFERENCE_KEYS = ("lotsizes", "option_mapper")
+
+# 4_leg_run.py's params - the base every grid combination overrides
+DEFAULT_PARAMS = {
+    "action": "BUY",
+    "quantity_multiplier": 1,
+    "slice_multiplier": 1,
+    "user_ids": ["BACKTEST"],
+    "run_state": 0,
+    "order_type": "LIMIT",
+    "IOC_timeout": 0.5,
+    "exit_price_gap": 2,
+    "no_of_bidask_average": 1,
+    "notes": "Backtest",
+    "pricing_method": "depth",
+    "depth_index": 1,
+    "itm_steps": 2,
+    "otm_steps": 4,
+    "symbol": "NIFTY",
+    "expiry": 1,
+    "case_decision_observation_time": 60,
+}
+
+
+def reference_path(base_dir, date_str):
+    return os.path.join(base_dir, date_str, "reference.json")
+
+
+def save_reference(r, path):
+    """Copy the static keys a strategy loads at start (lot sizes, option mapper) into a JSON file"""
+    reference = {}
+    for key in REFERENCE_KEYS:
+        raw = r.get(key)
+        if raw is None:
+            raise RuntimeError(f"{key} missing in redis")
+        reference[key] = orjson.loads(raw)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(reference))
+    return reference
+
+
+def load_reference(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found - run 'backtest_sweep.py snapshot' for the date first")
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+class PrivateRedis:
+    """redis-server listening only on a unix socket in a temp dir, gone when the block exits"""
+
+    def __init__(self, binary="redis-server", start_timeout=10.0):
+        self.binary = binary
+        self.start_timeout = start_timeout
+        self.directory = None
+        self.process = None
+
+    def __enter__(self) -> redis.Redis:
+        self.directory = tempfile.mkdtemp(prefix="backtest_redis_")
+        socket_path = os.path.join(self.directory, "redis.sock")
+        self.process = subprocess.Popen(
+            [self.binary, "--port", "0", "--unixsocket", socket_path, "--save", "", "--appendonly", "no",
+             "--dir", self.directory],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        client = redis.Redis(unix_socket_path=socket_path)
+        deadline = time.time() + self.start_timeout
+        while True:
+            try:
+                client.ping()
+                return client
+            except redis.ConnectionError:
+                if self.process.poll() is not None or time.time() > deadline:
+                    self.__exit__(None, None, None)
+                    raise RuntimeError(f"private redis-server did not start ({self.binary})")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def expand_grid(grid):
+    """Every combination of the grid's values, as dicts, in a stable order"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def build_params(base, combination):
+    params = {**base, **combination}
+    steps = (int(params["itm_steps"]) + int(params["otm_steps"])) / 2
+    if "desired_spread" not in combination:
+        params["desired_spread"] = steps * 100
+    if "exit_desired_spread" not in combination:
+        params["exit_desired_spread"] = steps * 100 + 2
+    params["execution_mode"] = "SIMULATION"  # never LIVE, whatever the base params say
+    return params
+
+
+def summarize_run(exchange, strategy):
+    """Result columns of one run: fills from the exchange, progress from the strategy"""
+    stats = exchange.get_stats()
+    positions = exchange.position_report()
+    row = {
+        "pnl": round(sum(position["pnl"] for position in positions.values()), 2),
+        "open_qty": sum(abs(position["net_qty"]) for position in positions.values()),
+        "orders": stats["orders"],
+        "filled_qty": stats["filled_qty"],
+        "fill_rate": round(stats["fill_rate"], 4),
+        "avg_slippage": round(stats["avg_slippage"], 4),
+        "ioc_expired": stats["ioc_expired"],
+        "rejected": stats["rejected"],
+    }
+    if strategy is not None:
+        row["entry_qty"] = sum(sum(qtys.values()) for qtys in strategy.entry_qtys.values())
+        row["exit_qty"] = sum(sum(qtys.values()) for qtys in strategy.exit_qtys.values())
+        row["completed"] = all(strategy.all_legs_executed.values()) if strategy.all_legs_executed else False
+    return row
+
+
+def run_combination(run_id, combination, params, options, results):
+    """Worker process: replay the day into a private Redis with one strategy instance, report one row"""
+    # the strategy still has debugging breakpoint() calls; terminate() from the parent must clean up redis-server
+    os.environ["PYTHONBREAKPOINT"] = "0"
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+    log_path = os.path.join(options["out_dir"], f"run_{run_id:03d}.log")
+    sys.stdout = sys.stderr = open(log_path, "w", buffering=1)
+
+    row = {"run": run_id, **combination}
+    started = time.time()
+    try:
+        from nuvama.box_with_dynamic_strikes import StratergyDirectIOCBoxDynamicStrikes
+
+        with PrivateRedis(options["redis_server"]) as r:
+            for key, value in options["reference"].items():
+                r.set(key, orjson.dumps(value))
+            clock = ReplayClock()
+            exchange = SimulatedExchange(r, clock=clock)
+            market = MarketCache()
+            simulator = TickDataSimulator(options["base_dir"], clock=clock, exchange=exchange, redis_client=r,
+                                          target=market, option_mapper=options["reference"]["option_mapper"])
+            state = {}
+
+            def start_strategy():
+                strategy = StratergyDirectIOCBoxDynamicStrikes(params, clock=clock, exchange=exchange,
+                                                              redis_client=r, shared_book=False, market=market)
+                state["strategy"] = strategy
+                threading.Thread(target=strategy.main_logic, daemon=True).start()
+
+            simulator.simulate_market_session(options["date"], options["symbol"], start_hour=options["start_hour"],
+                                              end_hour=options["end_hour"], warmup=options["warmup"],
+                                              on_warmup=start_strategy)
+            if "strategy" not in state:
+                raise RuntimeError("session ended before the strategy start time")
+            row.update(summarize_run(exchange, state["strategy"]))
+            row["market_reads"] = market.get_stats()["reads"]
+    except BaseException as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.time() - started, 1)
+    results.put(row)
+    results.close()
+    results.join_thread()
+    os._exit(0)  # strategy threads never finish on their own
+
+
+def run_sweep(combinations, base_params, options, processes, timeout):
+    """Run every combination in at most `processes` worker processes; returns the result rows"""
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    pending = list(enumerate(combinations))
+    running = {}  # run id -> (process, start time)
+    rows = {}
+
+    while pending or running:
+        while pending and len(running) < processes:
+            run_id, combination = pending.pop(0)
+            process = context.Process(target=run_combination,
+                                      args=(run_id, combination, build_params(base_params, combination),
+                                            options, results))
+            process.start()
+            running[run_id] = (process, time.time())
+            print(f"[INFO] Run {run_id} started: {combination}")
+
+        try:
+            row = results.get(timeout=1.0)
+            rows[row["run"]] = row
+            status = f"error: {row['error']}" if "error" in row else f"pnl {row.get('pnl')}"
+            print(f"[INFO] Run {row['run']} finished in {row['seconds']}s - {status}")
+        except queue.Empty:
+            pass
+
+        for run_id, (process, started) in list(running.items()):
+            if run_id in rows:
+                process.join(timeout=5)
+                del running[run_id]
+            elif not process.is_alive():
+                rows[run_id] = {"run": run_id, **combinations[run_id],
+                                "error": f"worker exited with code {process.exitcode}"}
+                del running[run_id]
+            elif timeout and time.time() - started > timeout:
+                process.terminate()
+                process.join(timeout=10)
+                rows[run_id] = {"run": run_id, **combinations[run_id], "error": f"timed out after {timeout}s"}
+                del running[run_id]
+                print(f"[WARNING] Run {run_id} timed out")
+
+    return [rows[run_id] for run_id in sorted(rows)]
+
+
+def results_table(rows):
+    table = pd.DataFrame(rows).set_index("run")
+    if "pnl" in table:
+        table = table.sort_values("pnl", ascending=False, na_position="last")
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep backtests over a recorded session")
+    parser.add_argument("command", choices=["snapshot", "run"])
+    parser.add_argument("--date", required=True, help="Session date YYYYMMDD")
+    parser.add_argument("--base-dir", default=os.path.join("nuvama", "websocket", "tick_data"),
+                        help="Tick data base directory")
+    parser.add_argument("--grid", help="JSON file: param name -> list of values")
+    parser.add_argument("--params", help="JSON file with base params (default: 4_leg_run.py's)")
+    parser.add_argument("--symbol", default=None, help="Replay only this symbol's files")
+    parser.add_argument("--start-hour", type=int, default=9, help="Replay start hour")
+    parser.add_argument("--end-hour", type=int, default=16, help="Replay end hour")
+    parser.add_argument("--start-at", default="09:20", help="Replayed time (HH:MM) the strategy starts at")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Runs in parallel")
+    parser.add_argument("--timeout", type=float, default=None, help="Wall seconds before a run is killed")
+    parser.add_argument("--redis-server", default="redis-server", help="redis-server binary for the private instances")
+    parser.add_argument("--out-dir", default="backtests", help="Run logs and the results CSV go here")
+    args = parser.parse_args()
+
+    path = reference_path(args.base_dir, args.date)
+    if args.command == "snapshot":
+        save_reference(redis.Redis(host="localhost", port=6379, db=0), path)
+        print(f"[SUCCESS] Reference data saved to {path}")
+        return
+
+    if not args.grid:
+        print("[ERROR] --grid required for run command")
+        return
+    with open(args.grid, "rb") as f:
+        grid = orjson.loads(f.read())
+    base_params = dict(DEFAULT_PARAMS)
+    if args.params:
+        with open(args.params, "rb") as f:
+            base_params.update(orjson.loads(f.read()))
+
+    hour, minute = (int(part) for part in args.start_at.split(":"))
+    out_dir = os.path.join(args.out_dir, f"{args.date}_{datetime.now().strftime('%H%M%S')}")
+    os.makedirs(out_dir, exist_ok=True)
+    options = {
+        "date": args.date,
+        "base_dir": args.base_dir,
+        "symbol": args.symbol,
+        "start_hour": args.start_hour,
+        "end_hour": args.end_hour,
+        "warmup": (hour - args.start_hour) * 3600 + minute * 60,
+        "redis_server": args.redis_server,
+        "reference": load_reference(path),
+        "out_dir": out_dir,
+    }
+
+    combinations = expand_grid(grid)
+    print(f"[INFO] {len(combinations)} combinations x session {args.date} on {args.processes} processes")
+    started = time.time()
+    rows = run_sweep(combinations, base_params, options, max(1, args.processes), args.timeout)
+
+    table = results_table(rows)
+    csv_path = os.path.join(out_dir, "results.csv")
+    table.to_csv(csv_path)
+    print("\n" + table.to_string())
+    print(f"\n[SUCCESS] {len(rows)} runs in {time.time() - started:.0f}s - results in {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,14 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Thread
 import redis
 import traceback
-import time
+from .websocket.clock import WALL_CLOCK
 
 class Orders:
-    def __init__(self, user_obj_dict) -> None:
+    def __init__(self, user_obj_dict, clock=None, redis_client=None) -> None:
         self.user_obj_dict = user_obj_dict
-        self.r = redis.Redis(host='localhost', port=6379, db=0)
+        # IOC monitoring windows run on this clock (replayed time in a backtest)
+        self.clock = clock or WALL_CLOCK
+        self.r = redis_client or redis.Redis(host='localhost', port=6379, db=0)
         # Fixed ThreadPoolExecutor with 4 workers
         self.executor = ThreadPoolExecutor(max_workers=4)
         
@@ -199,7 +201,7 @@ class Orders:
         order_id = order_details.get('order_id', '')
         redis_key = f"order:{order_details['user_id']}{order_details['remark']}{order_id}"
         qty = 0
-        start = time.time()
+        start = self.clock.time()
        
         # Fix timeout handling - convert to float first, then int for seconds
         timeout = float(order_details.get('IOC', 0.5))
@@ -209,7 +211,7 @@ class Orders:
         base_leg_results = []
         
         # Main IOC monitoring loop
-        while time.time() - start < timeout:
+        while self.clock.time() - start < timeout:
             try:
                 if self.r.exists(redis_key):
                     order_data = orjson.loads(self.r.get(redis_key).decode())
@@ -238,7 +240,7 @@ class Orders:
                         
                         qty = current_filled_qty
                         
-                time.sleep(0.01)  # Small delay to prevent excessive polling
+                self.clock.sleep(0.01)  # Small delay to prevent excessive polling
                 
             except Exception as e:
                 print(f"ERROR: IOC order monitoring failed: {e}")
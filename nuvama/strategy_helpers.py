@@ -15,6 +15,9 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from APIConnect.APIConnect import APIConnect
 from .order_class import Orders
+from .websocket.shared_depth_book import SharedDepthBookReader
+from .websocket.depth_codec import binary_depth_key, decode_depth
+from .websocket.sim_exchange import SimulatedExchange, DepthBookSource, STATUS_COMPLETE, STATUS_REJECTED
 from constants.exchange import ExchangeEnum
 from constants.action import ActionEnum
 from constants.order_type import OrderTypeEnum
@@ -22,6 +25,9 @@ from constants.product_code import ProductCodeENum
 from constants.duration import DurationEnum
 
 
+TREND_THRESHOLD = 0.02  # weighted per-tick change treated as a move (2 paise)
+
+
 class StrategyHelpers:
     """Static helper functions for strategy operations"""
     
@@ -30,43 +36,184 @@ class StrategyHelpers:
         """Format price to ensure it's never negative and rounded properly."""
         return str(round(max(0.05, abs(price)) * 20) / 20)
     
+    @staticmethod
+    def classify_trend(weighted_trend):
+        """Trend label of a weighted per-tick change (more than 2 paise either way is a move)."""
+        if weighted_trend > TREND_THRESHOLD:
+            return "INCREASING", weighted_trend
+        elif weighted_trend < -TREND_THRESHOLD:
+            return "DECREASING", weighted_trend
+        else:
+            return "STABLE", weighted_trend
+
     @staticmethod
     def analyze_price_trend(price_list):
         """Analyze price trend from list of prices to determine if increasing or decreasing."""
         if len(price_list) < 2:
             return "STABLE", 0
         
-        # Calculate overall trend from first to last
-        total_change = price_list[-1] - price_list[0]
-        
-        # Calculate weighted trend (recent prices have more weight)
-        weighted_sum = 0
-        weight_total = 0
-        for i in range(1, len(price_list)):
-            change = price_list[i] - price_list[i-1]
-            weight = i  # Later changes get higher weight
-            weighted_sum += change * weight
-            weight_total += weight
-        
-        weighted_trend = weighted_sum / weight_total if weight_total > 0 else 0
-        # print("\nWeighted trend:", weighted_trend,end="\n ")
-        # Determine trend direction
-        if weighted_trend > 0.02:  # More than 2 paise increase
-            return "INCREASING", weighted_trend
-        elif weighted_trend < -0.02:  # More than 2 paise decrease
-            return "DECREASING", weighted_trend
-        else:
-            return "STABLE", weighted_trend
+        # Weighted trend: the i-th change gets weight i (recent changes weigh more).
+        # sum(i * (p[i] - p[i-1])) telescopes to m * p[m] - sum(p[0..m-1]), so no per-change loop
+        m = len(price_list) - 1
+        weighted_sum = m * price_list[-1] - (sum(price_list) - price_list[-1])
+        return StrategyHelpers.classify_trend(weighted_sum / (m * (m + 1) / 2))
+
+
+class PriceTrendTracker:
+    """
+    Rolling trend and volatility of one price series over the last `window` seconds
+
+    A ring buffer of (timestamp, price) samples with a running sum and Welford
+    mean/M2 kept up to date as samples enter and leave the window, so push()
+    and every query are O(1) (amortized over evictions) however long the
+    window is. trend() matches StrategyHelpers.analyze_price_trend and
+    volatility() matches calculate_price_volatility over the same samples.
+    Not thread safe: the observer feeding it and its readers share a lock.
+    """
+
+    def __init__(self, window: float, capacity: int = 8192, dedupe: bool = False):
+        self.window = window
+        self.capacity = capacity
+        self.dedupe = dedupe  # skip samples repeating the last price
+        self._ts = [0.0] * capacity
+        self._px = [0.0] * capacity
+        self._head = 0  # oldest sample
+        self.count = 0
+        self.last_time = None
+        self._sum = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._evicted = 0
+
+    def reset(self):
+        self._head = 0
+        self.count = 0
+        self.last_time = None
+        self._sum = self._mean = self._m2 = 0.0
+        self._evicted = 0
+
+    def push(self, price: float, timestamp: float) -> bool:
+        """Add a sample (False when dedupe skipped it); samples older than the window drop out"""
+        if self.dedupe and self.count and price == self.last:
+            return False
+        self._evict(timestamp)
+        if self.count == self.capacity:
+            self._pop()
+        index = (self._head + self.count) % self.capacity
+        self._ts[index] = timestamp
+        self._px[index] = price
+        self.count += 1
+        self.last_time = timestamp
+        self._sum += price
+        delta = price - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (price - self._mean)
+        return True
+
+    def _pop(self):
+        price = self._px[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self.count -= 1
+        if not self.count:
+            self._sum = self._mean = self._m2 = 0.0
+            return
+        self._sum -= price
+        delta = price - self._mean
+        self._mean -= delta / self.count
+        self._m2 = max(0.0, self._m2 - delta * (price - self._mean))
+        self._evicted += 1
+        if self._evicted >= self.capacity:
+            self._rebuild()  # shed the rounding drift of add/remove pairs, once per capacity evictions
+
+    def _rebuild(self):
+        prices = self.prices()
+        self._sum = sum(prices)
+        self._mean = self._sum / len(prices)
+        self._m2 = sum((price - self._mean) ** 2 for price in prices)
+        self._evicted = 0
+
+    def _evict(self, now):
+        cutoff = now - self.window
+        while self.count and self._ts[self._head] < cutoff:
+            self._pop()
+
+    def _settle(self, now):
+        if now is not None:
+            self._evict(now)
+
+    @property
+    def first(self):
+        return self._px[self._head] if self.count else None
+
+    @property
+    def last(self):
+        return self._px[(self._head + self.count - 1) % self.capacity] if self.count else None
+
+    def samples(self, now=None) -> int:
+        self._settle(now)
+        return self.count
+
+    def trend(self, now=None):
+        """(label, weighted trend) of the samples in the window, as analyze_price_trend"""
+        self._settle(now)
+        if self.count < 2:
+            return "STABLE", 0
+        m = self.count - 1
+        last = self.last
+        return StrategyHelpers.classify_trend((m * last - (self._sum - last)) / (m * (m + 1) / 2))
+
+    def volatility(self, now=None) -> float:
+        """Population standard deviation of the prices in the window"""
+        self._settle(now)
+        if self.count < 2:
+            return 0.0
+        return (self._m2 / self.count) ** 0.5
+
+    def direction(self, now=None) -> str:
+        self._settle(now)
+        first, last = self.first, self.last
+        if first is None or last == first:
+            return "FLAT"
+        return "UP" if last > first else "DOWN"
+
+    def prices(self, now=None) -> list:
+        """Prices in the window, oldest first (O(n) - for reports, not the hot path)"""
+        self._settle(now)
+        end = self._head + self.count
+        if end <= self.capacity:
+            return self._px[self._head:end]
+        return self._px[self._head:] + self._px[:end - self.capacity]
 
 
 class StrategyDataHelpers:
     """Helper functions for data operations and Redis interactions"""
     
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, shared_book=None, tick_subscription=None, market=None):
         self.r = redis_client
+        # Replay target (MarketCache / RedisReplayTarget) holding replayed market data; None reads the live keys
+        self.market = market
+        # Same-host shared-memory depth book; reads fall back to Redis when it is unavailable (False: Redis only)
+        self.shared_book = shared_book if shared_book is not None else SharedDepthBookReader()
+        if market is not None:
+            self.shared_book = None  # the live book is not the replayed market
+        # With a live tick subscription an unticked key is served from the last read
+        self.tick_subscription = tick_subscription
+        self.pricing_cache = {}
     
+    def market_data(self, key: str):
+        """Parsed payload of a market data key (depth:, reduced_quotes:) from the replay target or redis."""
+        if self.market is not None:
+            try:
+                return self.market.get(key)
+            except Exception as e:
+                print(f"ERROR: replay target read failed for {key}: {e}")
+                return None
+        return self.depth_from_redis(key)
+
     def depth_from_redis(self, streaming_symbol: str):
         """Load depth JSON from redis and return parsed object."""
+        if self.market is not None:
+            return self.market_data(streaming_symbol)
         try:
             raw = self.r.get(streaming_symbol)
             return orjson.loads(raw.decode()) if raw else None
@@ -77,6 +224,46 @@ class StrategyDataHelpers:
             print(f"ERROR: unexpected error reading {streaming_symbol}: {e}")
             return None
 
+    def depth_record_from_redis(self, depth_key: str):
+        """Load the packed binary depth record for a depth key (None if not published)."""
+        try:
+            return decode_depth(self.r.get(binary_depth_key(depth_key)))
+        except redis.RedisError as e:
+            print(f"ERROR: redis error reading binary depth for {depth_key}: {e}")
+            return None
+        except Exception as e:
+            print(f"ERROR: unexpected error decoding binary depth for {depth_key}: {e}")
+            return None
+
+    def depth_for_pricing(self, depth_key: str):
+        """
+        Load depth for price reads as a DepthRecord where possible.
+
+        Order: shared-memory book, binary Redis record, then the JSON blob (returned
+        as the parsed dict) for feeds that do not publish binary records yet.
+        """
+        subscription = self.tick_subscription
+        watched_since = subscription.watched_since(depth_key) if subscription else None
+        version = subscription.version(depth_key) if watched_since else None
+        if watched_since:
+            cached = self.pricing_cache.get(depth_key)
+            # Nothing ticked since the cached read, so the stored depth is unchanged
+            if cached and cached[0] == version and cached[1] >= watched_since:
+                return cached[2]
+
+        read_time = time.time()
+        if self.market is not None:
+            snapshot = self.market_data(depth_key)
+        else:
+            snapshot = self.shared_book.read_record(depth_key) if self.shared_book else None
+            if snapshot is None:
+                snapshot = self.depth_record_from_redis(depth_key)
+            if snapshot is None:
+                snapshot = self.depth_from_redis(depth_key)
+        if watched_since and snapshot is not None:
+            self.pricing_cache[depth_key] = (version, read_time, snapshot)
+        return snapshot
+
     def create_depth_key(self, leg_info):
         """Create Redis depth key from leg info."""
         expiry_value = leg_info['expiry']
@@ -114,10 +301,22 @@ class StrategyPricingHelpers:
     def __init__(self, params):
         self.params = params
     
+    @staticmethod
+    def _side_prices(data, side_key):
+        """Prices for one side of a DepthRecord or a depth JSON payload."""
+        if not isinstance(data, dict):
+            return data.prices[side_key]
+        return [float(entry["price"]) for entry in data["response"]["data"][side_key]]
+
     def safe_get_price(self, data, side_key):
         """Safe price extraction with proper None checking."""
         try:
-            if not (data and data.get("response", {}).get("data", {}).get(side_key)):
+            if not data:
+                return 0.0
+            if isinstance(data, dict):
+                if not data.get("response", {}).get("data", {}).get(side_key):
+                    return 0.0
+            elif not data.prices[side_key]:
                 return 0.0
             
             pricing_method = self.params.get("pricing_method", "average")
@@ -130,6 +329,8 @@ class StrategyPricingHelpers:
             if no_of_average > 1:
                 return self.avg_price(data, side_key, no_of_average)
             
+            if not isinstance(data, dict):
+                return data.prices[side_key][0]
             return float(data["response"]["data"][side_key][0]["price"])
         except (KeyError, IndexError, TypeError, ValueError):
             return 0.0
@@ -137,13 +338,13 @@ class StrategyPricingHelpers:
     def depth_price(self, data, side_key, depth_index):
         """Get the price at specific depth index (1-based)."""
         try:
-            entries = data["response"]["data"][side_key]
-            if not entries:
+            prices = self._side_prices(data, side_key)
+            if not prices:
                 return 0.0
             
             depth_index = max(1, int(depth_index))
-            index = min(depth_index - 1, len(entries) - 1)
-            return float(entries[index]["price"])
+            index = min(depth_index - 1, len(prices) - 1)
+            return prices[index]
         except (KeyError, IndexError, TypeError, ValueError) as e:
             print(f"ERROR: _depth_price failed for side {side_key}: {e}")
             return 0.0
@@ -151,12 +352,12 @@ class StrategyPricingHelpers:
     def avg_price(self, data, side_key, n):
         """Compute average of the first n bid/ask prices."""
         try:
-            entries = data["response"]["data"][side_key]
-            if not entries:
+            prices = self._side_prices(data, side_key)
+            if not prices:
                 return 0.0
             n = max(1, int(n))
-            count = min(n, len(entries))
-            return sum(float(entries[i]["price"]) for i in range(count)) / count
+            count = min(n, len(prices))
+            return sum(prices[:count]) / count
         except (KeyError, IndexError, TypeError, ValueError) as e:
             print(f"ERROR: _avg_price failed for side {side_key}: {e}")
             return 0.0
@@ -184,7 +385,7 @@ class StrategyPricingHelpers:
                 # Create depth key from leg info
                 leg_info = legs[leg_key]['info']
                 depth_key = data_helpers.create_depth_key(leg_info)
-                leg_data = data_helpers.depth_from_redis(depth_key)
+                leg_data = data_helpers.depth_for_pricing(depth_key)
                 
                 if leg_data is None:
                     print(f"ERROR: No depth data found for {leg_key}")
@@ -227,7 +428,7 @@ class StrategyPricingHelpers:
                 # Create a minimal leg info for depth lookup
                 temp_leg_info = {'instrument_token': instrument_token}
                 depth_key = data_helpers.create_depth_key(temp_leg_info)
-                leg_data = data_helpers.depth_from_redis(depth_key)
+                leg_data = data_helpers.depth_for_pricing(depth_key)
                 
                 if leg_data:
                     # Try to get bid price (default for general price fetching)
@@ -824,11 +1025,14 @@ class StrategyExecutionHelpers:
     LIVE_MODE = "LIVE"
     SIMULATION_MODE = "SIMULATION"
     
-    def __init__(self, redis_connection, execution_mode=SIMULATION_MODE):
+    def __init__(self, redis_connection, execution_mode=SIMULATION_MODE, exchange=None):
         self.r = redis_connection
         self.execution_mode = execution_mode
         self.simulation_orders = {}  # Store simulated orders
-        self.simulation_counter = 1
+        # Simulated orders are matched against the depth book; strategies backtested together
+        # share one exchange (fed by TickDataSimulator) so they compete for the same liquidity
+        self.exchange = exchange if exchange is not None else SimulatedExchange(
+            redis_connection, book_source=DepthBookSource(redis_connection))
         
     def set_execution_mode(self, mode):
         """Set execution mode (LIVE or SIMULATION)"""
@@ -837,12 +1041,12 @@ class StrategyExecutionHelpers:
         self.execution_mode = mode
         StrategyLoggingHelpers.info(f"Execution mode set to: {mode}")
     
-    def execute_order(self, order_instance, order_data, uid, leg_key):
-        """Execute order based on current mode (Live or Simulation)"""
+    def execute_order(self, order_instance, order_data, uid, leg_key, depth_key=None):
+        """Execute order based on current mode (Live or Simulation); depth_key is the leg's book for simulated fills"""
         if self.execution_mode == self.LIVE_MODE:
             return self._execute_live_order(order_instance, order_data, uid, leg_key)
         else:
-            return self._execute_simulation_order(order_data, uid, leg_key)
+            return self._execute_simulation_order(order_data, uid, leg_key, depth_key)
     
     def _execute_live_order(self, order_instance, order_data, uid, leg_key):
         """Execute actual order in live mode"""
@@ -864,45 +1068,94 @@ class StrategyExecutionHelpers:
             StrategyLoggingHelpers.error(f"LIVE ORDER: Exception placing order for {leg_key}", exception=e)
             return False, str(e)
 
-    def _execute_simulation_order(self, order_data, uid, leg_key):
-        """Execute simulated order - assume execution at specified price"""
+    def _execute_simulation_order(self, order_data, uid, leg_key, depth_key=None):
+        """Execute simulated order - matched against the depth book by the simulated exchange"""
         try:
-            # Generate simulation order ID
-            sim_order_id = f"SIM_{self.simulation_counter:06d}"
-            self.simulation_counter += 1
-            
-            # Create simulated execution
-            simulated_execution = {
-                "order_id": sim_order_id,
-                "user_id": uid,
-                "leg_key": leg_key,
-                "symbol": order_data.get("Trading_Symbol", "UNKNOWN"),
-                "action": order_data.get("Action", "UNKNOWN"),
-                "quantity": order_data.get("Slice_Quantity", 0),
-                "executed_price": order_data.get("Limit_Price", 0),
-                "execution_time": datetime.now().isoformat(),
-                "status": "FILLED",
-                "mode": "SIMULATION"
-            }
-            
+            order = self.exchange.submit(order_data, uid, depth_key)
+            simulated_execution = self._simulation_record(order, leg_key)
+            sim_order_id = order["order_id"]
+
             # Store simulation data
             sim_key = f"simulation_order:{sim_order_id}"
             self.simulation_orders[sim_order_id] = simulated_execution
-            
+
             # Save to Redis for persistence
             self.r.setex(sim_key, 86400, json.dumps(simulated_execution))  # 1 day expiry
-            
+
+            if order["status"] == STATUS_REJECTED:
+                StrategyLoggingHelpers.error(
+                    f"SIMULATION: Order rejected for {leg_key}",
+                    f"OrderID: {sim_order_id}, User: {uid}, Reason: {order['reason']}"
+                )
+                return False, simulated_execution
+
             StrategyLoggingHelpers.success(
-                f"SIMULATION: Order executed for {leg_key}",
-                f"OrderID: {sim_order_id}, User: {uid}, Qty: {order_data.get('Quantity')}, Price: {order_data.get('Limit_Price')}"
+                f"SIMULATION: Order {simulated_execution['status']} for {leg_key}",
+                f"OrderID: {sim_order_id}, User: {uid}, Filled: {order['filled_qty']}/{order['quantity']} "
+                f"@ {order['avg_price']}, Limit: {order.get('limit_price')}"
             )
-            
+
             return True , simulated_execution
-            
+
         except Exception as e:
             StrategyLoggingHelpers.error(f"SIMULATION: Exception executing order for {leg_key}", exception=e)
-            return False
-    
+            return False, str(e)
+
+    @staticmethod
+    def _simulation_record(order, leg_key):
+        """Simulation order record from the exchange's order state ("quantity" is the filled quantity)"""
+        if order["status"] == STATUS_COMPLETE:
+            status = "FILLED"
+        elif order["status"] == STATUS_REJECTED:
+            status = "REJECTED"
+        elif order["filled_qty"]:
+            status = "PARTIALLY_FILLED"
+        else:
+            status = order["status"].upper()
+        return {
+            "order_id": order["order_id"],
+            "user_id": order["user_id"],
+            "leg_key": leg_key,
+            "symbol": order["symbol"],
+            "action": order["action"],
+            "quantity": order["filled_qty"],
+            "order_quantity": order["quantity"],
+            "executed_price": order["avg_price"],
+            "limit_price": order["limit_price"],
+            "execution_time": datetime.fromtimestamp(order["updated_at"]).isoformat(),
+            "status": status,
+            "order_status": order["status"],
+            "mode": "SIMULATION"
+        }
+
+    def get_simulation_order(self, order_id):
+        """Refreshed record of a simulation order (fills since placement included), None if unknown"""
+        order = self.exchange.get_order(order_id)
+        if order is None:
+            return self.simulation_orders.get(order_id)
+        leg_key = self.simulation_orders.get(order_id, {}).get("leg_key")
+        record = self.simulation_orders[order_id] = self._simulation_record(order, leg_key)
+        return record
+
+    def modify_order(self, order_instance, modify_details):
+        """Modify an order in the current mode; same result shape as Orders.modify_order"""
+        if self.execution_mode == self.LIVE_MODE:
+            return order_instance.modify_order(modify_details)
+        order = self.exchange.modify(modify_details.get("Order_ID"), modify_details.get("Limit_Price"),
+                                     modify_details.get("Quantity"))
+        if order is None:
+            return {"status": "error", "message": f"Simulation order {modify_details.get('Order_ID')} is not open"}
+        return {"status": "success", "response": order}
+
+    def cancel_order(self, order_instance, order_details):
+        """Cancel an order in the current mode"""
+        if self.execution_mode == self.LIVE_MODE:
+            return order_instance.cancel_order(order_details)
+        order = self.exchange.cancel(order_details.get("order_id"))
+        if order is None:
+            return {"status": "error", "message": f"Simulation order {order_details.get('order_id')} is not open"}
+        return {"status": "success", "response": order}
+
     def get_simulation_orders(self, uid=None, leg_key=None):
         """Get simulation orders with optional filtering"""
         filtered_orders = {}
@@ -941,7 +1194,6 @@ class StrategyExecutionHelpers:
         # Clear in-memory data
         cleared_count = len(self.simulation_orders)
         self.simulation_orders.clear()
-        self.simulation_counter = 1
         
         # Clear Redis simulation keys
         try:
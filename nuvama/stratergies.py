@@ -3,8 +3,10 @@ from APIConnect.APIConnect import APIConnect
 import redis
 import orjson
 import importlib.util, sys, pathlib, traceback
-import time
 from .order_class import Orders
+from .websocket.clock import WALL_CLOCK
+from .websocket.shared_depth_book import SharedDepthBookReader
+from .websocket.tick_notifier import TickSubscription
 from constants.exchange import ExchangeEnum
 from constants.action import ActionEnum
 from constants.order_type import OrderTypeEnum
@@ -16,8 +18,14 @@ from concurrent.futures import ThreadPoolExecutor ,as_completed
 
 
 class Stratergy1:
-    def __init__(self, paramsid) -> None:
+    def __init__(self, paramsid, clock=None) -> None:
+        # time source for observation windows, sleeps and IOC timeouts (ReplayClock in a backtest)
+        self.clock = clock or WALL_CLOCK
         self.r = redis.Redis(host="localhost", port=6379, db=0)
+        # same-host shared-memory depth book used for price polling (falls back to redis)
+        self.shared_book = SharedDepthBookReader()
+        # leg tick notifications so the main loop wakes on market updates
+        self.tick_subscription = TickSubscription(self.r, clock=self.clock)
         self.order = Orders()
         # lock used when updating shared per-user templates/qtys from worker threads
         self.templates_lock = threading.Lock()
@@ -71,7 +79,7 @@ class Stratergy1:
                     print(f"INFO: Previous quantities were - Entry: {current_entry}, Exit: {current_exit}")
             except Exception as e:
                 print(f"ERROR: failed to update live params: {e}")
-                time.sleep(1)
+                self.clock.sleep(1)
 
     # --- initialization helpers -------------------------------------------------
     def _depth_from_redis(self, streaming_symbol: str):
@@ -92,6 +100,13 @@ class Stratergy1:
             print(f"ERROR: unexpected error reading {streaming_symbol} from redis: {e}")
             return None
 
+    def _depth_for_pricing(self, depth_key: str):
+        """Load depth for price reads, preferring the shared-memory book over redis."""
+        snapshot = self.shared_book.read(depth_key)
+        if snapshot is not None:
+            return snapshot
+        return self._depth_from_redis(depth_key)
+
     def _init_legs_and_orders(self):
         # choose which leg is base vs other depending on requested base_leg
         sym = self.params["symbol"].upper()
@@ -182,6 +197,14 @@ class Stratergy1:
             self.exit_order_details = self._make_order_template(self.other_leg, buy_if=("SELL" if self.params['action'].upper() == "BUY" else "BUY"), quantity=0)
             self.exit_order_details_base_leg = self._make_order_template(self.base_leg, buy_if=("SELL" if self.params['action'].upper() == "BUY" else "BUY"), quantity=0)
 
+        # follow the current call/put depth keys (strikes may change on params update)
+        leg_keys = [
+            f"depth:{sym}_{self.params['call_strike']}.0_CE-{self.params['expiry']}",
+            f"depth:{sym}_{self.params['put_strike']}.0_PE-{self.params['expiry']}",
+        ]
+        self.tick_subscription.set_keys(leg_keys)
+        self.leg_tick_waiter = self.tick_subscription.waiter(leg_keys)
+
     def _make_order_template(self, leg_obj, buy_if="BUY", quantity=None, user_id=None):
         """Return a dict template for orders built from a depth/leg object.
 
@@ -469,8 +492,8 @@ class Stratergy1:
                     continue # pause
                 # reload live depths each loop
                 sym = self.params["symbol"].upper()
-                call = self._depth_from_redis(f"depth:{sym}_{self.params['call_strike']}.0_CE-{self.params['expiry']}")
-                put = self._depth_from_redis(f"depth:{sym}_{self.params['put_strike']}.0_PE-{self.params['expiry']}")
+                call = self._depth_for_pricing(f"depth:{sym}_{self.params['call_strike']}.0_CE-{self.params['expiry']}")
+                put = self._depth_for_pricing(f"depth:{sym}_{self.params['put_strike']}.0_PE-{self.params['expiry']}")
 
                 bid_or_ask = "bidValues" if self.params["action"].upper() == "SELL" else "askValues"
                 bid_ask_exit = "askValues" if self.params["action"].upper() == "SELL" else "bidValues"
@@ -509,7 +532,7 @@ class Stratergy1:
                 if call_price is None or put_price is None:
                     print(f"ERROR: Invalid price data - call_price: {call_price}, put_price: {put_price}")
                     print(f"       call data: {call is not None}, put data: {put is not None}")
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                     continue
 
                 # If per-user templates are configured, run per-user logic in parallel
@@ -538,8 +561,8 @@ class Stratergy1:
                                 # print(f"INFO: per-user result: {res}")
                             except Exception as e:
                                 print(f"ERROR: per-user task failed: {e}")
-                    # throttle a tiny bit before next polling cycle
-                    time.sleep(0.1)
+                    # wait for the next call/put tick (bounded so params/run_state changes are seen)
+                    self.leg_tick_waiter.wait(0.1)
                     
                     # Check exit condition only after processing all users
                     try:
@@ -573,17 +596,20 @@ class Stratergy1:
                 
             except redis.RedisError as e:
                 print(f"ERROR: redis error in main loop: {e}")
-                time.sleep(0.5)
+                self.clock.sleep(0.5)
                 continue
             except (KeyError, IndexError, TypeError, AttributeError, ValueError, orjson.JSONDecodeError) as e:
                 # expected parsing/access errors - log and continue polling
                 print(f"WARNING: transient data error in main loop: {e}")
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
                 continue
             except Exception as e:
                 print(f"ERROR: unexpected error in main loop: {e}")
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
                 continue
             except KeyboardInterrupt:
                 print("INFO: KeyboardInterrupt received, exiting main loop")
-                os._exit(0)
\ No newline at end of file
+                os._exit(0)
+
+        # Release the depth lease so the feed can drop this strategy's strikes
+        self.tick_subscription.close()
\ No newline at end of file
@@ -4,8 +4,10 @@ import redis
 import json
 import orjson
 import importlib.util, sys, pathlib, traceback
-import time
 from .order_class import Orders
+from .websocket.clock import WALL_CLOCK
+from .websocket.shared_depth_book import SharedDepthBookReader
+from .websocket.tick_notifier import TickSubscription
 from constants.exchange import ExchangeEnum
 from constants.action import ActionEnum
 from constants.order_type import OrderTypeEnum
@@ -17,8 +19,14 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 class Stratergy4Leg:
-    def __init__(self, paramsid) -> None:
+    def __init__(self, paramsid, clock=None) -> None:
+        # time source for observation windows, sleeps and IOC timeouts (ReplayClock in a backtest)
+        self.clock = clock or WALL_CLOCK
         self.r = redis.Redis(host="localhost", port=6379, db=0)
+        # same-host shared-memory depth book used for price polling (falls back to redis)
+        self.shared_book = SharedDepthBookReader()
+        # leg tick notifications so the main loop wakes on market updates
+        self.tick_subscription = TickSubscription(self.r, clock=self.clock)
         self.lot_sizes = json.loads(self.r.get("lotsizes"))
         users = self.r.keys("user:*")
         data = [json.loads(self.r.get(user)) for user in users]
@@ -28,7 +36,7 @@ class Stratergy4Leg:
             if self.r.exists(f"reqid:{item.get('userid')}"):
                 self.user_obj_dict[item.get("userid")] = APIConnect(item.get("apikey"), "", "", False, "", False)
 
-        self.order = Orders(self.user_obj_dict)
+        self.order = Orders(self.user_obj_dict, clock=self.clock)
         # lock used when updating shared per-user templates/qtys from worker threads
         self.templates_lock = threading.Lock()
         
@@ -82,7 +90,7 @@ class Stratergy4Leg:
                     self._init_legs_and_orders()
             except Exception as e:
                 print(f"ERROR: failed to update live params: {e}")
-                time.sleep(1)
+                self.clock.sleep(1)
 
     # --- initialization helpers -------------------------------------------------
     def _depth_from_redis(self, streaming_symbol: str):
@@ -102,6 +110,13 @@ class Stratergy4Leg:
             print(f"ERROR: unexpected error reading {streaming_symbol} from redis: {e}")
             return None
 
+    def _depth_for_pricing(self, depth_key: str):
+        """Load depth for price reads, preferring the shared-memory book over redis."""
+        snapshot = self.shared_book.read(depth_key)
+        if snapshot is not None:
+            return snapshot
+        return self._depth_from_redis(depth_key)
+
     def _create_depth_key(self, leg_info):
         """Create Redis depth key from leg info, handling both numeric and date expiry formats."""
         expiry_value = leg_info['expiry']
@@ -493,6 +508,11 @@ class Stratergy4Leg:
             self.exit_order_details = self.exit_order_templates[first_uid]
             self.exit_base_leg_details = self.exit_base_leg_templates[first_uid]
 
+        # follow the current leg depth keys (legs may change on params update)
+        leg_keys = [leg['depth_key'] for leg in self.legs.values() if leg.get('depth_key')]
+        self.tick_subscription.set_keys(leg_keys)
+        self.leg_tick_waiter = self.tick_subscription.waiter(leg_keys)
+
     def _make_order_template(self, leg_obj, buy_if="BUY", quantity=None, user_id=None, leg_key=None):
         """Return a dict template for orders built from a depth/leg object.
 
@@ -620,7 +640,7 @@ class Stratergy4Leg:
         # Get base leg prices dynamically based on their individual actions
         for base_leg_key in self.base_leg_keys:
             try:
-                leg_data = self._depth_from_redis(self.legs[base_leg_key]['depth_key'])
+                leg_data = self._depth_for_pricing(self.legs[base_leg_key]['depth_key'])
                 leg_action = self.legs[base_leg_key]['info'].get('action', self.global_action).upper()
                 
                 # Determine bid_or_ask based on leg action and entry/exit
@@ -648,7 +668,7 @@ class Stratergy4Leg:
         
         # Get bidding leg price based on its individual action
         try:
-            bidding_leg_data = self._depth_from_redis(self.legs[self.bidding_leg_key]['depth_key'])
+            bidding_leg_data = self._depth_for_pricing(self.legs[self.bidding_leg_key]['depth_key'])
             bidding_leg_action = self.legs[self.bidding_leg_key]['info'].get('action', self.global_action).upper()
             
             # Determine bid_or_ask based on bidding leg action and entry/exit
@@ -687,7 +707,7 @@ class Stratergy4Leg:
         # Get base leg prices dynamically
         for base_leg_key in self.base_leg_keys:
             try:
-                leg_data = self._depth_from_redis(self.legs[base_leg_key]['depth_key'])
+                leg_data = self._depth_for_pricing(self.legs[base_leg_key]['depth_key'])
                 pricing_method = self.params.get("pricing_method", "average")
                 
                 if pricing_method == "depth":
@@ -703,7 +723,7 @@ class Stratergy4Leg:
         
         # Get bidding leg price (for display/validation purposes)
         try:
-            bidding_leg_data = self._depth_from_redis(self.legs[self.bidding_leg_key]['depth_key'])
+            bidding_leg_data = self._depth_for_pricing(self.legs[self.bidding_leg_key]['depth_key'])
             pricing_method = self.params.get("pricing_method", "average")
             
             if pricing_method == "depth":
@@ -967,7 +987,7 @@ class Stratergy4Leg:
                 base_leg_sum = sum(leg_prices.get(key, 0) for key in self.base_leg_keys)
                 if base_leg_sum <= 0:
                     print(f"ERROR: Invalid base leg prices: {leg_prices}")
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                     continue
 
                 # Calculate spread considering BUY/SELL actions for each leg, weighted by quantity/lot_size
@@ -1023,6 +1043,8 @@ class Stratergy4Leg:
                     # t2 = time.time()
                     # print("Time Taken : ",t2-t1)
                     # breakpoint()
+                    # block until a leg ticks instead of re-pricing an unchanged book
+                    self.leg_tick_waiter.wait(0.1)
                     continue
                     
                 
@@ -1030,18 +1052,21 @@ class Stratergy4Leg:
                 
             except redis.RedisError as e:
                 print(f"ERROR: redis error in dynamic {len(self.base_leg_keys) if hasattr(self, 'base_leg_keys') else 'multi'}-leg main loop: {e}")
-                time.sleep(0.5)
+                self.clock.sleep(0.5)
                 continue
             except (KeyError, IndexError, TypeError, AttributeError, ValueError, orjson.JSONDecodeError) as e:
                 # expected parsing/access errors - log and continue polling
                 print(f"WARNING: transient data error in dynamic {len(self.base_leg_keys) if hasattr(self, 'base_leg_keys') else 'multi'}-leg main loop: {e}")
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
                 continue
             except Exception as e:
                 print(f"ERROR: unexpected error in dynamic {len(self.base_leg_keys) if hasattr(self, 'base_leg_keys') else 'multi'}-leg main loop: {e}")
                 print(traceback.format_exc())
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
                 continue
             except KeyboardInterrupt:
                 print("INFO: KeyboardInterrupt received, exiting dynamic multi-leg main loop")
                 os._exit(0)
+
+        # Release the depth lease so the feed can drop this strategy's strikes
+        self.tick_subscription.close()
@@ -7,18 +7,19 @@ import os
 import redis
 import json
 import orjson
-import time
 import threading
 import traceback
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from APIConnect.APIConnect import APIConnect
 from .order_class import Orders
+from .websocket.clock import WALL_CLOCK
+from .websocket.tick_notifier import TickSubscription
 from .strategy_helpers import (
     StrategyHelpers, StrategyDataHelpers, StrategyPricingHelpers,
     StrategyCalculationHelpers, StrategyOrderHelpers, StrategyTrackingHelpers,
     StrategyLoggingHelpers, StrategyExecutionTracker, StrategyExecutionHelpers,
-    StrategyQuantityHelpers, StrategyValidationHelpers
+    StrategyQuantityHelpers, StrategyValidationHelpers, PriceTrendTracker
 )
 from constants.exchange import ExchangeEnum
 from constants.action import ActionEnum
@@ -26,9 +27,13 @@ from constants.order_type import OrderTypeEnum
 from constants.product_code import ProductCodeENum
 from constants.duration import DurationEnum
 
+PAIR_OBSERVATION_WINDOW = 2  # seconds of leg prices behind each global pair observation
+
 
 class StratergyDirectIOCBox:
-    def __init__(self, paramsid) -> None:
+    def __init__(self, paramsid, clock=None, exchange=None) -> None:
+        # time source for observation windows, sleeps and IOC timeouts (ReplayClock in a backtest)
+        self.clock = clock or WALL_CLOCK
         # Redis connection
         self.r = redis.Redis(host="localhost", port=6379, db=0)
         
@@ -52,7 +57,8 @@ class StratergyDirectIOCBox:
         self.hard_entry = False
         # Initialize execution mode (default is SIMULATION)
         execution_mode = self.params.get('execution_mode', StrategyExecutionHelpers.SIMULATION_MODE)
-        self.execution_helper = StrategyExecutionHelpers(self.r, execution_mode)
+        # SIMULATION fills come from this matching engine (shared with the other strategies of a backtest)
+        self.execution_helper = StrategyExecutionHelpers(self.r, execution_mode, exchange=exchange)
         
         # Log execution mode
         StrategyLoggingHelpers.info(
@@ -97,7 +103,7 @@ class StratergyDirectIOCBox:
                 self.user_obj_dict[item.get("userid")] = APIConnect(
                     item.get("apikey"), "", "", False, "", False)
         
-        self.order = Orders(self.user_obj_dict)
+        self.order = Orders(self.user_obj_dict, clock=self.clock)
 
     def _load_params(self):
         """Load parameters from Redis with validation."""
@@ -140,10 +146,12 @@ class StratergyDirectIOCBox:
         self.latest_observation_results = {}
         self.observation_locks = {}
         self.observation_stop_flags = {}
+        self.observation_trackers = {}  # observation key -> rolling (leg1, leg2) PriceTrendTrackers
 
     def _init_helpers(self):
         """Initialize helper class instances."""
-        self.data_helpers = StrategyDataHelpers(self.r)
+        self.tick_subscription = TickSubscription(self.r, clock=self.clock)
+        self.data_helpers = StrategyDataHelpers(self.r, tick_subscription=self.tick_subscription)
         self.pricing_helpers = None  # Will be initialized after params are loaded
         self.calculation_helpers = None  # Will be initialized after legs are loaded
         self.order_helpers = None  # Will be initialized after option_mapper is loaded
@@ -153,7 +161,7 @@ class StratergyDirectIOCBox:
         """Background thread to update parameters from Redis."""
         while True:
             try:
-                time.sleep(1)
+                self.clock.sleep(1)
                 new_params = self.r.get(self.params_key)
                 if new_params:
                     self.params = orjson.loads(new_params.decode())
@@ -164,8 +172,9 @@ class StratergyDirectIOCBox:
         """
         Initialize global parallel observation for both pairs at startup.
         
-        Note: This system runs continuously with 2-second observations for real-time
-        execution decisions during order placement. For the initial CASE A/B decision,
+        Note: This system runs continuously, feeding each leg's rolling 2-second trend
+        tracker on every tick, so an execution decision during order placement is
+        available at any time. For the initial CASE A/B decision,
         we use a separate dedicated 10-second observation via _observe_market_for_case_decision().
         """
         try:
@@ -178,14 +187,14 @@ class StratergyDirectIOCBox:
                 buy_leg_keys = [self.pair1_bidding_leg, self.pair1_base_leg]
                 sell_leg_keys = [self.pair2_bidding_leg, self.pair2_base_leg]
                 
-                self.logger.info("Starting global parallel observation for all pairs (2-second cycles)")
+                self.logger.info("Starting global parallel observation for all pairs (rolling 2-second windows)")
                 
                 # Start observation for BUY pair
                 self._start_global_parallel_observation("BUY_PAIR", buy_leg_keys[0], buy_leg_keys[1])
                 
                 # Start observation for SELL pair  
                 self._start_global_parallel_observation("SELL_PAIR", sell_leg_keys[0], sell_leg_keys[1])
-                time.sleep(2)
+                self.clock.sleep(2)
                 self.global_observation_active = True
                 self.logger.success("Global parallel observation started successfully")
                 
@@ -209,6 +218,8 @@ class StratergyDirectIOCBox:
             self.observation_locks[observation_key] = threading.Lock()
             self.observation_stop_flags[observation_key] = False
             self.latest_observation_results[observation_key] = None
+            self.observation_trackers[observation_key] = (PriceTrendTracker(PAIR_OBSERVATION_WINDOW),
+                                                          PriceTrendTracker(PAIR_OBSERVATION_WINDOW))
             
             # Start observation thread
             observation_thread = threading.Thread(
@@ -229,25 +240,31 @@ class StratergyDirectIOCBox:
         try:
             self.logger.debug(f"Global observation worker started for {observation_key}")
             
+            tick_waiter = self._leg_tick_waiter([leg1_key, leg2_key])
+            leg1_tracker, leg2_tracker = self.observation_trackers[observation_key]
             while not self.observation_stop_flags.get(observation_key, True):
                 try:
-                    # Perform market observation
-                    observation_result = self._observe_market_for_pair(leg1_key, leg2_key, 2)
+                    # Feed the rolling trackers tick by tick; results are computed from them when read
+                    current_prices = self._get_leg_prices([leg1_key, leg2_key])
+                    leg1_price = current_prices.get(leg1_key, 0)
+                    leg2_price = current_prices.get(leg2_key, 0)
                     
-                    # Update latest result with lock
-                    with self.observation_locks[observation_key]:
-                        self.latest_observation_results[observation_key] = {
-                            'result': observation_result,
-                            'timestamp': time.time(),
-                            'legs': [leg1_key, leg2_key]
-                        }
+                    # Only add valid prices
+                    if leg1_price > 0 and leg2_price > 0:
+                        now = self.clock.time()
+                        with self.observation_locks[observation_key]:
+                            leg1_tracker.push(leg1_price, now)
+                            leg2_tracker.push(leg2_price, now)
+                            self.latest_observation_results[observation_key] = {
+                                'timestamp': now,
+                                'legs': [leg1_key, leg2_key]
+                            }
                     
-                    # Small sleep to prevent excessive CPU usage
-                    time.sleep(0.5)
+                    tick_waiter.wait(0.2)  # Wake on the next leg tick, at most 200ms apart
                     
                 except Exception as e:
                     self.logger.error(f"Global observation worker error for {observation_key}", exception=e)
-                    time.sleep(1)
+                    self.clock.sleep(1)
             
             self.logger.debug(f"Global observation worker stopped for {observation_key}")
             
@@ -261,9 +278,12 @@ class StratergyDirectIOCBox:
                 with self.observation_locks[observation_key]:
                     latest_data = self.latest_observation_results[observation_key]
                     if latest_data:
-                        age = time.time() - latest_data['timestamp']
+                        now = self.clock.time()
+                        age = now - latest_data['timestamp']
                         self.logger.debug(f"Retrieved global observation result for {observation_key} (age: {age:.2f}s)")
-                        return latest_data['result']
+                        leg1_key, leg2_key = latest_data['legs']
+                        leg1_tracker, leg2_tracker = self.observation_trackers[observation_key]
+                        return self._pair_observation_result(leg1_key, leg2_key, leg1_tracker, leg2_tracker, now)
             
             self.logger.warning(f"No global observation result available for {observation_key}")
             return None
@@ -290,31 +310,40 @@ class StratergyDirectIOCBox:
 
     def _observe_market_for_pair(self, leg1_key, leg2_key, observation_duration=2,isExit=False):
         """Observe market for a specified duration and collect price data for analysis."""
-        leg1_prices = []
-        leg2_prices = []
-        start_time = time.time()
+        leg1_tracker = PriceTrendTracker(observation_duration)
+        leg2_tracker = PriceTrendTracker(observation_duration)
+        start_time = self.clock.time()
+        tick_waiter = self._leg_tick_waiter([leg1_key, leg2_key])
         
         # Collect prices in a loop
-        while time.time() - start_time < observation_duration:
+        while self.clock.time() - start_time < observation_duration:
             current_prices = self._get_leg_prices([leg1_key, leg2_key],isExit)
             leg1_price = current_prices.get(leg1_key, 0)
             leg2_price = current_prices.get(leg2_key, 0)
             
             # Only add valid prices
             if leg1_price > 0 and leg2_price > 0:
-                leg1_prices.append(leg1_price)
-                leg2_prices.append(leg2_price)
+                now = self.clock.time()
+                leg1_tracker.push(leg1_price, now)
+                leg2_tracker.push(leg2_price, now)
             
-            time.sleep(0.2)  # Check every 200ms
+            tick_waiter.wait(0.2)  # Wake on the next leg tick, at most 200ms apart
+        
+        return self._pair_observation_result(leg1_key, leg2_key, leg1_tracker, leg2_tracker, isExit=isExit)
+
+    def _pair_observation_result(self, leg1_key, leg2_key, leg1_tracker, leg2_tracker, now=None, isExit=False):
+        """Execution decision from the rolling price trackers of a leg pair, as of `now`."""
+        samples = leg1_tracker.samples(now)
+        leg2_tracker.samples(now)
         
         # Ensure we have enough data points
-        if len(leg1_prices) < 3:
-            self.logger.warning(f"Insufficient data for pair observation ({len(leg1_prices)} samples)")
+        if samples < 3:
+            self.logger.warning(f"Insufficient data for pair observation ({samples} samples)")
             return False
         
         # Analyze trends
-        leg1_trend, leg1_change = StrategyHelpers.analyze_price_trend(leg1_prices)
-        leg2_trend, leg2_change = StrategyHelpers.analyze_price_trend(leg2_prices)
+        leg1_trend, leg1_change = leg1_tracker.trend()
+        leg2_trend, leg2_change = leg2_tracker.trend()
         
         # Determine leg action type (BUY or SELL) from the first leg
         leg1_action = self.legs[leg1_key]['info'].get('action', self.global_action).upper()
@@ -342,16 +371,16 @@ class StratergyDirectIOCBox:
             'trend': 'strategic_execution',
             'execution_strategy': execution_strategy,
             'price_data': {
-                leg1_key: leg1_prices,
-                leg2_key: leg2_prices
+                leg1_key: leg1_tracker.prices(),
+                leg2_key: leg2_tracker.prices()
             },
             'trends': {
                 leg1_key: {'trend': leg1_trend, 'change': leg1_change},
                 leg2_key: {'trend': leg2_trend, 'change': leg2_change}
             },
             'final_prices': {
-                leg1_key: leg1_prices[-1],
-                leg2_key: leg2_prices[-1]
+                leg1_key: leg1_tracker.last,
+                leg2_key: leg2_tracker.last
             },
             'leg_action_type': leg_action_type
         }
@@ -621,23 +650,25 @@ class StratergyDirectIOCBox:
                 f"Legs: {leg1_key}, {leg2_key}"
             )
             
-            leg1_prices = []
-            leg2_prices = []
+            # Whole window kept; trend and volatility stay O(1) per query however many ticks arrive
+            leg1_tracker = PriceTrendTracker(observation_duration)
+            leg2_tracker = PriceTrendTracker(observation_duration)
             timestamps = []
-            start_time = time.time()
+            start_time = self.clock.time()
+            tick_waiter = self._leg_tick_waiter([leg1_key, leg2_key])
             
-            # Collect prices every 200ms for the specified duration
+            # Collect prices on every leg tick, at most 200ms apart, for the specified duration
             sample_count = 0
             valid_samples = 0
-            while time.time() - start_time < observation_duration:
-                current_time = time.time()
+            while self.clock.time() - start_time < observation_duration:
+                current_time = self.clock.time()
                 current_prices = self._get_leg_prices([leg1_key, leg2_key],isExit)
                 leg1_price = current_prices.get(leg1_key, 0)
                 leg2_price = current_prices.get(leg2_key, 0)
                 
                 if leg1_price > 0 and leg2_price > 0:  # Valid prices
-                    leg1_prices.append(leg1_price)
-                    leg2_prices.append(leg2_price)
+                    leg1_tracker.push(leg1_price, current_time)
+                    leg2_tracker.push(leg2_price, current_time)
                     timestamps.append(current_time)
                     valid_samples += 1
                     
@@ -661,25 +692,25 @@ class StratergyDirectIOCBox:
                         f"Valid samples: {valid_samples}/{sample_count}, {leg1_key}: {leg1_price:.2f}, {leg2_key}: {leg2_price:.2f}"
                     )
                 
-                time.sleep(0.2)  # 200ms intervals
+                tick_waiter.wait(0.2)  # Wake on the next leg tick, at most 200ms apart
             
             # Ensure we have enough valid data points
-            if len(leg1_prices) < 10:
+            if leg1_tracker.count < 10:
                 self.logger.warning(
-                    f"Insufficient valid data for case decision ({len(leg1_prices)} samples out of {sample_count} attempts)",
+                    f"Insufficient valid data for case decision ({leg1_tracker.count} samples out of {sample_count} attempts)",
                     "Defaulting to CASE A (STABLE)"
                 )
                 return False
             
             # Enhanced trend analysis for critical decision
-            leg1_trend, leg1_change = StrategyHelpers.analyze_price_trend(leg1_prices)
-            leg2_trend, leg2_change = StrategyHelpers.analyze_price_trend(leg2_prices)
+            leg1_trend, leg1_change = leg1_tracker.trend()
+            leg2_trend, leg2_change = leg2_tracker.trend()
             
             # Calculate additional statistics for better decision making
-            leg1_volatility = self._calculate_price_volatility(leg1_prices)
-            leg2_volatility = self._calculate_price_volatility(leg2_prices)
-            leg1_direction = "UP" if leg1_prices[-1] > leg1_prices[0] else "DOWN" if leg1_prices[-1] < leg1_prices[0] else "FLAT"
-            leg2_direction = "UP" if leg2_prices[-1] > leg2_prices[0] else "DOWN" if leg2_prices[-1] < leg2_prices[0] else "FLAT"
+            leg1_volatility = leg1_tracker.volatility()
+            leg2_volatility = leg2_tracker.volatility()
+            leg1_direction = leg1_tracker.direction()
+            leg2_direction = leg2_tracker.direction()
             
             # Log detailed analysis
             self.logger.info(
@@ -727,8 +758,8 @@ class StratergyDirectIOCBox:
                 'observation_duration': observation_duration,
                 'sample_count': sample_count,
                 'price_data': {
-                    leg1_key: leg1_prices,
-                    leg2_key: leg2_prices,
+                    leg1_key: leg1_tracker.prices(),
+                    leg2_key: leg2_tracker.prices(),
                     'timestamps': timestamps
                 },
                 'trends': {
@@ -746,8 +777,8 @@ class StratergyDirectIOCBox:
                     }
                 },
                 'final_prices': {
-                    leg1_key: leg1_prices[-1],
-                    leg2_key: leg2_prices[-1]
+                    leg1_key: leg1_tracker.last,
+                    leg2_key: leg2_tracker.last
                 },
                 'execution_order': {
                     'primary_leg': first_leg,
@@ -768,6 +799,17 @@ class StratergyDirectIOCBox:
             self.legs, leg_keys, self.global_action, self.data_helpers, is_exit
         )
 
+    def _subscribe_leg_ticks(self, extra_keys=()):
+        """Point the tick subscription at the current legs' depth keys."""
+        depth_keys = [leg['depth_key'] for leg in self.legs.values() if isinstance(leg, dict) and 'depth_key' in leg]
+        self.tick_subscription.set_keys(depth_keys + list(extra_keys))
+
+    def _leg_tick_waiter(self, leg_keys):
+        """Create a waiter that wakes when any of the given legs ticks."""
+        return self.tick_subscription.waiter(
+            self.legs[leg_key]['depth_key'] for leg_key in leg_keys if 'depth_key' in self.legs.get(leg_key, {})
+        )
+
     def _calculate_price_volatility(self, prices):
         """Calculate price volatility (standard deviation) for a price series."""
         return self.pricing_helpers.calculate_price_volatility(prices)
@@ -872,6 +914,9 @@ class StratergyDirectIOCBox:
         
         self._create_order_templates(all_leg_keys)
 
+        # Wake observers and order loops on ticks of the loaded legs
+        self._subscribe_leg_ticks()
+
     def _determine_exchange(self):
         """Determine exchange from first leg symbol."""
         first_leg = list(self.legs.values())[0]['data']
@@ -987,7 +1032,8 @@ class StratergyDirectIOCBox:
             })
             
             # Use execution helper to place order (supports Live/Simulation modes)
-            success , result = self.execution_helper.execute_order(self.order, order, uid, leg_key)
+            success , result = self.execution_helper.execute_order(self.order, order, uid, leg_key,
+                                                                   depth_key=self.legs.get(leg_key, {}).get('depth_key'))
 
             if success:
                 self.logger.success(f"Order executed successfully for {leg_key} ({self.execution_helper.execution_mode} mode)")
@@ -1055,7 +1101,8 @@ class StratergyDirectIOCBox:
             
             # Place initial order
             self.logger.info(f"Placing initial order for {leg_key}", f"Qty: {remaining_qty}, Price: {order['Limit_Price']}")
-            success, result = self.execution_helper.execute_order(self.order, order, uid, leg_key)
+            success, result = self.execution_helper.execute_order(self.order, order, uid, leg_key,
+                                                                  depth_key=self.legs.get(leg_key, {}).get('depth_key'))
             
             if not success:
                 self.logger.error(f"Initial order placement failed for {leg_key}")
@@ -1071,13 +1118,14 @@ class StratergyDirectIOCBox:
             total_filled_qty = 0
             attempt = 0
             previous_price = float(order["Limit_Price"])
+            tick_waiter = self._leg_tick_waiter([leg_key])
             while attempt < max_attempts and total_filled_qty < remaining_qty:
-                time.sleep(modify_interval)
+                tick_waiter.wait(modify_interval)  # Re-price as soon as the leg ticks
                 # Check order status
                 if self.execution_helper.execution_mode == "SIMULATION":
-                    status = result
+                    status = self.execution_helper.get_simulation_order(order_id) or result
                     current_filled = status.get('quantity', 0)
-                    filled_price = order.get('Limit_Price', 0)
+                    filled_price = status.get('executed_price', 0)
                     order_status = status.get('status', 'unknown')
                 else:
                     status = self.order.get_order_status(order_id, uid, order.get('remark', 'Lord_Shreeji'))
@@ -1119,7 +1167,7 @@ class StratergyDirectIOCBox:
                     'ProductCode': order.get('ProductCode')
                 }
                 
-                modify_result = self.order.modify_order(modify_details)
+                modify_result = self.execution_helper.modify_order(self.order, modify_details)
                 
                 if modify_result.get('status') == 'success':
                     self.logger.debug(f"Order modified for {leg_key}", f"New price: {new_limit_price}")
@@ -1134,9 +1182,9 @@ class StratergyDirectIOCBox:
                 final_filled = final_status.get('filled_qty', 0)
                 final_price = final_status.get('filled_price', 0)
             else:
-                final_status = result
+                final_status = self.execution_helper.get_simulation_order(order_id) or result
                 final_filled = final_status.get('quantity', 0)
-                final_price = order.get('Limit_Price', 0)
+                final_price = final_status.get('executed_price', 0)
             
             if final_filled >= order['Slice_Quantity']:
                 self.logger.success(f"MODIFY execution completed for {leg_key} after {attempt} attempts")
@@ -1216,18 +1264,19 @@ class StratergyDirectIOCBox:
                                f"Qty: {remaining_qty}, Price: {order['Limit_Price']}")
                 
                 # Place IOC order
-                success, result = self.execution_helper.execute_order(self.order, order, uid, leg_key)
+                success, result = self.execution_helper.execute_order(self.order, order, uid, leg_key,
+                                                                      depth_key=self.legs.get(leg_key, {}).get('depth_key'))
                 
                 if success:
                     # IOC order placed successfully - check fill
                     order_id = result.get('order_id') if isinstance(result, dict) else None
                     if order_id:
                         # Wait a moment for fill data
-                        time.sleep(0.2)
+                        self.clock.sleep(0.2)
                         if self.execution_helper.execution_mode == "SIMULATION":
-                            status = result
+                            status = self.execution_helper.get_simulation_order(order_id) or result
                             filled_qty = status.get('quantity', 0)
-                            filled_price = order['Limit_Price']
+                            filled_price = status.get('executed_price', 0)
                         else:
                             status = self.order.get_order_status(order_id, uid, order.get('remark', 'Lord_Shreeji'))
                             filled_qty = status.get('filled_qty', 0)
@@ -1257,7 +1306,7 @@ class StratergyDirectIOCBox:
                 
                 # Small delay before retry
                 if retry_count < max_retries:
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
             
             # All retries exhausted
             if total_filled_qty > 0:
@@ -1761,7 +1810,7 @@ class StratergyDirectIOCBox:
                         break
                     
                     print("\nStartin Again\n")
-                    time.sleep(1)  # Main loop delay
+                    self._leg_tick_waiter(all_leg_keys).wait(1)  # Main loop delay, cut short by a leg tick
                     
                 except KeyboardInterrupt:
                     self.logger.warning("Strategy execution interrupted by user")
@@ -1775,7 +1824,7 @@ class StratergyDirectIOCBox:
                         loop_error
                     )
                     self.execution_tracker.add_error("Main loop error", str(loop_error), loop_error)
-                    time.sleep(5)
+                    self.clock.sleep(5)
             
             # Successful completion
             self.execution_tracker.complete_execution("Strategy completed successfully")
@@ -1793,6 +1842,8 @@ class StratergyDirectIOCBox:
             try:
                 self.logger.info("Stopping global observation system")
                 self._stop_global_parallel_observation()
+                # Release the depth lease so the feed can drop this strategy's strikes
+                self.tick_subscription.close()
                 self.logger.success("Cleanup completed successfully")
             except Exception as cleanup_error:
                 self.logger.error("Error during cleanup", exception=cleanup_error)
@@ -2,13 +2,13 @@ import os
 import redis
 import json
 import orjson
-import time
 import threading
 import traceback
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from APIConnect.APIConnect import APIConnect
 from .order_class import Orders
+from .websocket.clock import WALL_CLOCK
 from constants.exchange import ExchangeEnum
 from constants.action import ActionEnum
 from constants.order_type import OrderTypeEnum
@@ -18,7 +18,9 @@ from constants.product_code import ProductCodeENum
 
 
 class StratergySequentialBox:
-    def __init__(self, paramsid) -> None:
+    def __init__(self, paramsid, clock=None) -> None:
+        # time source for observation windows, sleeps and IOC timeouts (ReplayClock in a backtest)
+        self.clock = clock or WALL_CLOCK
         # Redis connection
         self.r = redis.Redis(host="localhost", port=6379, db=0)
         
@@ -59,7 +61,7 @@ class StratergySequentialBox:
                 self.user_obj_dict[item.get("userid")] = APIConnect(
                     item.get("apikey"), "", "", False, "", False)
         
-        self.order = Orders(self.user_obj_dict)
+        self.order = Orders(self.user_obj_dict, clock=self.clock)
 
     def _load_params(self):
         """Load parameters from Redis with validation."""
@@ -103,10 +105,10 @@ class StratergySequentialBox:
                 if self.params != params:
                     self.params = params
                     self._init_legs_and_orders()
-                time.sleep(1)
+                self.clock.sleep(1)
             except Exception as e:
                 print(f"ERROR: failed to update live params: {e}")
-                time.sleep(1)
+                self.clock.sleep(1)
 
     # --- initialization helpers -------------------------------------------------
     def _depth_from_redis(self, streaming_symbol: str):
@@ -1027,7 +1029,7 @@ class StratergySequentialBox:
         while True:
             try:
                 if int(self.params.get('run_state', 0)) == 1:
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                     continue
                 
                 # Get current prices and validate
@@ -1036,7 +1038,7 @@ class StratergySequentialBox:
                 # print("leg prices : ",leg_prices)
                 if sum(leg_prices.values()) <= 0:
                     print(f"ERROR: Invalid leg prices: {leg_prices}")
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                     continue
                 # breakpoint()
                 # Display current state
@@ -1054,17 +1056,17 @@ class StratergySequentialBox:
                 
             except redis.RedisError as e:
                 print(f"ERROR: redis error in main loop: {e}")
-                time.sleep(0.5)
+                self.clock.sleep(0.5)
             except (KeyError, IndexError, TypeError, AttributeError, ValueError, orjson.JSONDecodeError) as e:
                 print(f"WARNING: transient data error in main loop: {e}")
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
             except KeyboardInterrupt:
                 print("INFO: KeyboardInterrupt received, exiting")
                 os._exit(0)
             except Exception as e:
                 print(f"ERROR: unexpected error in main loop: {e}")
                 print(traceback.format_exc())
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
 
     def _process_all_users(self, leg_prices):
         """Process all users concurrently."""
@@ -0,0 +1,105 @@
+"""
+Depth Routing Micro-Benchmark
+Per-tick CPU of resolving a depth tick to its Redis key, binary key, tick
+file key and metadata patch: inline derivation vs. the precomputed route table
+
+Usage:
+    python benchmark_depth_routing.py [--tokens 2000] [--ticks 200000]
+"""
+
+import argparse
+import random
+import time
+
+from depth_codec import binary_depth_key
+from depth_routing import DepthRouteTable
+from tick_data_manager import depth_file_key
+
+
+def make_option_mapper(n_tokens):
+    """Synthetic option_mapper shaped like refresh_strikes_and_options output"""
+    mapper = {}
+    for i in range(n_tokens):
+        strike = 20000 + 50 * (i // 2)
+        opt_type = "CE" if i % 2 == 0 else "PE"
+        mapper[f"{40000 + i}_NFO"] = {
+            "symbolname": "NIFTY",
+            "expiry": i % 4,
+            "strikeprice": f"{strike}.0",
+            "optiontype": opt_type,
+            "tradingsymbol": f"NIFTY25AUG{strike}{opt_type}",
+        }
+    return mapper
+
+
+def make_payload(streaming_symbol):
+    return {"response": {"data": {"symbol": streaming_symbol, "bidValues": [], "askValues": []}}}
+
+
+def resolve_inline(data, options_data):
+    """Per-tick resolution as DepthStreamerCallback did it before routes were precomputed"""
+    streaming_symbol = data.get('symbol')
+    details = options_data.get(streaming_symbol, {})
+    if details:
+        data.update(details)
+    symbolname = details.get('symbolname') or data.get('symbolname') or streaming_symbol
+    strike = details.get('strikeprice') or data.get('strikeprice')
+    opt_type = details.get('optiontype') or data.get('optiontype')
+    expiry = details.get('expiry') or data.get('expiry')
+    if symbolname and strike and opt_type:
+        redis_key = f"depth:{symbolname}_{strike}_{opt_type}-{expiry}"
+    else:
+        redis_key = f"depth:{symbolname or streaming_symbol}"
+    return redis_key, binary_depth_key(redis_key), depth_file_key(redis_key)
+
+
+def resolve_routed(data, routes, options_data):
+    """Per-tick resolution through the route table"""
+    redis_key, binary_key, file_key, details = routes.get(data.get('symbol'), options_data)
+    if details:
+        data.update(details)
+    return redis_key, binary_key, file_key
+
+
+def run(n_tokens, n_ticks):
+    options_data = make_option_mapper(n_tokens)
+    tokens = list(options_data.keys())
+    rng = random.Random(7)
+    payloads = [make_payload(rng.choice(tokens))["response"]["data"] for _ in range(n_ticks)]
+
+    routes = DepthRouteTable()
+    t0 = time.perf_counter()
+    routes.update(options_data, tokens)
+    build_time = time.perf_counter() - t0
+
+    # Both paths must agree on every destination
+    for data in payloads[:1000]:
+        assert resolve_inline(dict(data), options_data) == resolve_routed(dict(data), routes, options_data)
+
+    t0 = time.perf_counter()
+    for data in payloads:
+        resolve_inline(data, options_data)
+    inline_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for data in payloads:
+        resolve_routed(data, routes, options_data)
+    routed_time = time.perf_counter() - t0
+
+    print(f"[INFO] Tokens: {n_tokens:,} | Ticks: {n_ticks:,}")
+    print(f"[INFO] Route table build: {build_time * 1000:.2f} ms ({build_time / n_tokens * 1e6:.2f} us/token)")
+    print(f"[INFO] Inline resolution:  {inline_time / n_ticks * 1e9:8.0f} ns/tick")
+    print(f"[INFO] Routed resolution:  {routed_time / n_ticks * 1e9:8.0f} ns/tick")
+    print(f"[INFO] Speed-up: {inline_time / routed_time:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark depth tick key resolution")
+    parser.add_argument("--tokens", type=int, default=2000, help="Number of subscribed tokens")
+    parser.add_argument("--ticks", type=int, default=200000, help="Number of simulated ticks")
+    args = parser.parse_args()
+    run(args.tokens, args.ticks)
+
+
+if __name__ == "__main__":
+    main()
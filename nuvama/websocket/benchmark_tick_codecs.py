@@ -0,0 +1,188 @@
+"""
+Tick Codec Benchmark
+Write/read throughput and compression ratio of each tick file codec on a
+recorded session, using the same block writer TickDataManager uses
+
+Usage:
+    python benchmark_tick_codecs.py [--base-dir tick_data] [--date 20250811]
+                                    [--max-ticks 200000] [--batch 500]
+                                    [--codecs none gzip lz4 zstd] [--levels gzip=1,6 zstd=1,3,9]
+                                    [--depth-delta]
+
+Without recorded files for the date, synthetic depth ticks are used.
+--depth-delta writes depth ticks as keyframes plus deltas (TickDataManager depth_delta).
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import orjson
+
+from tick_codecs import CODEC_EXTENSIONS, DEFAULT_LEVELS, TickBlockWriter, available_codecs, open_tick_reader
+from tick_data_manager import TickDataReader, encode_tick_line
+from depth_delta import DepthDeltaEncoder
+
+
+def load_session_ticks(base_dir, date_str, max_ticks):
+    """Tick entries of a recorded session (depth and quotes files), oldest file first"""
+    reader = TickDataReader(base_dir)
+    if date_str is None:
+        dates = reader.list_available_dates()
+        if not dates:
+            return [], None
+        date_str = dates[-1]
+    files = reader.list_available_files(date_str)
+    date_path = os.path.join(base_dir, date_str)
+    paths = [os.path.join(date_path, data_type, name) for data_type in ("quotes", "depth") for name in files[data_type]]
+    paths += [os.path.join(date_path, name) for name in files["ticks"]]
+
+    ticks = []
+    for path in sorted(paths):
+        for tick in reader.read_tick_file(path):
+            ticks.append(tick)
+            if len(ticks) >= max_ticks:
+                return ticks, date_str
+    return ticks, date_str
+
+
+def _level(rng, price):
+    return {"no": str(rng.randint(1, 9)), "price": f"{price:.2f}", "qty": str(75 * rng.randint(1, 40))}
+
+
+def synthetic_ticks(n_ticks, n_tokens=400):
+    """
+    Depth ticks shaped like the live feed (prices/quantities as strings): each
+    tick of a token moves its book a little - a couple of levels change, the
+    mid occasionally shifts a tick - instead of redrawing all ten levels
+    """
+    rng = random.Random(7)
+    books = {}
+    ticks = []
+    ts = time.time()
+    for i in range(n_ticks):
+        token = i % n_tokens
+        book = books.get(token)
+        if book is None or rng.random() < 0.05:
+            mid = 100 + token % 50 + rng.randint(-20, 20) * 0.05
+            book = books[token] = {
+                "askValues": [_level(rng, mid + 0.05 * (j + 1)) for j in range(5)],
+                "bidValues": [_level(rng, mid - 0.05 * j) for j in range(5)],
+                "ltp": f"{mid:.2f}", "ltt": "11/08/2025 14:44:24", "symbol": f"{40000 + token}_NFO",
+                "taq": str(rng.randint(1000, 90000)), "tbq": str(rng.randint(1000, 90000)),
+                "symbolname": "NIFTY", "strikeprice": f"{24000 + 50 * (token // 2)}.0",
+                "optiontype": "CE" if token % 2 == 0 else "PE", "expiry": 0,
+            }
+        else:
+            book = books[token] = dict(book)
+            for _ in range(rng.randint(1, 3)):
+                side = rng.choice(("askValues", "bidValues"))
+                levels = book[side] = list(book[side])
+                j = rng.randrange(5)
+                levels[j] = _level(rng, float(levels[j]["price"]))
+            book["taq"] = str(rng.randint(1000, 90000))
+            book["tbq"] = str(rng.randint(1000, 90000))
+        ts += 0.002
+        ticks.append({"timestamp": ts, "type": "depth",
+                      "redis_key": f"depth:NIFTY_{book['strikeprice']}_{book['optiontype']}-0",
+                      "data": orjson.dumps({"response": {"data": book, "streaming_type": "quote2"}})})
+    return ticks
+
+
+def encode_lines(ticks, depth_delta=False):
+    """
+    JSONL lines as TickDataManager writes them; with depth_delta each key gets
+    a keyframe every keyframe_interval of its ticks, as in the per-key files
+    """
+    if not depth_delta:
+        return [encode_tick_line(tick) for tick in ticks]
+    encoder = DepthDeltaEncoder()
+    return [encode_tick_line(encoder.encode(tick)) for tick in ticks]
+
+
+def run_codec(lines, codec, level, batch, work_dir, block_ticks=2000):
+    """(write MB/s, read MB/s, compressed bytes) for one codec/level"""
+    path = os.path.join(work_dir, f"bench_{codec}_{level}{CODEC_EXTENSIONS[codec]}")
+    raw_bytes = sum(len(line) for line in lines)
+
+    t0 = time.perf_counter()
+    writer = TickBlockWriter(path, codec, level)
+    for start in range(0, len(lines), batch):
+        # one write + sync flush per TickDataManager buffer flush, a new block every block_ticks
+        writer.write(b"".join(lines[start:start + batch]))
+        if (start + batch) % block_ticks < batch:
+            writer.end_block()
+        else:
+            writer.flush()
+    writer.close()
+    write_time = time.perf_counter() - t0
+    size = os.path.getsize(path)
+
+    t0 = time.perf_counter()
+    with open_tick_reader(path) as f:
+        read_lines = sum(1 for _ in f)
+    read_time = time.perf_counter() - t0
+    assert read_lines == len(lines), f"{codec}: read {read_lines} of {len(lines)} lines"
+
+    os.remove(path)
+    mb = raw_bytes / 1024 / 1024
+    return mb / write_time, mb / read_time, size
+
+
+def parse_levels(values):
+    levels = {}
+    for value in values or []:
+        codec, _, numbers = value.partition("=")
+        levels[codec] = [int(n) for n in numbers.split(",") if n]
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tick file compression codecs")
+    parser.add_argument("--base-dir", default="tick_data", help="Tick data base directory")
+    parser.add_argument("--date", default=None, help="Session date YYYYMMDD (latest when omitted)")
+    parser.add_argument("--max-ticks", type=int, default=200000, help="Ticks to load from the session")
+    parser.add_argument("--batch", type=int, default=500, help="Ticks per flush (TickDataManager buffer_size)")
+    parser.add_argument("--codecs", nargs="+", default=None, help="Codecs to test (default: all installed; lz4 needs the lz4 package, zstd needs zstandard)")
+    parser.add_argument("--levels", nargs="+", default=None, help="Per-codec levels, e.g. gzip=1,6 zstd=1,3,9")
+    parser.add_argument("--depth-delta", action="store_true", help="Write depth ticks as keyframes plus deltas")
+    args = parser.parse_args()
+
+    ticks, date_str = load_session_ticks(args.base_dir, args.date, args.max_ticks)
+    if ticks:
+        print(f"[INFO] Session {date_str}: {len(ticks):,} ticks from {args.base_dir}")
+    else:
+        ticks = synthetic_ticks(args.max_ticks)
+        print(f"[WARNING] No recorded ticks found - using {len(ticks):,} synthetic depth ticks")
+    full_bytes = sum(len(encode_tick_line(tick)) for tick in ticks)
+    lines = encode_lines(ticks, args.depth_delta)
+    raw_bytes = sum(len(line) for line in lines)
+    print(f"[INFO] Raw JSONL: {raw_bytes / 1024 / 1024:.1f} MB | flush batch: {args.batch}")
+    if args.depth_delta:
+        print(f"[INFO] Depth deltas: {full_bytes / 1024 / 1024:.1f} MB of full snapshots -> "
+              f"{raw_bytes / 1024 / 1024:.1f} MB ({full_bytes / raw_bytes:.1f}x)")
+
+    installed = available_codecs()
+    codecs = args.codecs or installed
+    levels = parse_levels(args.levels)
+    work_dir = tempfile.mkdtemp(prefix="tick_codec_bench_")
+    try:
+        print(f"\n{'codec':<6} {'level':>5} {'write MB/s':>11} {'read MB/s':>10} {'size MB':>8} {'ratio':>6}")
+        print("-" * 52)
+        for codec in codecs:
+            if codec not in installed:
+                print(f"{codec:<6} (not installed)")
+                continue
+            for level in levels.get(codec, [DEFAULT_LEVELS[codec]]):
+                write_rate, read_rate, size = run_codec(lines, codec, level, args.batch, work_dir)
+                print(f"{codec:<6} {str(level):>5} {write_rate:>11.1f} {read_rate:>10.1f} "
+                      f"{size / 1024 / 1024:>8.2f} {raw_bytes / size:>6.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import redis
 import orjson
 import time
+import threading
 from APIConnect.APIConnect import APIConnect
 import json
 import traceback
@@ -25,11 +26,99 @@ except ImportError:
     sys.path.append(current_dir)
     from tick_data_manager import TickDataManager
 
+try:
+    from shared_depth_book import SharedDepthBook, DEFAULT_BOOK_NAME
+except ImportError:
+    sys.path.append(current_dir)
+    from shared_depth_book import SharedDepthBook, DEFAULT_BOOK_NAME
+
+try:
+    from depth_codec import encode_depth
+except ImportError:
+    sys.path.append(current_dir)
+    from depth_codec import encode_depth
+
+try:
+    from depth_routing import DepthRouteTable, build_depth_route
+except ImportError:
+    sys.path.append(current_dir)
+    from depth_routing import DepthRouteTable, build_depth_route
+
+try:
+    from subscription_manager import (
+        DepthSubscriptionManager, DEPTH_SUBSCRIPTION_CHANNEL, DEFAULT_LEASE_TTL,
+        MAPPER_OWNER_PREFIX, LEASE_OWNER_PREFIX, DEPTH_ACTIVE_KEY, load_depth_leases, release_depth_lease,
+        save_active_tokens, load_active_tokens
+    )
+except ImportError:
+    sys.path.append(current_dir)
+    from subscription_manager import (
+        DepthSubscriptionManager, DEPTH_SUBSCRIPTION_CHANNEL, DEFAULT_LEASE_TTL,
+        MAPPER_OWNER_PREFIX, LEASE_OWNER_PREFIX, DEPTH_ACTIVE_KEY, load_depth_leases, release_depth_lease,
+        save_active_tokens, load_active_tokens
+    )
+
+try:
+    from redis_tick_writer import CoalescingRedisWriter
+except ImportError:
+    sys.path.append(current_dir)
+    from redis_tick_writer import CoalescingRedisWriter
+
+try:
+    from latency_stats import FeedLatencyStats
+except ImportError:
+    sys.path.append(current_dir)
+    from latency_stats import FeedLatencyStats
+
+try:
+    from depth_dedupe import DepthTickDeduper, DEDUPE_DROP, DEDUPE_MODES
+except ImportError:
+    sys.path.append(current_dir)
+    from depth_dedupe import DepthTickDeduper, DEDUPE_DROP, DEDUPE_MODES
+
+try:
+    from sharded_ingestion import ShardedIngestionSupervisor, SHARD_BY_HASH, SHARD_BY_EXCHANGE
+except ImportError:
+    sys.path.append(current_dir)
+    from sharded_ingestion import ShardedIngestionSupervisor, SHARD_BY_HASH, SHARD_BY_EXCHANGE
+
 from basic_functions import common_functions
 class CentralSocketData:
-    def __init__(self, enable_tick_logging=True, tick_data_base_dir="tick_data"):
+    # strike spacing per index, used to turn strike_expiry_steps into a distance from ATM
+    STRIKE_STEPS = {"NIFTY": 50, "SENSEX": 100}
+
+    def __init__(self, enable_tick_logging=True, tick_data_base_dir="tick_data",
+                 enable_shared_book=True, shared_book_name=DEFAULT_BOOK_NAME,
+                 redis_write_window_ms=2.0, strike_expiry_steps=15, lease_ttl=DEFAULT_LEASE_TTL,
+                 shard=None, enable_latency_stats=True, warm_start=False, enable_columnar_archive=False,
+                 tick_codec="lz4", depth_delta_archive=False, depth_dedupe=DEDUPE_DROP):
+        """
+        Args:
+            warm_start: Skip the option universe refresh and its settling sleeps when
+                        option_mapper is already in Redis (restart during the session);
+                        run_central_socket then resubscribes the saved depth token set
+            depth_delta_archive: Write depth ticks to the tick files as keyframes plus
+                                 changed levels/fields only
+            depth_dedupe: Depth tick re-sends with unchanged prices/quantities are
+                          'drop'ped before Redis/shared book/tick files, only 'count'ed,
+                          or 'keep' (not fingerprinted)
+        """
         self.r = redis.Redis(host='localhost', port=6379, db=0)
-        self.api_connect = APIConnect("iBe07GpBTEbbhg", "", "", True, "",False)
+        # Per-stage callback timings, feed-to-store latency and exchange skew histograms
+        self.latency_stats = FeedLatencyStats() if enable_latency_stats else None
+        self.latency_stats_key = "feed_latency_stats" if shard is None else f"feed_latency_stats:{shard.index}"
+        # With sharded ingestion this instance only subscribes tokens its ShardSpec owns;
+        # the primary shard also runs the index quotes feed and the strike refresh
+        self.shard = shard
+        self.is_primary = shard is None or shard.is_primary
+        # Feed callbacks hand latest values to this writer so Redis latency never stalls the socket
+        self.redis_writer = CoalescingRedisWriter(
+            redis.Redis(host='localhost', port=6379, db=0),
+            window_ms=redis_write_window_ms,
+            latency_stats=self.latency_stats
+        )
+        self.depth_deduper = DepthTickDeduper(depth_dedupe)
+        self.api_connect = self._connect()
         
         # Initialize tick data manager for high-performance tick logging
         self.enable_tick_logging = enable_tick_logging
@@ -38,8 +127,11 @@ class CentralSocketData:
                 self.tick_manager = TickDataManager(
                     base_directory=tick_data_base_dir,
                     enable_compression=True,  # Compress files to save space
+                    codec=tick_codec,  # lz4 keeps the writer thread off the CPU limit gzip hits on busy days
                     buffer_size=500,  # Buffer 500 ticks before writing
-                    flush_interval=3.0  # Flush every 3 seconds
+                    flush_interval=3.0,  # Flush every 3 seconds
+                    enable_columnar=enable_columnar_archive,  # Typed .npz columns for fast analysis/replay
+                    depth_delta=depth_delta_archive  # Keyframes + changed levels instead of full snapshots
                 )
                 print(f"[SUCCESS] Tick data logging enabled - Directory: {tick_data_base_dir}")
             except Exception as e:
@@ -50,17 +142,95 @@ class CentralSocketData:
             self.tick_manager = None
             print("[WARNING] Tick data logging disabled")
         
+        # Shared-memory depth book for same-host strategies (Redis stays the cross-host source)
+        self.shared_book = None
+        if enable_shared_book:
+            try:
+                self.shared_book = SharedDepthBook.create(shared_book_name)
+                print(f"[SUCCESS] Shared depth book enabled - Name: {shared_book_name}")
+            except Exception as e:
+                print(f"[ERROR] Failed to initialize shared depth book: {e}")
+                self.shared_book = None
+        
         if self.r.exists("option_mapper"):
             self.options_data = orjson.loads(self.r.get("option_mapper").decode())
         else:
             self.options_data = {}
+        # token -> (redis key, binary key, metadata patch), filled when tokens are subscribed
+        self.depth_routes = DepthRouteTable()
+
+        # Desired vs. subscribed depth tokens; only the delta reaches the feed
+        self.depth_active_key = DEPTH_ACTIVE_KEY if shard is None else f"{DEPTH_ACTIVE_KEY}:{shard.index}"
+        self.depth_subscriptions = DepthSubscriptionManager(
+            self.depth_streamer_start, self._resubscribe_depth_tokens,
+            token_filter=shard.owns if shard else None,
+            on_active_change=lambda tokens: save_active_tokens(self.r, self.depth_active_key, tokens)
+        )
+        self.depth_key_tokens = {}  # depth redis key -> streaming token, for strategy leases
+        self._index_depth_keys(self.options_data)
+        self.index_ltp = {}
+        self.strike_expiry_steps = strike_expiry_steps
+        self.lease_ttl = lease_ttl
+        self.maintenance_stopped = threading.Event()
         self.quotes_streamer = self.api_connect.initReducedQuotesStreaming()
         self.depth_streamer = self.api_connect.initDepthStreaming()
         
         
         self.reduced_quotes = ['-29','-101']
-        self.quotes_streamer_start()
-        time.sleep(2)
+        self.warm_start = warm_start and bool(self.options_data)
+        if self.is_primary:
+            self.quotes_streamer_start()
+            if self.warm_start:
+                print("[INFO] Warm start - reusing option_mapper from Redis")
+            else:
+                time.sleep(2)
+                self.refresh_option_universe()
+                time.sleep(2)
+        self.strikes_updates_channel = self.r.pubsub()
+        self.strikes_updates_channel.subscribe('strikes_updates', DEPTH_SUBSCRIPTION_CHANNEL)
+
+    def _connect(self):
+        # the session is reused from Redis when present, so this only opens a new feed connection
+        return APIConnect("iBe07GpBTEbbhg", "", "", True, "",False)
+
+    def restore_depth_subscriptions(self):
+        """Resubscribe the depth tokens saved by the previous run before the mapper/leases are re-applied"""
+        t0 = time.perf_counter()
+        tokens = self.depth_subscriptions.restore_active(load_active_tokens(self.r, self.depth_active_key))
+        print(f"[INFO] Restored {len(tokens)} depth subscriptions in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        return tokens
+
+    def reconnect_feed(self):
+        """
+        Warm restart: replace only the feed connection and resubscribe at once
+
+        option_mapper, routes, subscription state, the Redis writer, tick
+        logging and the shared book are kept; the quotes feed and every active
+        depth token are subscribed on the new connection before returning.
+        """
+        t0 = time.perf_counter()
+        with self.depth_subscriptions.lock:  # keep listener/maintenance reconciles off the old streamer
+            for streamer in (self.quotes_streamer, self.depth_streamer):
+                try:
+                    streamer.shutdown()
+                except Exception:
+                    pass
+            self.api_connect = self._connect()
+            self.quotes_streamer = self.api_connect.initReducedQuotesStreaming()
+            self.depth_streamer = self.api_connect.initDepthStreaming()
+            try:
+                self.api_connect.feedobj.feed_time_start()
+            except Exception:
+                pass
+            if self.is_primary:
+                self.quotes_streamer_start()
+            tokens = sorted(self.depth_subscriptions.active)
+            self.depth_streamer_start(tokens)
+        print(f"[SUCCESS] Warm reconnect - {len(tokens)} depth tokens resubscribed in "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def refresh_option_universe(self):
+        """Rebuild and publish option_mapper for the index expiries and equity list"""
         self.common_obj = common_functions()
         
         # if not self.options_data:
@@ -76,29 +246,121 @@ class CentralSocketData:
         equity_symbols = [symbol.decode('utf-8') for symbol in equity_symbols]
         print("Equity Symbols for options fetching: ", equity_symbols)
         self.common_obj.refresh_strikes_and_options(expiry=0,symbol=equity_symbols,exchange="NSE")
-            
-                
-        time.sleep(2)
-        self.strikes_updates_channel = self.r.pubsub()
-        self.strikes_updates_channel.subscribe('strikes_updates')
 
     def listen_for_strikes_updates(self):
         try:
             for message in self.strikes_updates_channel.listen():
                 if message['type'] == 'message':
+                    channel = message['channel'].decode() if isinstance(message['channel'], bytes) else message['channel']
+                    if channel == DEPTH_SUBSCRIPTION_CHANNEL:
+                        owner = message['data'].decode() if isinstance(message['data'], bytes) else message['data']
+                        self.apply_depth_leases([owner])
+                        continue
                     print("New Subscription received")
                     new_subscription_data = json.loads(message['data'])
                     self.options_data = self.options_data | new_subscription_data # strike prices list
-                    # self.depth_streamer_stop()
-                    # time.sleep(3)  # Optional: wait before restarting
-                    self.depth_streamer_start(list(new_subscription_data.keys()))
+                    self.depth_routes.update(self.options_data, new_subscription_data.keys())
+                    # the batch replaces what its symbol/expiry held before; dropped strikes go at the next maintenance pass
+                    self.sync_depth_subscriptions(new_subscription_data)
         except Exception as e:
+            if self.maintenance_stopped.is_set():
+                return  # channel closed by depth_shutdown after a restart
             raise e
+
+    def _index_depth_keys(self, mapper):
+        """Map depth redis keys back to streaming tokens so leases can name keys"""
+        for token, details in mapper.items():
+            self.depth_key_tokens[build_depth_route(token, details)[0]] = token
+
+    def sync_depth_subscriptions(self, mapper):
+        """Hand an option_mapper batch to the subscription manager, one owner per symbol/expiry"""
+        self._index_depth_keys(mapper)
+        batches = {}
+        for token, details in mapper.items():
+            owner = f"{MAPPER_OWNER_PREFIX}{details.get('symbolname')}:{details.get('expiry')}"
+            batches.setdefault(owner, []).append(token)
+        for owner, tokens in batches.items():
+            self.depth_subscriptions.set_owner_tokens(owner, tokens)
+        # get_strikes unions cached strikes, so filter far ones before they get subscribed again
+        self.depth_subscriptions.expire_far_strikes(self.options_data, *self._atm_window())
+        self.depth_subscriptions.reconcile(allow_removals=False)
+
+    def apply_depth_leases(self, owners=None):
+        """
+        Apply strategy depth leases (all of them when owners is None)
+
+        Leases not refreshed within lease_ttl belong to strategies that died
+        without releasing them and are dropped.
+        """
+        leases = load_depth_leases(self.r, owners)
+        now = time.time()
+        if owners is None:
+            owners = set(leases) | set(o[len(LEASE_OWNER_PREFIX):] for o in self.depth_subscriptions.owners(LEASE_OWNER_PREFIX))
+        for owner in owners:
+            lease = leases.get(owner)
+            if lease and now - float(lease.get("ts", 0)) > self.lease_ttl:
+                print(f"[INFO] Depth lease expired: {owner}")
+                release_depth_lease(self.r, owner)
+                lease = None
+            tokens = [self.depth_key_tokens[k] for k in (lease or {}).get("keys", []) if k in self.depth_key_tokens]
+            self.depth_subscriptions.set_owner_tokens(f"{LEASE_OWNER_PREFIX}{owner}", tokens)
+        self.depth_subscriptions.reconcile(allow_removals=False)
+
+    def _resubscribe_depth_tokens(self, removed, remaining):
+        """Unsubscribe removed tokens (the depth feed only unsubscribes as a whole, so resubscribe the rest)"""
+        self.depth_streamer_stop()
+        self.depth_routes.remove(removed)
+        self.depth_deduper.forget(removed)
+        self.depth_streamer_start(remaining)
+
+    def _atm_window(self):
+        """(ATM strike, max allowed distance) per index with a known LTP"""
+        atm_by_symbol = {}
+        max_distance_by_symbol = {}
+        # shards without the quotes feed take the index level from Redis
+        index_ltp = self.index_ltp if self.is_primary else self._index_ltp_from_redis()
+        for symbol, ltp in list(index_ltp.items()):
+            step = self.STRIKE_STEPS.get(symbol)
+            if step and ltp:
+                atm_by_symbol[symbol] = round(ltp / step) * step
+                max_distance_by_symbol[symbol] = self.strike_expiry_steps * step
+        return atm_by_symbol, max_distance_by_symbol
+
+    def _index_ltp_from_redis(self):
+        index_ltp = {}
+        for symbol in self.STRIKE_STEPS:
+            try:
+                raw = self.r.get(f"reduced_quotes:{symbol}")
+                if raw:
+                    index_ltp[symbol] = float(orjson.loads(raw)['response']['data'].get('ltp') or 0)
+            except Exception as e:
+                print(f"[WARNING] Could not read {symbol} index quote: {e}")
+        return index_ltp
+
+    def maintain_depth_subscriptions(self):
+        """Expire leases and far-from-ATM strikes, then apply removals and additions together"""
+        self.apply_depth_leases()
+        atm_by_symbol, max_distance_by_symbol = self._atm_window()
+        expired = self.depth_subscriptions.expire_far_strikes(self.options_data, atm_by_symbol, max_distance_by_symbol)
+        if expired:
+            print(f"[INFO] Expired {expired} strikes far from ATM {atm_by_symbol}")
+        self.depth_subscriptions.reconcile(allow_removals=True)
+
+    def subscription_maintenance_loop(self, interval=30.0):
+        """Periodic maintain_depth_subscriptions until depth_shutdown"""
+        while not self.maintenance_stopped.wait(interval):
+            try:
+                self.maintain_depth_subscriptions()
+            except Exception as e:
+                print(f"[ERROR] Depth subscription maintenance failed: {e}")
                
     def ReducedQuotesFeedCallback(self,response):
         try:
+            recv_ts = time.time()
+            t_start = time.perf_counter()
             print("ReducedQuotesFeedCallback response received", response)
             response = orjson.loads(response.encode())
+            t_parse = time.perf_counter()
             if str(response['response']['data']['sym']) == "-29":
                 symbol = "NIFTY"
             elif str(response['response']['data']['sym']) == "-101":
@@ -106,17 +368,34 @@ class CentralSocketData:
             else:
                 symbol = "OTHER"
             response['response']['data']['symbol'] = symbol
+            # index level used to expire far strikes
+            try:
+                self.index_ltp[symbol] = float(response['response']['data'].get('ltp') or 0)
+            except (TypeError, ValueError):
+                pass
+            t_enrich = time.perf_counter()
+            # serialized once - the same bytes go to the tick file and to Redis
+            payload = orjson.dumps(response)
+            t_serialize = time.perf_counter()
             
             # Save tick data to files for simulation (high-performance, non-blocking)
             if self.enable_tick_logging and self.tick_manager:
                 try:
-                    self.tick_manager.save_quotes_tick(symbol, response)
+                    self.tick_manager.save_quotes_tick(symbol, payload, timestamp=recv_ts)
                 except Exception as tick_error:
                     # Don't let tick logging errors affect main processing
                     pass
+            t_tick_log = time.perf_counter()
             # breakpoint()
-            # Continue with original Redis storage
-            self.r.set(f"reduced_quotes:{symbol}", orjson.dumps(response).decode())
+            # Continue with original Redis storage (conflated, pipelined by the writer thread)
+            self.redis_writer.submit(f"reduced_quotes:{symbol}", payload,
+                                     recv_ts=recv_ts, feed_type="quotes")
+            if self.latency_stats is not None:
+                self.latency_stats.record_stages("quotes", [
+                    ("start", t_start), ("parse", t_parse), ("enrich", t_enrich), ("serialize", t_serialize),
+                    ("tick_log", t_tick_log), ("redis_enqueue", time.perf_counter())
+                ])
+                self.latency_stats.record_exchange_skew("quotes", response['response']['data'].get('ltt'), recv_ts)
         except Exception as e:
             print(f"Error processing response (callbackfun): {str(e)}")
             
@@ -126,6 +405,7 @@ class CentralSocketData:
         self.quotes_streamer.unsubscribeReducedQuotesFeed()
     def shutdown(self):
         self.quotes_streamer.shutdown()
+        self.redis_writer.stop()
         # Stop tick data manager if running
         if self.enable_tick_logging and self.tick_manager:
             try:
@@ -137,9 +417,15 @@ class CentralSocketData:
     def get_tick_data_stats(self):
         """Get tick data logging statistics"""
         if self.enable_tick_logging and self.tick_manager:
-            return self.tick_manager.get_stats()
+            stats = self.tick_manager.get_stats()
         else:
-            return {"tick_logging": "disabled"}
+            stats = {"tick_logging": "disabled"}
+        stats["redis_writer"] = self.redis_writer.get_stats()
+        stats["depth_subscriptions"] = self.depth_subscriptions.get_stats()
+        stats["depth_dedupe"] = self.depth_deduper.get_stats()
+        if self.latency_stats is not None:
+            stats["latency"] = self.latency_stats.snapshot()
+        return stats
     
     def print_tick_data_stats(self):
         """Print tick data logging statistics"""
@@ -147,49 +433,73 @@ class CentralSocketData:
             self.tick_manager.print_stats()
         else:
             print("[INFO] Tick data logging is disabled")
+        self.redis_writer.print_stats()
+        self.depth_deduper.print_stats()
+        if self.latency_stats is not None:
+            self.latency_stats.print_stats()
+
+    def publish_latency_stats(self):
+        """Store the latency histogram snapshot under latency_stats_key for dashboards/strategies"""
+        if self.latency_stats is not None:
+            self.r.set(self.latency_stats_key, orjson.dumps(self.latency_stats.snapshot()))
     
     def DepthStreamerCallback(self, response):
         try:
+            recv_ts = time.time()
+            t_start = time.perf_counter()
             response = orjson.loads(response.encode())
-            # print(type(response))
-            # streaming symbol contained in the payload
-            streaming_symbol = response['response']['data'].get('symbol')
-            details = self.options_data.get(streaming_symbol, {})
-            # merge details into the response data safely
-            try:
-                if details:
-                    # ensure we're updating the dict, not the symbol string
-                    response['response']['data'].update(details)
-            except Exception as e:
-                print(f"Failed to merge option details into response data: {e}")
-
-            # construct redis key defensively using available fields
-            symbolname = details.get('symbolname') or response['response']['data'].get('symbolname') or streaming_symbol
-            strike = details.get('strikeprice') or response['response']['data'].get('strikeprice')
-            opt_type = details.get('optiontype') or response['response']['data'].get('optiontype')
-            expiry = details.get('expiry') or response['response']['data'].get('expiry')
-
-            if symbolname and strike and opt_type:
-                redis_key = f"depth:{symbolname}_{strike}_{opt_type}-{expiry}"
-            else:
-                # fallback to a generic key containing the streaming symbol
-                redis_key = f"depth:{symbolname or streaming_symbol}"
+            data = response['response']['data']
+            t_parse = time.perf_counter()
+            # unchanged re-sends stop here - no Redis write, tick file line or strategy wakeup
+            if self.depth_deduper.is_duplicate(data.get('symbol'), data):
+                return
+            t_dedupe = time.perf_counter()
+            # destination keys and option metadata were resolved when the token was subscribed
+            redis_key, binary_key, file_key, details = self.depth_routes.get(data.get('symbol'), self.options_data)
+            if details:
+                data.update(details)
+            t_enrich = time.perf_counter()
+            # serialized once - the same bytes go to the tick file and to Redis
+            payload = orjson.dumps(response)
+            t_serialize = time.perf_counter()
 
             # Save tick data to files for simulation (high-performance, non-blocking)
             if self.enable_tick_logging and self.tick_manager:
                 try:
-                    self.tick_manager.save_depth_tick(redis_key, response)
+                    self.tick_manager.save_depth_tick(redis_key, payload, file_key, timestamp=recv_ts)
                 except Exception as tick_error:
                     # Don't let tick logging errors affect main processing
                     pass
+            t_tick_log = time.perf_counter()
 
-            # Continue with original Redis storage
-            self.r.set(redis_key, orjson.dumps(response).decode())
+            # Publish to the local shared-memory book before Redis so same-host readers see it first
+            if self.shared_book:
+                try:
+                    self.shared_book.publish(redis_key, data)
+                except Exception as book_error:
+                    print(f"Failed to publish depth to shared book: {book_error}")
+            t_shared_book = time.perf_counter()
+
+            # Continue with original Redis storage (conflated, pipelined by the writer thread)
+            self.redis_writer.submit(redis_key, payload, recv_ts=recv_ts, feed_type="depth")
+            # Packed record next to the JSON so pricing reads skip JSON parsing and float() calls
+            try:
+                self.redis_writer.submit(binary_key, encode_depth(data), notify=False)
+            except Exception as encode_error:
+                print(f"Failed to encode binary depth for {redis_key}: {encode_error}")
+            if self.latency_stats is not None:
+                self.latency_stats.record_stages("depth", [
+                    ("start", t_start), ("parse", t_parse), ("dedupe", t_dedupe), ("enrich", t_enrich),
+                    ("serialize", t_serialize), ("tick_log", t_tick_log), ("shared_book", t_shared_book),
+                    ("redis_enqueue", time.perf_counter())
+                ])
+                self.latency_stats.record_exchange_skew("depth", data.get('ltt'), recv_ts)
         except Exception as e:
             print(f"Error processing response (DepthStreamerCallback): {str(e)}")
     
     def depth_streamer_start(self,symbols=[]):
         if symbols:
+            self.depth_routes.update(self.options_data, symbols)
             self.depth_streamer.subscribeDepthFeed(symbols, self.DepthStreamerCallback)
         else:
             pass
@@ -197,6 +507,15 @@ class CentralSocketData:
         self.depth_streamer.unsubscribeDepthFeed()
     def depth_shutdown(self):
         self.depth_streamer.shutdown()
+        self.maintenance_stopped.set()
+        try:
+            self.strikes_updates_channel.close()
+        except Exception:
+            pass
+        self.redis_writer.stop()
+        if self.shared_book:
+            self.shared_book.close()
+            self.shared_book = None
         # Stop tick data manager if running
         if self.enable_tick_logging and self.tick_manager:
             try:
@@ -207,43 +526,84 @@ class CentralSocketData:
         
         
     
-import threading
-if __name__ == "__main__":
-    # Statistics printing thread
-    def print_stats_periodically(socket_instance):
-        """Print tick data statistics every 60 seconds"""
-        while True:
-            try:
-                time.sleep(60)  # Print stats every minute
-                socket_instance.print_tick_data_stats()
-            except Exception as e:
-                print(f"[ERROR] Error printing stats: {e}")
-                break
-    
-    socket = CentralSocketData() 
-    # breakpoint()
-    t1 = threading.Thread(target=socket.listen_for_strikes_updates, daemon=True)
-    t1.start()
-    
+
+def print_stats_periodically(socket_holder, interval=60):
+    """Print tick data statistics every 60 seconds for whichever instance is current"""
+    while True:
+        try:
+            time.sleep(interval)  # Print stats every minute
+            if socket_holder.get("socket"):
+                socket_holder["socket"].print_tick_data_stats()
+                socket_holder["socket"].publish_latency_stats()
+        except Exception as e:
+            print(f"[ERROR] Error printing stats: {e}")
+
+
+def run_central_socket(shard=None, ready_event=None, warm_start=False, warm_restart=True, **socket_kwargs):
+    """
+    Run the feed with automatic restarts (single process, or one ingestion shard)
+
+    Args:
+        shard: ShardSpec when running as one worker of sharded ingestion
+        ready_event: Set once the primary instance has refreshed strikes and subscribed
+        warm_start: Start from the option_mapper and depth token set cached in Redis
+                    instead of refreshing the option universe (process restarted mid-session)
+        warm_restart: On a feed failure only reconnect the websocket and resubscribe,
+                      keeping the instance; a failed warm reconnect falls back to a cold rebuild
+        socket_kwargs: Extra CentralSocketData arguments
+    """
+    socket_kwargs.setdefault("enable_tick_logging", True)  # Enable tick data logging
+    socket_kwargs.setdefault("tick_data_base_dir", "tick_data")  # Base directory for tick files
+    socket_holder = {"socket": None}
+
     # Start stats printing thread
-    t2 = threading.Thread(target=print_stats_periodically, args=(socket,), daemon=True)
+    t2 = threading.Thread(target=print_stats_periodically, args=(socket_holder,), daemon=True)
     t2.start()
-    
+
+    socket = None
+    started = False  # socket finished its cold/warm start and owns the listener threads
+    failures = 0  # consecutive restarts without a healthy check in between
+    start_warm = warm_start  # how the next instance is built
     while True:
         try:
-            print("Starting Central Socket Data with Tick Logging...")
-            socket = CentralSocketData(
-                enable_tick_logging=True,  # Enable tick data logging
-                tick_data_base_dir="tick_data"  # Base directory for tick files
-            ) 
-            if socket.r.exists("option_mapper"):
-                socket.options_data = orjson.loads(socket.r.get("option_mapper"))
-            try:
-                socket.api_connect.feedobj.feed_time_start()
-            except Exception as e:
-                pass
-            socket.quotes_streamer_start()
-            socket.depth_streamer_start(list(socket.options_data.keys()))
+            if socket is not None:
+                try:
+                    socket.reconnect_feed()
+                except Exception as e:
+                    print(f"[ERROR] Warm reconnect failed: {e} - rebuilding Central Socket Data")
+                    try:
+                        socket.shutdown()
+                        socket.depth_shutdown()
+                    except:
+                        pass
+                    socket = None
+                    started = False
+                    # the cached mapper/token set may be what broke the feed - refresh the option universe
+                    start_warm = False
+            if socket is None:
+                print(f"Starting Central Socket Data with Tick Logging... {shard or ''}")
+                socket = CentralSocketData(shard=shard, warm_start=start_warm, **socket_kwargs)
+                start_warm = warm_start
+                socket_holder["socket"] = socket
+                if socket.r.exists("option_mapper"):
+                    socket.options_data = orjson.loads(socket.r.get("option_mapper"))
+                try:
+                    socket.api_connect.feedobj.feed_time_start()
+                except Exception as e:
+                    pass
+                if socket.is_primary:
+                    socket.quotes_streamer_start()
+                if socket.warm_start:
+                    # ticks flow again before the mapper and leases are re-applied
+                    socket.restore_depth_subscriptions()
+                socket.sync_depth_subscriptions(socket.options_data)
+                socket.apply_depth_leases()
+                # strikes/lease updates go to the instance that owns the live feed
+                threading.Thread(target=socket.listen_for_strikes_updates, daemon=True).start()
+                threading.Thread(target=socket.subscription_maintenance_loop, daemon=True).start()
+                if ready_event is not None:
+                    ready_event.set()
+                started = True
           
             while True:
                 try:
@@ -262,6 +622,7 @@ if __name__ == "__main__":
                     else:
                         raise Exception("Timer object not found")
                     
+                    failures = 0
                     time.sleep(0.5)
                 except KeyboardInterrupt:
                     print("\n[INFO] Keyboard interrupt - shutting down gracefully...")
@@ -274,12 +635,19 @@ if __name__ == "__main__":
         except Exception as e:
             print(traceback.format_exc())
             print("Error Occured: ",e, " Restarting...")
-            try:
-                socket.shutdown()
-                socket.depth_shutdown()
-            except:
-                pass
-            time.sleep(2)  # Longer delay before restart
+            failures += 1
+            if not (warm_restart and started):
+                try:
+                    socket.shutdown()
+                    socket.depth_shutdown()
+                except:
+                    pass
+                socket = None
+                started = False
+                time.sleep(2)  # Longer delay before restart
+            else:
+                # reconnect at once after a healthy run, back off if reconnects keep failing
+                time.sleep(0 if failures == 1 else 2)
         except KeyboardInterrupt:
             print("\n[INFO] Keyboard interrupt - shutting down gracefully...")
             try:
@@ -290,4 +658,28 @@ if __name__ == "__main__":
             except:
                 pass
             os._exit(1)
-            
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Central market data ingestion")
+    parser.add_argument("--shards", type=int, default=1, help="Number of feed connections / worker processes")
+    parser.add_argument("--shard-by", choices=[SHARD_BY_HASH, SHARD_BY_EXCHANGE], default=SHARD_BY_HASH,
+                        help="Split depth tokens by token hash or by exchange")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Reuse option_mapper and depth subscriptions cached in Redis instead of refreshing strikes")
+    parser.add_argument("--depth-delta", action="store_true",
+                        help="Archive depth ticks as keyframes plus changed levels/fields")
+    parser.add_argument("--columnar-archive", action="store_true",
+                        help="Also archive ticks as typed .npz columns under {date}/columnar (fast analysis/replay)")
+    parser.add_argument("--depth-dedupe", choices=DEDUPE_MODES, default=DEDUPE_DROP,
+                        help="Unchanged depth re-sends: drop them, count them only, or keep them unchecked")
+    args = parser.parse_args()
+
+    if args.shards > 1:
+        ShardedIngestionSupervisor(args.shards, args.shard_by, warm_start=args.warm_start,
+                                   depth_delta_archive=args.depth_delta, depth_dedupe=args.depth_dedupe,
+                                   enable_columnar_archive=args.columnar_archive).supervise()
+    else:
+        run_central_socket(warm_start=args.warm_start, depth_delta_archive=args.depth_delta,
+                           depth_dedupe=args.depth_dedupe, enable_columnar_archive=args.columnar_archive)
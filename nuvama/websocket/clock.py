@@ -0,0 +1,132 @@
+"""
+Strategy Clock
+Time source injected into strategies, Orders and TickDataSimulator: the wall
+clock live, or a replay clock driven by the tick stream so a recorded session
+can be backtested as fast as it can be read
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class WallClock:
+    """Live time - time.time()/time.sleep() and plain condition timeouts"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def wait_for(self, condition: threading.Condition, predicate: Callable, timeout: Optional[float] = None):
+        """condition.wait_for with the caller holding the condition"""
+        return condition.wait_for(predicate, timeout)
+
+
+WALL_CLOCK = WallClock()
+
+
+class ReplayClock:
+    """
+    Virtual time advanced by the replay
+
+    TickDataSimulator calls advance() with each tick's timestamp; time()
+    returns the latest one, sleep() and wait_for() timeouts end when the
+    replayed time passes their deadline instead of after real seconds, so an
+    observation window of 30s takes as long as reading 30s of ticks.
+
+    When advance() releases a sleeper it waits (at most settle_timeout real
+    seconds) for that thread to block on the clock again before returning,
+    so a strategy reacts at the replayed time it woke at rather than after
+    the replay has raced ahead. stop() releases every waiter for good.
+    """
+
+    def __init__(self, start: float = 0.0, settle_timeout: float = 0.05, poll_interval: float = 0.001):
+        self.now = start
+        self.settle_timeout = settle_timeout
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.stopped = False
+        self._deadlines: Dict[int, float] = {}  # thread ident -> replayed time it waits for
+        self._woken = set()
+
+    def time(self) -> float:
+        return self.now
+
+    def set_time(self, timestamp: float):
+        """Jump to a timestamp (start of a replay window); unlike advance() it may go back"""
+        with self.condition:
+            self.now = timestamp
+            self.condition.notify_all()
+
+    def due(self, timestamp: float) -> bool:
+        """Whether advancing to timestamp would wake a waiter (the replay flushes buffered ticks first)"""
+        with self.condition:
+            return timestamp > self.now and any(deadline <= timestamp for deadline in self._deadlines.values())
+
+    def advance(self, timestamp: float):
+        """Move replayed time forward to a tick's timestamp and let the waiters it releases run"""
+        with self.condition:
+            if timestamp <= self.now:
+                return
+            self.now = timestamp
+            woken = [ident for ident, deadline in self._deadlines.items() if deadline <= timestamp]
+            if not woken:
+                return
+            self._woken.update(woken)
+            self.condition.notify_all()
+            if self.settle_timeout:
+                self.condition.wait_for(lambda: not self._woken or self.stopped, self.settle_timeout)
+            self._woken.clear()
+
+    def stop(self):
+        """End of the replay - every current and future wait returns immediately"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def _enter(self, deadline: float):
+        ident = threading.get_ident()
+        with self.condition:
+            self._deadlines[ident] = deadline
+            if self._woken:
+                self._woken.discard(ident)  # blocked again - advance() may move on
+                self.condition.notify_all()
+        return ident
+
+    def _leave(self, ident: int):
+        # a woken thread stays in _woken until its next wait (or the settle timeout)
+        with self.condition:
+            self._deadlines.pop(ident, None)
+
+    def sleep(self, seconds: float):
+        if seconds <= 0 or self.stopped:
+            return
+        deadline = self.now + seconds
+        ident = self._enter(deadline)
+        try:
+            with self.condition:
+                self.condition.wait_for(lambda: self.now >= deadline or self.stopped)
+        finally:
+            self._leave(ident)
+
+    def wait_for(self, condition: threading.Condition, predicate: Callable, timeout: Optional[float] = None):
+        """
+        condition.wait_for with the timeout in replayed seconds; the caller
+        holds `condition` (e.g. a TickSubscription's), which is released
+        between short polls of the replayed time
+        """
+        result = predicate()
+        if result or self.stopped or (timeout is not None and timeout <= 0):
+            return result
+        deadline = None if timeout is None else self.now + timeout
+        ident = self._enter(deadline if deadline is not None else float("inf"))
+        try:
+            while True:
+                condition.wait(self.poll_interval)
+                result = predicate()
+                if result or self.stopped or (deadline is not None and self.now >= deadline):
+                    return result
+        finally:
+            self._leave(ident)
@@ -0,0 +1,130 @@
+"""
+Binary Depth Codec
+Fixed-layout binary record written next to each depth JSON blob so pricing
+code reads packed numbers instead of re-parsing vendor strings
+"""
+
+import struct
+import time
+from typing import Dict, Any, Optional
+
+
+DEPTH_BIN_PREFIX = "depthbin:"
+DEPTH_PREFIX = "depth:"
+DEFAULT_LEVELS = 5
+
+# version, levels, n_bid, n_ask, ltp (paise), recv_ts, tbq, taq
+_VERSION = 1
+_HEADER = struct.Struct("<BBBBidqq")
+_PRICE_SCALE = 100
+
+_level_structs: Dict[int, struct.Struct] = {}
+
+
+def _levels_struct(levels: int) -> struct.Struct:
+    """bid px (paise), bid qty, ask px (paise), ask qty - always `levels` entries per side"""
+    st = _level_structs.get(levels)
+    if st is None:
+        st = struct.Struct(f"<{levels}i{levels}I{levels}i{levels}I")
+        _level_structs[levels] = st
+    return st
+
+
+def binary_depth_key(depth_key: str) -> str:
+    """'depth:NIFTY_25000.0_CE-1' -> 'depthbin:NIFTY_25000.0_CE-1'"""
+    if depth_key.startswith(DEPTH_PREFIX):
+        return DEPTH_BIN_PREFIX + depth_key[len(DEPTH_PREFIX):]
+    return DEPTH_BIN_PREFIX + depth_key
+
+
+def _paise(value) -> int:
+    try:
+        return int(round(float(value) * _PRICE_SCALE)) if value not in (None, "") else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _qty(value) -> int:
+    try:
+        return int(float(value)) if value not in (None, "") else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+class DepthRecord:
+    """
+    Decoded depth snapshot
+
+    ``prices``/``quantities`` are keyed by the vendor side names ('bidValues',
+    'askValues') so pricing helpers can use the same side_key for records and
+    JSON payloads. Only populated levels are included.
+    """
+
+    __slots__ = ("recv_ts", "ltp", "tbq", "taq", "prices", "quantities")
+
+    def __init__(self, recv_ts, ltp, tbq, taq, bid_px, bid_qty, ask_px, ask_qty):
+        self.recv_ts = recv_ts
+        self.ltp = ltp
+        self.tbq = tbq
+        self.taq = taq
+        self.prices = {"bidValues": bid_px, "askValues": ask_px}
+        self.quantities = {"bidValues": bid_qty, "askValues": ask_qty}
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Rebuild the Redis depth JSON shape for code that still expects it"""
+        data = {
+            side: [{"price": px, "qty": qty} for px, qty in zip(self.prices[side], self.quantities[side])]
+            for side in ("bidValues", "askValues")
+        }
+        data.update({"ltp": self.ltp, "tbq": self.tbq, "taq": self.taq, "recv_ts": self.recv_ts})
+        return {"response": {"data": data, "streaming_type": "depth_record"}}
+
+
+def encode_depth(data: Dict[str, Any], recv_ts: Optional[float] = None, levels: int = DEFAULT_LEVELS) -> bytes:
+    """
+    Pack a depth payload (``response['response']['data']``) into a fixed-size record
+
+    Prices are stored as integer paise (exact for exchange tick sizes), quantities
+    as unsigned ints; unused levels are zero filled.
+    """
+    bids = data.get("bidValues") or ()
+    asks = data.get("askValues") or ()
+    n_bid = min(len(bids), levels)
+    n_ask = min(len(asks), levels)
+
+    bid_px = [0] * levels
+    bid_qty = [0] * levels
+    ask_px = [0] * levels
+    ask_qty = [0] * levels
+    for i in range(n_bid):
+        bid_px[i] = _paise(bids[i].get("price"))
+        bid_qty[i] = _qty(bids[i].get("qty", bids[i].get("quantity")))
+    for i in range(n_ask):
+        ask_px[i] = _paise(asks[i].get("price"))
+        ask_qty[i] = _qty(asks[i].get("qty", asks[i].get("quantity")))
+
+    header = _HEADER.pack(
+        _VERSION, levels, n_bid, n_ask,
+        _paise(data.get("ltp")),
+        recv_ts if recv_ts is not None else time.time(),
+        _qty(data.get("tbq")), _qty(data.get("taq"))
+    )
+    return header + _levels_struct(levels).pack(*bid_px, *bid_qty, *ask_px, *ask_qty)
+
+
+def decode_depth(raw: bytes) -> Optional[DepthRecord]:
+    """Unpack a record produced by encode_depth (None for empty/unknown input)"""
+    if not raw or len(raw) < _HEADER.size:
+        return None
+    version, levels, n_bid, n_ask, ltp, recv_ts, tbq, taq = _HEADER.unpack_from(raw, 0)
+    if version != _VERSION:
+        return None
+    values = _levels_struct(levels).unpack_from(raw, _HEADER.size)
+    scale = _PRICE_SCALE
+    return DepthRecord(
+        recv_ts, ltp / scale, tbq, taq,
+        tuple(p / scale for p in values[:n_bid]),
+        values[levels:levels + n_bid],
+        tuple(p / scale for p in values[2 * levels:2 * levels + n_ask]),
+        values[3 * levels:3 * levels + n_ask],
+    )
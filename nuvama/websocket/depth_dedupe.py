@@ -0,0 +1,76 @@
+"""
+Depth Tick Deduplication
+Per-token fingerprint of the last depth tick, so re-sent depth with unchanged
+prices and quantities can be dropped before it reaches Redis, the shared book
+and the tick files
+"""
+
+from typing import Dict, Any, Iterable
+
+import orjson
+
+
+DEDUPE_DROP = "drop"    # skip duplicates entirely
+DEDUPE_COUNT = "count"  # fingerprint and count duplicates, but still process them
+DEDUPE_KEEP = "keep"    # no fingerprinting at all
+
+DEDUPE_MODES = (DEDUPE_DROP, DEDUPE_COUNT, DEDUPE_KEEP)
+
+# fields that change on a re-send without the book changing
+DEFAULT_IGNORED_FIELDS = ("ltt",)
+
+
+class DepthTickDeduper:
+    """
+    Last-fingerprint check per token
+
+    is_duplicate() hashes the raw depth data (before the option metadata is
+    merged in) without the ignored fields and compares it with the token's
+    previous tick. It is called from the depth callback thread only; the
+    counters are plain ints read by get_stats().
+    """
+
+    def __init__(self, mode: str = DEDUPE_DROP, ignored_fields: Iterable[str] = DEFAULT_IGNORED_FIELDS):
+        if mode not in DEDUPE_MODES:
+            raise ValueError(f"Unknown depth dedupe mode '{mode}' - expected one of {', '.join(DEDUPE_MODES)}")
+        self.mode = mode
+        self.ignored_fields = frozenset(ignored_fields)
+        self.last_hash: Dict[Any, int] = {}
+
+        self.stats = {"checked": 0, "duplicates": 0, "dropped": 0}
+
+    def _fingerprint(self, data: Dict[Any, Any]) -> int:
+        ignored = self.ignored_fields
+        return hash(orjson.dumps({k: v for k, v in data.items() if k not in ignored}))
+
+    def is_duplicate(self, token, data: Dict[Any, Any]) -> bool:
+        """True when the tick should be dropped (mode drop and nothing changed since the token's last tick)"""
+        if self.mode == DEDUPE_KEEP:
+            return False
+        fingerprint = self._fingerprint(data)
+        self.stats["checked"] += 1
+        if self.last_hash.get(token) != fingerprint:
+            self.last_hash[token] = fingerprint
+            return False
+        self.stats["duplicates"] += 1
+        if self.mode == DEDUPE_DROP:
+            self.stats["dropped"] += 1
+            return True
+        return False
+
+    def forget(self, tokens: Iterable):
+        """Drop fingerprints of unsubscribed tokens, so a later resubscription publishes its first tick"""
+        for token in tokens:
+            self.last_hash.pop(token, None)  # single dict ops, safe next to the callback thread
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.copy()
+        stats["mode"] = self.mode
+        stats["tokens"] = len(self.last_hash)
+        stats["duplicate_rate"] = stats["duplicates"] / stats["checked"] if stats["checked"] else 0.0
+        return stats
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f"[INFO] Depth dedupe ({stats['mode']}): {stats['duplicates']:,} of {stats['checked']:,} ticks "
+              f"unchanged ({stats['duplicate_rate']:.1%}), {stats['dropped']:,} dropped")
@@ -0,0 +1,173 @@
+"""
+Depth Delta Encoding
+Keyframe + delta records for depth ticks in the tick files: a full snapshot
+is written periodically per key and only the changed levels/fields in between,
+and readers rebuild every full snapshot from the last keyframe
+"""
+
+from typing import Dict, Any, Optional
+
+import orjson
+
+
+SIDES = ("bidValues", "askValues")
+
+# delta record fields: "f" changed data fields, "x" removed data fields,
+# "b"/"a" changed bid/ask levels by index, "bn"/"an" level counts when they
+# changed, "r" the response-level fields (everything outside "data") when any changed
+_SIDE_FIELDS = {"bidValues": ("b", "bn"), "askValues": ("a", "an")}
+_MISSING = object()
+
+
+def _split(payload) -> Optional[tuple]:
+    """(response fields without data, data) of a feed depth payload, None for any other shape"""
+    response = payload.get("response") if isinstance(payload, dict) else None
+    if not isinstance(response, dict) or not isinstance(response.get("data"), dict):
+        return None
+    return {k: v for k, v in response.items() if k != "data"}, response["data"]
+
+
+def diff_depth(previous: Dict[Any, Any], current: Dict[Any, Any]) -> Optional[Dict[str, Any]]:
+    """Delta turning payload `previous` into `current`; None when either is not a feed depth payload"""
+    old, new = _split(previous), _split(current)
+    if old is None or new is None:
+        return None
+    old_response, old_data = old
+    new_response, new_data = new
+
+    delta = {}
+    changed = {k: v for k, v in new_data.items() if k not in SIDES and old_data.get(k, _MISSING) != v}
+    if changed:
+        delta["f"] = changed
+    removed = [k for k in old_data if k not in new_data and k not in SIDES]
+    if removed:
+        delta["x"] = removed
+
+    for side in SIDES:
+        if (side in old_data) != (side in new_data):
+            return None  # a side appearing/disappearing is rare enough for a keyframe
+        old_levels = old_data.get(side) or []
+        new_levels = new_data.get(side) or []
+        if not isinstance(old_levels, list) or not isinstance(new_levels, list):
+            return None
+        levels_key, count_key = _SIDE_FIELDS[side]
+        levels = {str(i): level for i, level in enumerate(new_levels)
+                  if i >= len(old_levels) or old_levels[i] != level}
+        if levels:
+            delta[levels_key] = levels
+        if len(new_levels) != len(old_levels):
+            delta[count_key] = len(new_levels)
+
+    response_changed = {k: v for k, v in new_response.items() if old_response.get(k, _MISSING) != v}
+    if response_changed or len(new_response) != len(old_response):
+        delta["r"] = new_response
+    return delta
+
+
+def apply_depth_delta(previous: Dict[Any, Any], delta: Dict[str, Any]) -> Dict[Any, Any]:
+    """Full payload rebuilt from the previous snapshot and a delta record (previous is left untouched)"""
+    old_response, old_data = _split(previous)
+    data = dict(old_data)
+    for key in delta.get("x", ()):
+        data.pop(key, None)
+    data.update(delta.get("f", {}))
+
+    for side in SIDES:
+        levels_key, count_key = _SIDE_FIELDS[side]
+        levels = list(old_data.get(side) or [])
+        count = delta.get(count_key, len(levels))
+        del levels[count:]
+        levels.extend([None] * (count - len(levels)))
+        for index, level in delta.get(levels_key, {}).items():
+            levels[int(index)] = level
+        if side in old_data:
+            data[side] = levels
+
+    response = dict(delta.get("r", old_response))
+    response["data"] = data
+    return {**previous, "response": response}
+
+
+def _delta_key(tick_entry: Dict[Any, Any]) -> str:
+    return tick_entry.get("redis_key") or tick_entry.get("symbol") or ""
+
+
+class DepthDeltaEncoder:
+    """
+    Turns depth tick entries into keyframes or delta entries, per Redis key
+
+    A key's first tick after reset() - and every keyframe_interval-th one - is
+    kept as the full entry (its serialized payload bytes are reused as is);
+    the others become {"timestamp", "type", "redis_key", "delta"} entries.
+    The tick file writer resets the encoder whenever it starts a new index
+    block, so each block decodes on its own. Not thread safe: it is driven by
+    the file writer thread.
+    """
+
+    def __init__(self, keyframe_interval: int = 500):
+        self.keyframe_interval = keyframe_interval
+        self.last: Dict[str, Dict[Any, Any]] = {}
+        self.since_keyframe: Dict[str, int] = {}
+
+    def reset(self):
+        """Forget every key, so the next tick of each key is a keyframe"""
+        self.last.clear()
+        self.since_keyframe.clear()
+
+    def encode(self, tick_entry: Dict[Any, Any]) -> Dict[Any, Any]:
+        if tick_entry.get("type") != "depth":
+            return tick_entry
+        key = _delta_key(tick_entry)
+        payload = tick_entry["data"]
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = orjson.loads(payload)
+
+        previous = self.last.get(key)
+        self.last[key] = payload
+        count = self.since_keyframe.get(key, 0)
+        if previous is not None and count < self.keyframe_interval:
+            delta = diff_depth(previous, payload)
+            if delta is not None:
+                self.since_keyframe[key] = count + 1
+                return {"timestamp": tick_entry["timestamp"], "type": "depth", "redis_key": key, "delta": delta}
+
+        self.since_keyframe[key] = 1
+        return tick_entry
+
+
+class DepthDeltaDecoder:
+    """
+    Rebuilds full depth ticks from keyframes and delta entries, per Redis key
+
+    Entries without "delta" pass through (and become the key's snapshot), so
+    files written without delta encoding decode unchanged. A delta whose
+    keyframe was not read - a block skipped or torn - is dropped. Rebuilt
+    payloads share unchanged levels with the decoder's snapshot, so treat
+    them as read-only.
+    """
+
+    def __init__(self):
+        self.last: Dict[str, Dict[Any, Any]] = {}
+        self.missing_keyframe = 0
+
+    def reset(self):
+        self.last.clear()
+
+    def decode(self, tick: Dict[Any, Any]) -> Optional[Dict[Any, Any]]:
+        if tick.get("type") != "depth":
+            return tick
+        key = _delta_key(tick)
+        delta = tick.pop("delta", None)
+        if delta is None:
+            if _split(tick.get("data")) is not None:
+                self.last[key] = tick["data"]
+            return tick
+
+        previous = self.last.get(key)
+        if previous is None:
+            self.missing_keyframe += 1
+            return None
+        payload = apply_depth_delta(previous, delta)
+        self.last[key] = payload
+        tick["data"] = payload
+        return tick
@@ -0,0 +1,76 @@
+"""
+Depth Routing Table
+Per-token destination keys and option metadata precomputed at subscription
+time so the depth callback resolves a tick with a single dict lookup
+"""
+
+import sys
+from typing import Dict, Any, Iterable, Tuple
+
+try:
+    from depth_codec import binary_depth_key
+    from tick_data_manager import depth_file_key
+except ImportError:
+    from .depth_codec import binary_depth_key
+    from .tick_data_manager import depth_file_key
+
+
+# (redis_key, binary_key, tick file key, metadata patch merged into the payload data)
+DepthRoute = Tuple[str, str, str, Dict[str, Any]]
+
+
+def build_depth_route(streaming_symbol: str, details: Dict[str, Any]) -> DepthRoute:
+    """
+    Resolve the Redis key for one streaming symbol from its option_mapper entry
+
+    Mirrors the key the depth callback always produced:
+    depth:{symbolname}_{strike}_{opt_type}-{expiry}, or depth:{symbol} when the
+    token has no usable mapper entry.
+    """
+    details = details or {}
+    symbolname = details.get('symbolname') or streaming_symbol
+    strike = details.get('strikeprice')
+    opt_type = details.get('optiontype')
+    expiry = details.get('expiry')
+
+    if symbolname and strike and opt_type:
+        redis_key = f"depth:{symbolname}_{strike}_{opt_type}-{expiry}"
+    else:
+        redis_key = f"depth:{symbolname or streaming_symbol}"
+
+    redis_key = sys.intern(redis_key)
+    return (
+        redis_key,
+        sys.intern(binary_depth_key(redis_key)),
+        sys.intern(depth_file_key(redis_key)),
+        dict(details),
+    )
+
+
+class DepthRouteTable:
+    """Token -> DepthRoute map rebuilt from option_mapper whenever subscriptions change"""
+
+    def __init__(self):
+        self.routes: Dict[str, DepthRoute] = {}
+
+    def update(self, options_data: Dict[str, Any], tokens: Iterable[str] = None):
+        """(Re)compute routes for tokens (all mapper entries when tokens is None)"""
+        if tokens is None:
+            tokens = options_data.keys()
+        for token in tokens:
+            self.routes[sys.intern(token)] = build_depth_route(token, options_data.get(token, {}))
+
+    def remove(self, tokens: Iterable[str]):
+        for token in tokens:
+            self.routes.pop(token, None)
+
+    def get(self, streaming_symbol: str, options_data: Dict[str, Any] = None) -> DepthRoute:
+        """Route for a token, building (and caching) it for tokens subscribed without a route"""
+        route = self.routes.get(streaming_symbol)
+        if route is None:
+            route = build_depth_route(streaming_symbol, (options_data or {}).get(streaming_symbol, {}))
+            self.routes[streaming_symbol] = route
+        return route
+
+    def __len__(self):
+        return len(self.routes)
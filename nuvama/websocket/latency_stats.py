@@ -0,0 +1,169 @@
+"""
+Feed Latency Statistics
+Fixed-bucket histograms of per-stage callback timings, feed-to-store latency
+and exchange-timestamp skew for the market data feeds
+"""
+
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+
+# Upper bucket bounds in microseconds (last bucket is open ended)
+STAGE_BUCKETS_US = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+# Exchange timestamps have 1 s resolution, so skew is bucketed in milliseconds
+SKEW_BUCKETS_MS = (250, 500, 1000, 1500, 2000, 3000, 5000, 10000, 30000, 60000)
+
+IST = timezone(timedelta(hours=5, minutes=30))
+LTT_FORMATS = {
+    "depth": "%d/%m/%Y %H:%M:%S",        # 11/08/2025 14:44:24
+    "quotes": "%d %b %Y, %I:%M:%S %p",   # 08 Aug 2025, 03:31:01 PM
+}
+
+
+class LatencyHistogram:
+    """Counts per fixed bucket plus count/sum/min/max; values are recorded in the bucket unit"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
+
+    def record(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if self.max is None or value > self.max:
+                self.max = value
+            if self.min is None or value < self.min:
+                self.min = value
+
+    def _percentile(self, counts, count, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        target = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            counts = list(self.counts)
+            count, total, low, high = self.count, self.total, self.min, self.max
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "min": low,
+            "max": high,
+            "p50": self._percentile(counts, count, 0.50) if count else None,
+            "p99": self._percentile(counts, count, 0.99) if count else None,
+            "buckets": dict(zip(labels, counts))
+        }
+
+
+class FeedLatencyStats:
+    """
+    Histograms keyed by feed type ('depth', 'quotes') and stage
+
+    Stages recorded by CentralSocketData callbacks are in microseconds
+    ('parse', 'enrich', 'serialize', 'tick_log', 'shared_book',
+    'redis_enqueue', 'callback'); the Redis writer adds 'feed_to_store' (arrival until the
+    pipeline carrying the tick has executed) per feed type and 'flush' under
+    'redis_writer'. 'exchange_skew' is receive time minus the payload's ltt,
+    in milliseconds.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        # one-entry parse cache per feed type - most ticks in a second share their ltt
+        self._ltt_cache: Dict[str, tuple] = {}
+
+    def _histogram(self, feed_type: str, stage: str) -> LatencyHistogram:
+        stages = self.histograms.get(feed_type)
+        if stages is None or stage not in stages:
+            with self.lock:
+                stages = self.histograms.setdefault(feed_type, {})
+                if stage not in stages:
+                    stages[stage] = LatencyHistogram(SKEW_BUCKETS_MS if stage == "exchange_skew" else STAGE_BUCKETS_US)
+        return stages[stage]
+
+    def record(self, feed_type: str, stage: str, seconds: float):
+        """Record a stage duration given in seconds"""
+        self._histogram(feed_type, stage).record(seconds * 1e6)
+
+    def record_stages(self, feed_type: str, marks):
+        """
+        Record consecutive stages from perf_counter marks
+
+        Args:
+            marks: [(stage_name, perf_counter_at_end_of_stage), ...] preceded by
+                   ('start', t0); 'callback' covers the whole span
+        """
+        previous = marks[0][1]
+        for stage, mark in marks[1:]:
+            self._histogram(feed_type, stage).record((mark - previous) * 1e6)
+            previous = mark
+        self._histogram(feed_type, "callback").record((previous - marks[0][1]) * 1e6)
+
+    def record_exchange_skew(self, feed_type: str, ltt: Optional[str], recv_ts: float):
+        """Record receive time minus the exchange timestamp string carried by the payload"""
+        if not ltt:
+            return
+        cached = self._ltt_cache.get(feed_type)
+        if cached and cached[0] == ltt:
+            exchange_ts = cached[1]
+        else:
+            fmt = LTT_FORMATS.get(feed_type)
+            if fmt is None:
+                return
+            try:
+                exchange_ts = datetime.strptime(ltt, fmt).replace(tzinfo=IST).timestamp()
+            except (TypeError, ValueError):
+                return
+            self._ltt_cache[feed_type] = (ltt, exchange_ts)
+        self._histogram(feed_type, "exchange_skew").record((recv_ts - exchange_ts) * 1000.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            items = [(feed_type, dict(stages)) for feed_type, stages in self.histograms.items()]
+        return {
+            "since": self.started_at,
+            "updated": time.time(),
+            "feeds": {
+                feed_type: {stage: histogram.snapshot() for stage, histogram in stages.items()}
+                for feed_type, stages in items
+            }
+        }
+
+    def print_stats(self):
+        """Print p50/p99/max per feed type and stage"""
+        snapshot = self.snapshot()
+        print("\n[INFO] FEED LATENCY STATISTICS (stages in us, exchange_skew in ms)")
+        print("-" * 40)
+        for feed_type, stages in snapshot["feeds"].items():
+            for stage, stats in stages.items():
+                if not stats["count"]:
+                    continue
+                print(f"[INFO] {feed_type:<12} {stage:<14} n={stats['count']:,} "
+                      f"p50<={stats['p50']} p99<={stats['p99']} max={stats['max']:.0f}")
+        print("-" * 40)
@@ -0,0 +1,218 @@
+"""
+Coalescing Redis Tick Writer
+Takes latest-value market data writes off the feed thread, conflates them per
+key over a short window and flushes each window in one pipelined MSET
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+import redis
+
+try:
+    from tick_notifier import tick_channel
+except ImportError:
+    from .tick_notifier import tick_channel
+
+
+class CoalescingRedisWriter:
+    """
+    Latest-value writer for market data keys
+
+    Feed callbacks call submit(), which only stores the payload in a per-key
+    pending dict and returns; a background thread wakes on the first pending
+    write, waits ``window_ms`` for more updates to arrive and then writes the
+    newest payload of every key in a single pipeline (MSET + tick notifications).
+    A key that ticks several times inside one window is written once.
+    """
+
+    def __init__(self, redis_client, window_ms=2.0, notify=True, retry_interval=0.5, latency_stats=None):
+        """
+        Initialize the writer
+
+        Args:
+            redis_client: Redis connection used only by the writer thread
+            window_ms: Conflation window in milliseconds (1-5 ms keeps strategies current)
+            notify: Publish tick_updates:<key> for every written key (see tick_notifier)
+            retry_interval: Seconds to back off after a Redis error before retrying
+            latency_stats: Optional FeedLatencyStats receiving feed_to_store and flush timings
+        """
+        self.r = redis_client
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.notify = notify
+        self.retry_interval = retry_interval
+        self.latency_stats = latency_stats
+
+        self._pending: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.worker_thread = None
+        self.is_running = False
+
+        # Statistics (mutated under _lock so snapshots are consistent)
+        self.stats = {
+            "ticks_received": 0,
+            "keys_written": 0,
+            "ticks_conflated": 0,
+            "flushes": 0,
+            "max_batch_size": 0,
+            "errors": 0,
+            "dropped_keys": 0,
+            "last_flush_time": None
+        }
+
+        self.start()
+
+    def start(self):
+        """Start the background writer thread"""
+        if not self.is_running:
+            self.is_running = True
+            self.worker_thread = threading.Thread(target=self._run, daemon=True)
+            self.worker_thread.start()
+            print(f"[SUCCESS] CoalescingRedisWriter started - Window: {self.window * 1000:.1f} ms")
+
+    def stop(self, timeout=5.0):
+        """Stop the writer thread after flushing whatever is still pending"""
+        if self.is_running:
+            self.is_running = False
+            self._wakeup.set()
+            if self.worker_thread and self.worker_thread.is_alive():
+                self.worker_thread.join(timeout=timeout)
+            # Anything submitted after the thread exited
+            self._flush()
+            print(f"[SUCCESS] CoalescingRedisWriter stopped - Keys written: {self.stats['keys_written']:,}")
+
+    def submit(self, redis_key: str, payload, notify=True, recv_ts=None, feed_type=None):
+        """
+        Queue the latest payload for a key (never blocks on Redis)
+
+        Args:
+            redis_key: Redis key to SET (e.g. 'depth:NIFTY_25000.0_CE-1')
+            payload: Serialized value (str or bytes)
+            notify: Publish a tick notification for this key (off for companion keys)
+            recv_ts: Tick arrival time, for feed-to-store latency (with feed_type)
+            feed_type: Feed the tick came from ('depth', 'quotes')
+        """
+        with self._lock:
+            if redis_key in self._pending:
+                self.stats["ticks_conflated"] += 1
+            self._pending[redis_key] = (payload, notify, recv_ts, feed_type)
+            self.stats["ticks_received"] += 1
+        self._wakeup.set()
+
+    def _run(self):
+        """Background thread: wait for work, let the window fill, flush"""
+        while self.is_running:
+            try:
+                self._wakeup.wait(timeout=1.0)
+                if not self.is_running:
+                    break
+                self._wakeup.clear()
+                if self.window:
+                    time.sleep(self.window)
+                if not self._flush():
+                    time.sleep(self.retry_interval)
+            except Exception as e:
+                # the feed keeps submitting - a dead writer thread would silently stop every Redis update
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"[ERROR] Redis writer error: {e}")
+                time.sleep(self.retry_interval)
+
+    def _requeue(self, batch: Dict[str, Any]):
+        """Put a failed batch back unless a newer value arrived meanwhile (caller holds _lock)"""
+        for redis_key, entry in batch.items():
+            if redis_key in self._pending:
+                self.stats["ticks_conflated"] += 1
+            else:
+                self._pending[redis_key] = entry
+
+    def _unencodable_keys(self, batch: Dict[str, Any]) -> list:
+        """Keys whose payload the client refuses to encode (every retry would fail the same way)"""
+        encoder = self.r.get_encoder()
+        bad = []
+        for redis_key, entry in batch.items():
+            try:
+                encoder.encode(entry[0])
+            except redis.DataError:
+                bad.append(redis_key)
+        return bad
+
+    def _flush(self) -> bool:
+        """Write every pending key in one pipeline; returns False if Redis failed"""
+        with self._lock:
+            if not self._pending:
+                return True
+            batch = self._pending
+            self._pending = {}
+
+        flush_start = time.time()
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            pipe.mset({redis_key: entry[0] for redis_key, entry in batch.items()})
+            if self.notify:
+                now = time.time()
+                for redis_key, entry in batch.items():
+                    if entry[1]:
+                        pipe.publish(tick_channel(redis_key), now)
+            pipe.execute()
+        except redis.DataError as e:
+            # Bad values are dropped (and counted), the rest of the batch goes out on the next pass
+            bad = self._unencodable_keys(batch) or list(batch)
+            for redis_key in bad:
+                del batch[redis_key]
+            with self._lock:
+                self.stats["errors"] += 1
+                self.stats["dropped_keys"] += len(bad)
+                self._requeue(batch)
+            self._wakeup.set()
+            print(f"[ERROR] Dropped {len(bad)} Redis keys with invalid values (e.g. {bad[0]}): {e}")
+            return True
+        except redis.RedisError as e:
+            with self._lock:
+                self.stats["errors"] += 1
+                self._requeue(batch)
+            self._wakeup.set()
+            print(f"[ERROR] Redis write failed for {len(batch)} keys, will retry: {e}")
+            return False
+
+        if self.latency_stats is not None:
+            written_at = time.time()
+            self.latency_stats.record("redis_writer", "flush", written_at - flush_start)
+            for entry in batch.values():
+                if entry[2] is not None and entry[3]:
+                    self.latency_stats.record(entry[3], "feed_to_store", written_at - entry[2])
+
+        with self._lock:
+            self.stats["keys_written"] += len(batch)
+            self.stats["flushes"] += 1
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+            self.stats["last_flush_time"] = time.time()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current statistics"""
+        with self._lock:
+            current_stats = self.stats.copy()
+            current_stats["pending_keys"] = len(self._pending)
+        flushes = current_stats["flushes"]
+        current_stats["avg_batch_size"] = current_stats["keys_written"] / flushes if flushes else 0.0
+        return current_stats
+
+    def print_stats(self):
+        """Print current statistics"""
+        stats = self.get_stats()
+        print("\n[INFO] REDIS WRITER STATISTICS")
+        print("-" * 40)
+        print(f"[INFO] Ticks received: {stats['ticks_received']:,}")
+        print(f"[INFO] Keys written: {stats['keys_written']:,}")
+        print(f"[INFO] Ticks conflated: {stats['ticks_conflated']:,}")
+        print(f"[INFO] Flushes: {stats['flushes']:,} (avg batch {stats['avg_batch_size']:.1f}, max {stats['max_batch_size']})")
+        print(f"[INFO] Pending keys: {stats['pending_keys']}")
+        print(f"[ERROR] Errors: {stats['errors']} (dropped keys: {stats['dropped_keys']})")
+        if stats['last_flush_time']:
+            last_flush = datetime.fromtimestamp(stats['last_flush_time']).strftime("%H:%M:%S")
+            print(f"[INFO] Last flush: {last_flush}")
+        print("-" * 40)
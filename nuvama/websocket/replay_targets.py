@@ -0,0 +1,154 @@
+"""
+Replay Targets
+Where TickDataSimulator puts replayed market data and where strategies read it
+back (through StrategyDataHelpers and TickSubscription): an in-process cache
+for backtests running in the replay's process, or Redis - pipelined and
+optionally under a key namespace so a replay never overwrites live keys
+"""
+
+import threading
+from typing import Dict, Any, Optional
+
+import orjson
+
+try:
+    from tick_notifier import tick_channel
+except ImportError:
+    from .tick_notifier import tick_channel
+
+try:
+    from depth_codec import DEPTH_PREFIX, binary_depth_key, encode_depth
+except ImportError:
+    from .depth_codec import DEPTH_PREFIX, binary_depth_key, encode_depth
+
+
+class MarketCache:
+    """
+    Latest payload per market data key, held in this process
+
+    store() keeps the payload dict itself (no serialization) and bumps the
+    key's version on every attached TickSubscription watching it, which wakes
+    their waiters directly - no Redis, no pub/sub. Payloads are shared with
+    every reader, so treat them as read-only.
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.subscriptions = []
+        self._lock = threading.Lock()
+        self.stats = {"stores": 0, "reads": 0, "misses": 0}
+
+    def store(self, key: str, payload: Dict[Any, Any], timestamp: Optional[float] = None):
+        self.data[key] = payload
+        self.stats["stores"] += 1
+        for subscription in self.subscriptions:
+            if key in subscription.keys:
+                subscription.notify_tick(key)
+
+    def flush(self):
+        pass  # stores are visible immediately
+
+    def get(self, key: str) -> Optional[Dict[Any, Any]]:
+        payload = self.data.get(key)
+        self.stats["reads"] += 1
+        if payload is None:
+            self.stats["misses"] += 1
+        return payload
+
+    def attach(self, subscription):
+        with self._lock:
+            # copy-on-write, so store() iterates without taking the lock
+            self.subscriptions = self.subscriptions + [subscription]
+
+    def detach(self, subscription):
+        with self._lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def close(self):
+        self.data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.copy()
+        stats["keys"] = len(self.data)
+        stats["subscriptions"] = len(self.subscriptions)
+        return stats
+
+
+class RedisReplayTarget:
+    """
+    Replayed payloads SET into Redis with their tick notifications, batched in a pipeline
+
+    Keys and tick channels are prefixed with `namespace`, so a replay with
+    e.g. namespace="replay:" leaves the live depth:/reduced_quotes: keys
+    alone; strategies reading the replay pass this target as market= and get
+    the same prefix. Depth keys also get their packed depthbin: record, as
+    the live feed writes them, so binary pricing reads see the replayed book
+    instead of whatever the last live session left behind. Writes go out
+    every batch_size ticks or on flush().
+    """
+
+    def __init__(self, redis_client, namespace: str = "", batch_size: int = 200, ttl: Optional[int] = None):
+        self.r = redis_client
+        self.namespace = namespace
+        self.batch_size = max(1, batch_size)
+        self.ttl = ttl  # seconds, for namespaced replay keys that should not linger
+        self.pipe = self.r.pipeline(transaction=False)
+        self.pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"stores": 0, "flushes": 0, "errors": 0}
+
+    def key(self, key: str) -> str:
+        return f"{self.namespace}{key}"
+
+    def tick_channel(self, key: str) -> str:
+        return tick_channel(self.key(key))
+
+    def store(self, key: str, payload: Dict[Any, Any], timestamp: Optional[float] = None):
+        namespaced = self.key(key)
+        with self._lock:
+            self.pipe.set(namespaced, orjson.dumps(payload), ex=self.ttl)
+            if key.startswith(DEPTH_PREFIX):
+                self._store_binary_depth(key, payload, timestamp)
+            self.pipe.publish(tick_channel(namespaced), timestamp if timestamp is not None else 0)
+            self.pending += 1
+            self.stats["stores"] += 1
+            if self.pending >= self.batch_size:
+                self._execute()
+
+    def _store_binary_depth(self, key: str, payload: Dict[Any, Any], timestamp: Optional[float]):
+        response = payload.get("response") if isinstance(payload, dict) else None
+        data = response.get("data") if isinstance(response, dict) else None
+        if not isinstance(data, dict):
+            return
+        try:
+            self.pipe.set(self.key(binary_depth_key(key)), encode_depth(data, recv_ts=timestamp), ex=self.ttl)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[ERROR] Failed to encode binary depth for {key}: {e}")
+
+    def flush(self):
+        with self._lock:
+            if self.pending:
+                self._execute()
+
+    def _execute(self):
+        try:
+            self.pipe.execute()
+            self.stats["flushes"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[ERROR] Replay target flush failed ({self.pending} ticks): {e}")
+        self.pending = 0
+
+    def get(self, key: str) -> Optional[Dict[Any, Any]]:
+        raw = self.r.get(self.key(key))
+        return orjson.loads(raw) if raw else None
+
+    def close(self):
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.copy()
+        stats["namespace"] = self.namespace
+        stats["pending"] = self.pending
+        return stats
@@ -0,0 +1,154 @@
+"""
+Sharded Market Data Ingestion
+Splits the depth token universe across N feed connections, each owned by its
+own CentralSocketData worker process, under one supervising parent
+"""
+
+import multiprocessing
+import signal
+import time
+import zlib
+from dataclasses import dataclass
+
+try:
+    from shared_depth_book import DEFAULT_BOOK_NAME, unlink_shared_book
+except ImportError:
+    from .shared_depth_book import DEFAULT_BOOK_NAME, unlink_shared_book
+
+SHARD_BY_EXCHANGE = "exchange"
+SHARD_BY_HASH = "hash"
+
+# Exchange shards in this order; with fewer shards than exchanges they wrap around
+EXCHANGE_ORDER = ["NFO", "BFO", "NSE", "BSE"]
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Which slice of the token universe one ingestion worker owns"""
+    index: int
+    count: int
+    by: str = SHARD_BY_HASH
+
+    @property
+    def is_primary(self) -> bool:
+        """The primary shard also runs the index quotes feed and the strike refresh"""
+        return self.index == 0
+
+    def shard_of(self, token: str) -> int:
+        token = str(token)
+        if self.by == SHARD_BY_EXCHANGE:
+            exchange = token.rsplit("_", 1)[-1].upper()
+            if exchange in EXCHANGE_ORDER:
+                return EXCHANGE_ORDER.index(exchange) % self.count
+        return zlib.crc32(token.encode()) % self.count
+
+    def owns(self, token: str) -> bool:
+        return self.count <= 1 or self.shard_of(token) == self.index
+
+    def __str__(self):
+        return f"shard {self.index + 1}/{self.count} (by {self.by})"
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _shard_worker(shard: ShardSpec, primary_ready, socket_kwargs):
+    """Worker process entry point: wait for the primary's strike refresh, then run a feed"""
+    # Imported here so the supervisor can be imported without the feed stack
+    from central_socket_data import run_central_socket
+
+    # terminate() from the supervisor takes the same graceful path as Ctrl+C
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+
+    if not shard.is_primary:
+        if not primary_ready.wait(timeout=180):
+            print(f"[WARNING] {shard}: primary not ready after 180s - starting from cached option_mapper")
+    run_central_socket(shard=shard, ready_event=primary_ready if shard.is_primary else None, **socket_kwargs)
+
+
+class ShardedIngestionSupervisor:
+    """
+    Parent process for sharded ingestion
+
+    Starts one worker per shard (each with its own APIConnect session, depth
+    callback thread, Redis writer and tick logger), restarts workers that die
+    and terminates all of them on shutdown. The shared depth book all shards
+    publish into outlives any one worker; the supervisor unlinks it once every
+    worker has stopped.
+    """
+
+    def __init__(self, shard_count, shard_by=SHARD_BY_HASH, restart_delay=2.0, **socket_kwargs):
+        self.shard_count = max(1, int(shard_count))
+        self.shard_by = shard_by
+        self.restart_delay = restart_delay
+        self.socket_kwargs = socket_kwargs
+
+        # Workers are spawned fresh so no feed/Redis state leaks from the parent
+        self.ctx = multiprocessing.get_context("spawn")
+        self.primary_ready = self.ctx.Event()
+        self.workers = {}
+        self.restarts = {i: 0 for i in range(self.shard_count)}
+        self.is_running = False
+
+    def _start_worker(self, index, warm_start=False):
+        shard = ShardSpec(index, self.shard_count, self.shard_by)
+        socket_kwargs = dict(self.socket_kwargs)
+        if warm_start:
+            # a restarted worker resubscribes its cached token set instead of refreshing strikes
+            socket_kwargs["warm_start"] = True
+        process = self.ctx.Process(
+            target=_shard_worker,
+            args=(shard, self.primary_ready, socket_kwargs),
+            name=f"ingestion-shard-{index}",
+            daemon=False
+        )
+        process.start()
+        self.workers[index] = process
+        print(f"[INFO] Started ingestion {shard} - PID {process.pid}")
+
+    def start(self):
+        self.is_running = True
+        for index in range(self.shard_count):
+            self._start_worker(index)
+
+    def supervise(self, poll_interval=1.0):
+        """Block while restarting dead workers; Ctrl+C stops everything"""
+        if not self.is_running:
+            self.start()
+        try:
+            while self.is_running:
+                for index, process in list(self.workers.items()):
+                    if not process.is_alive():
+                        self.restarts[index] += 1
+                        print(f"[WARNING] Ingestion shard {index} exited with code {process.exitcode} - restarting "
+                              f"(restart #{self.restarts[index]})")
+                        time.sleep(self.restart_delay)
+                        self._start_worker(index, warm_start=True)
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("\n[INFO] Keyboard interrupt - stopping ingestion shards...")
+        finally:
+            self.stop()
+
+    def stop(self, timeout=10.0):
+        self.is_running = False
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.workers.values():
+            process.join(timeout=timeout)
+        if self.socket_kwargs.get("enable_shared_book", True) and not any(p.is_alive() for p in self.workers.values()):
+            book_name = self.socket_kwargs.get("shared_book_name", DEFAULT_BOOK_NAME)
+            if unlink_shared_book(book_name):
+                print(f"[INFO] Removed shared depth book {book_name}")
+        print(f"[SUCCESS] Sharded ingestion stopped - restarts: {self.restarts}")
+
+    def get_stats(self):
+        return {
+            "shard_count": self.shard_count,
+            "shard_by": self.shard_by,
+            "alive": {index: process.is_alive() for index, process in self.workers.items()},
+            "pids": {index: process.pid for index, process in self.workers.items()},
+            "restarts": dict(self.restarts)
+        }
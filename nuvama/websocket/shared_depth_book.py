@@ -0,0 +1,462 @@
+"""
+Shared-Memory Depth Book
+Array-backed top-of-book cache published by CentralSocketData and read by
+strategy processes on the same host without Redis round trips or JSON parsing
+"""
+
+import fcntl
+import os
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Any, Optional
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:  # pragma: no cover - platform without resource tracker
+    resource_tracker = None
+
+try:
+    from depth_codec import DepthRecord
+except ImportError:
+    from .depth_codec import DepthRecord
+
+
+DEFAULT_BOOK_NAME = "nuvama_depth_book"
+DEFAULT_CAPACITY = 4096
+DEFAULT_LEVELS = 5
+KEY_SIZE = 64
+
+DEFAULT_MAX_AGE = 10.0  # seconds; older snapshots are left to Redis
+
+# Header: magic, layout version, capacity, levels | used slot count | generation
+_MAGIC = b"NVDEPTH1"
+_VERSION = 2
+_HEADER = struct.Struct("<8sIII")
+_USED = struct.Struct("<I")
+_USED_OFFSET = _HEADER.size
+# Set when a segment is created; readers re-attach when the name points at a new one
+_GENERATION = struct.Struct("<Q")
+_GENERATION_OFFSET = _USED_OFFSET + _USED.size
+_DIRECTORY_OFFSET = 64
+_SEQ = struct.Struct("<Q")
+
+# Slot assignment is rare but may race between instances living in one process,
+# and between ingestion shard processes publishing into the same book
+_assign_lock = threading.Lock()
+
+
+class _SegmentLock:
+    """Host-wide lock for one segment's slot directory (flock on a file next to the temp dir)"""
+
+    def __init__(self, name):
+        self.path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+
+def _open_segment(name, create=False, size=0) -> shared_memory.SharedMemory:
+    """
+    Open a segment without resource_tracker ownership
+
+    The tracker unlinks every segment a process created or attached when that
+    process exits; the book has to outlive any one feed process (shards and
+    restarts share it), so it is only ever removed by an explicit unlink().
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:  # track= is Python 3.13+
+        pass
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    if resource_tracker is not None:
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+def _unlink_segment(shm: shared_memory.SharedMemory):
+    """unlink() without the resource_tracker bookkeeping (the segment was never registered)"""
+    posixshmem = getattr(shared_memory, "_posixshmem", None)
+    if posixshmem is not None:
+        posixshmem.shm_unlink(shm._name)
+    else:
+        shm.unlink()
+
+
+def segment_generation(name=DEFAULT_BOOK_NAME) -> Optional[int]:
+    """Generation of the segment currently published under name (None when absent or foreign)"""
+    try:
+        shm = _open_segment(name)
+    except (FileNotFoundError, ValueError):
+        return None
+    try:
+        magic, version, _, _ = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            return None
+        return _GENERATION.unpack_from(shm.buf, _GENERATION_OFFSET)[0]
+    finally:
+        shm.close()
+
+
+def unlink_shared_book(name=DEFAULT_BOOK_NAME) -> bool:
+    """Remove the named segment from the host (the ingestion supervisor's job at shutdown)"""
+    try:
+        shm = _open_segment(name)
+    except FileNotFoundError:
+        return False
+    try:
+        _unlink_segment(shm)
+    except FileNotFoundError:
+        return False
+    finally:
+        shm.close()
+    return True
+
+
+def _body_struct(levels: int) -> struct.Struct:
+    """Slot body after the seq word: recv_ts, ltp, tbq, taq, n_bid, n_ask, bid px/qty, ask px/qty"""
+    return struct.Struct(f"<ddqqii{levels}d{levels}q{levels}d{levels}q")
+
+
+def _slot_size(levels: int) -> int:
+    size = _SEQ.size + _body_struct(levels).size
+    return (size + 7) & ~7
+
+
+def _segment_size(capacity: int, levels: int) -> int:
+    return _DIRECTORY_OFFSET + capacity * KEY_SIZE + capacity * _slot_size(levels)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value)) if value not in (None, "") else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+class SharedDepthBook:
+    """
+    Fixed-slot depth book in a named shared-memory segment.
+
+    One writer (the depth feed callback) owns slot assignment; every slot is
+    guarded by a seqlock word that is odd while a write is in progress, so
+    readers in other processes retry instead of seeing a torn snapshot.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, levels: int, owner: bool):
+        self.shm = shm
+        self.name = shm.name
+        self.capacity = capacity
+        self.levels = levels
+        self.owner = owner
+        self.max_read_retries = 100
+        self.generation = _GENERATION.unpack_from(shm.buf, _GENERATION_OFFSET)[0]
+
+        self._buf = shm.buf
+        self._body = _body_struct(levels)
+        self._slot_size = _slot_size(levels)
+        self._slots_offset = _DIRECTORY_OFFSET + capacity * KEY_SIZE
+        self._slots: Dict[str, int] = {}
+        self._scanned = 0
+        self._refresh_directory()
+
+    @classmethod
+    def create(cls, name=DEFAULT_BOOK_NAME, capacity=DEFAULT_CAPACITY, levels=DEFAULT_LEVELS):
+        """
+        Create the segment for the writer, reusing an existing one with the same layout
+
+        Reusing keeps slot assignments stable across feed reconnects, process
+        restarts and shards so readers never have to rebuild their key cache.
+        The segment is not tied to this process: it stays until unlink() /
+        unlink_shared_book() removes it.
+        """
+        size = _segment_size(capacity, levels)
+        try:
+            shm = _open_segment(name, create=True, size=size)
+            _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, capacity, levels)
+            _USED.pack_into(shm.buf, _USED_OFFSET, 0)
+            _GENERATION.pack_into(shm.buf, _GENERATION_OFFSET, time.time_ns())
+        except FileExistsError:
+            shm = _open_segment(name)
+            magic, version, old_capacity, old_levels = _HEADER.unpack_from(shm.buf, 0)
+            if (magic, version, old_capacity, old_levels) != (_MAGIC, _VERSION, capacity, levels):
+                print(f"[WARNING] Shared depth book {name} has a different layout - recreating")
+                _unlink_segment(shm)
+                shm.close()
+                return cls.create(name, capacity, levels)
+        return cls(shm, capacity, levels, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_BOOK_NAME):
+        """Attach to an existing segment as a reader (raises FileNotFoundError if absent)"""
+        # Readers must not unlink the writer's segment when they exit
+        shm = _open_segment(name)
+        magic, version, capacity, levels = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            shm.close()
+            raise ValueError(f"Unsupported shared depth book layout in {name}")
+        return cls(shm, capacity, levels, owner=False)
+
+    def _slot_offset(self, slot: int) -> int:
+        return self._slots_offset + slot * self._slot_size
+
+    def _refresh_directory(self):
+        """Pick up slots assigned since the last scan"""
+        used = _USED.unpack_from(self._buf, _USED_OFFSET)[0]
+        for slot in range(self._scanned, min(used, self.capacity)):
+            offset = _DIRECTORY_OFFSET + slot * KEY_SIZE
+            raw = bytes(self._buf[offset:offset + KEY_SIZE]).rstrip(b"\x00")
+            if raw:
+                self._slots[raw.decode("utf-8")] = slot
+        self._scanned = max(self._scanned, min(used, self.capacity))
+
+    def _assign_slot(self, redis_key: str) -> Optional[int]:
+        encoded = redis_key.encode("utf-8")
+        if len(encoded) > KEY_SIZE:
+            print(f"[WARNING] Shared depth book key too long, skipping: {redis_key}")
+            return None
+
+        with _assign_lock, _SegmentLock(self.name):
+            self._refresh_directory()
+            if redis_key in self._slots:
+                return self._slots[redis_key]
+
+            used = _USED.unpack_from(self._buf, _USED_OFFSET)[0]
+            if used >= self.capacity:
+                print(f"[WARNING] Shared depth book full ({self.capacity} slots) - {redis_key} stays Redis-only")
+                return None
+
+            offset = _DIRECTORY_OFFSET + used * KEY_SIZE
+            self._buf[offset:offset + KEY_SIZE] = encoded.ljust(KEY_SIZE, b"\x00")
+            # Directory entry must be complete before readers can see the new count
+            _USED.pack_into(self._buf, _USED_OFFSET, used + 1)
+            self._slots[redis_key] = used
+            self._scanned = used + 1
+            return used
+
+    def publish(self, redis_key: str, data: Dict[str, Any]) -> bool:
+        """
+        Write one depth payload (``response['response']['data']``) into the key's slot
+
+        Args:
+            redis_key: Depth key the strategies use (e.g. 'depth:NIFTY_25000.0_CE-1')
+            data: Depth data dict with bidValues/askValues entries
+        """
+        slot = self._slots.get(redis_key)
+        if slot is None:
+            slot = self._assign_slot(redis_key)
+            if slot is None:
+                return False
+
+        levels = self.levels
+        bid_px = [0.0] * levels
+        bid_qty = [0] * levels
+        ask_px = [0.0] * levels
+        ask_qty = [0] * levels
+
+        bids = data.get("bidValues") or ()
+        asks = data.get("askValues") or ()
+        n_bid = min(len(bids), levels)
+        n_ask = min(len(asks), levels)
+        for i in range(n_bid):
+            bid_px[i] = _to_float(bids[i].get("price"))
+            bid_qty[i] = _to_int(bids[i].get("qty", bids[i].get("quantity")))
+        for i in range(n_ask):
+            ask_px[i] = _to_float(asks[i].get("price"))
+            ask_qty[i] = _to_int(asks[i].get("qty", asks[i].get("quantity")))
+
+        buf = self._buf
+        offset = self._slot_offset(slot)
+        seq = _SEQ.unpack_from(buf, offset)[0]
+        if seq & 1:
+            seq += 1  # a previous writer died mid-update
+        _SEQ.pack_into(buf, offset, seq + 1)
+        self._body.pack_into(
+            buf, offset + _SEQ.size,
+            time.time(), _to_float(data.get("ltp")),
+            _to_int(data.get("tbq")), _to_int(data.get("taq")),
+            n_bid, n_ask,
+            *bid_px, *bid_qty, *ask_px, *ask_qty
+        )
+        _SEQ.pack_into(buf, offset, seq + 2)
+        return True
+
+    def _read_values(self, redis_key: str):
+        """Consistent (values, seq) for a key, or None when absent/never written"""
+        slot = self._slots.get(redis_key)
+        if slot is None:
+            self._refresh_directory()
+            slot = self._slots.get(redis_key)
+            if slot is None:
+                return None
+
+        buf = self._buf
+        offset = self._slot_offset(slot)
+        body = self._body
+        for _ in range(self.max_read_retries):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            values = body.unpack_from(buf, offset + _SEQ.size)
+            if _SEQ.unpack_from(buf, offset)[0] != seq:
+                continue
+            if seq == 0:
+                return None
+            return values, seq
+        return None
+
+    def read(self, redis_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a consistent snapshot for a key in the Redis depth payload shape
+
+        Returns None when the key has no slot yet or was never written, so callers
+        can fall back to Redis.
+        """
+        result = self._read_values(redis_key)
+        return self._to_payload(*result) if result else None
+
+    def read_record(self, redis_key: str) -> Optional[DepthRecord]:
+        """Read a consistent snapshot as a DepthRecord (no dict building)"""
+        result = self._read_values(redis_key)
+        if not result:
+            return None
+        values = result[0]
+        levels = self.levels
+        recv_ts, ltp, tbq, taq, n_bid, n_ask = values[:6]
+        return DepthRecord(
+            recv_ts, ltp, tbq, taq,
+            values[6:6 + n_bid],
+            values[6 + levels:6 + levels + n_bid],
+            values[6 + 2 * levels:6 + 2 * levels + n_ask],
+            values[6 + 3 * levels:6 + 3 * levels + n_ask],
+        )
+
+    def _to_payload(self, values, seq: int) -> Dict[str, Any]:
+        levels = self.levels
+        recv_ts, ltp, tbq, taq, n_bid, n_ask = values[:6]
+        bid_px = values[6:6 + levels]
+        bid_qty = values[6 + levels:6 + 2 * levels]
+        ask_px = values[6 + 2 * levels:6 + 3 * levels]
+        ask_qty = values[6 + 3 * levels:6 + 4 * levels]
+        return {
+            "response": {
+                "data": {
+                    "bidValues": [{"price": bid_px[i], "qty": bid_qty[i]} for i in range(n_bid)],
+                    "askValues": [{"price": ask_px[i], "qty": ask_qty[i]} for i in range(n_ask)],
+                    "ltp": ltp,
+                    "tbq": tbq,
+                    "taq": taq,
+                    "recv_ts": recv_ts,
+                    "seq": seq
+                },
+                "streaming_type": "shared_book"
+            }
+        }
+
+    def keys(self) -> list:
+        """List all keys that currently own a slot"""
+        self._refresh_directory()
+        return list(self._slots.keys())
+
+    def close(self):
+        """Release this process's mapping (the segment itself stays for other readers)"""
+        try:
+            self._buf = None
+            self.shm.close()
+        except Exception as e:
+            print(f"[ERROR] Error closing shared depth book: {e}")
+
+    def unlink(self):
+        """Remove the segment from the host (writer only)"""
+        if self.owner:
+            try:
+                _unlink_segment(self.shm)
+            except FileNotFoundError:
+                pass
+
+
+class SharedDepthBookReader:
+    """
+    Lazy reader used by strategies: attaches when the book exists on this host
+    and otherwise returns None so callers fall back to Redis
+
+    Snapshots older than max_age seconds are not served either (a dead feed
+    leaves its last books behind), and every recheck_interval the reader
+    checks the segment's generation, re-attaching when the feed recreated it
+    and dropping it when it was removed.
+    """
+
+    def __init__(self, name=DEFAULT_BOOK_NAME, retry_interval=5.0, max_age=DEFAULT_MAX_AGE, recheck_interval=1.0):
+        self.name = name
+        self.retry_interval = retry_interval
+        self.max_age = max_age  # None serves snapshots of any age
+        self.recheck_interval = recheck_interval
+        self.book = None
+        self._next_attempt = 0.0
+        self._next_check = 0.0
+
+    def _get_book(self) -> Optional[SharedDepthBook]:
+        now = time.time()
+        if self.book is not None and now >= self._next_check:
+            self._next_check = now + self.recheck_interval
+            if segment_generation(self.name) != self.book.generation:
+                print(f"[INFO] Shared depth book {self.name} was recreated or removed - re-attaching")
+                self.book.close()
+                self.book = None
+                self._next_attempt = 0.0
+        if self.book is None and now >= self._next_attempt:
+            try:
+                self.book = SharedDepthBook.attach(self.name)
+                self._next_check = now + self.recheck_interval
+            except (FileNotFoundError, ValueError):
+                self._next_attempt = now + self.retry_interval
+        return self.book
+
+    def _fresh(self, recv_ts) -> bool:
+        return self.max_age is None or time.time() - recv_ts <= self.max_age
+
+    def read(self, redis_key: str) -> Optional[Dict[str, Any]]:
+        book = self._get_book()
+        if book is None:
+            return None
+        try:
+            payload = book.read(redis_key)
+        except Exception as e:
+            print(f"ERROR: shared depth book read failed for {redis_key}: {e}")
+            return None
+        if payload is None or not self._fresh(payload["response"]["data"]["recv_ts"]):
+            return None
+        return payload
+
+    def read_record(self, redis_key: str) -> Optional[DepthRecord]:
+        book = self._get_book()
+        if book is None:
+            return None
+        try:
+            record = book.read_record(redis_key)
+        except Exception as e:
+            print(f"ERROR: shared depth book read failed for {redis_key}: {e}")
+            return None
+        if record is None or not self._fresh(record.recv_ts):
+            return None
+        return record
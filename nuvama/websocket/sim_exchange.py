@@ -0,0 +1,574 @@
+"""
+Simulated Exchange
+Matching engine for SIMULATION mode: orders fill against the depth book
+(replayed ticks, or the live shared book / Redis) level by level, with partial
+fills, IOC expiry, modify and cancel, and every change is published as an
+order update in the order:{user}{remark}{oid} shape OrderStreamingSocket writes
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Dict, Any, Optional, List
+
+import orjson
+
+try:
+    from clock import WALL_CLOCK
+    from depth_codec import DepthRecord, binary_depth_key, decode_depth
+    from shared_depth_book import SharedDepthBookReader
+except ImportError:
+    from .clock import WALL_CLOCK
+    from .depth_codec import DepthRecord, binary_depth_key, decode_depth
+    from .shared_depth_book import SharedDepthBookReader
+
+
+# order update "sts" values
+STATUS_OPEN = "open"
+STATUS_COMPLETE = "complete"
+STATUS_CANCELLED = "cancelled"
+STATUS_REJECTED = "rejected"
+
+_PRICE_SCALE = 100  # prices are matched in integer paise, like the binary depth records
+
+
+def _paise(value) -> int:
+    try:
+        return int(round(float(value) * _PRICE_SCALE)) if value not in (None, "") else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _qty(value) -> int:
+    try:
+        return int(float(value)) if value not in (None, "") else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _enum_is(value, *names) -> bool:
+    """True when an APIConnect enum member (or its plain string) is one of names"""
+    for candidate in (getattr(value, "name", None), getattr(value, "value", None), value):
+        if isinstance(candidate, str) and candidate.upper() in names:
+            return True
+    return False
+
+
+def parse_book(depth) -> tuple:
+    """
+    (bid px, bid qty, ask px, ask qty) tuples, best level first, from a
+    DepthRecord, a depth payload or its response data; prices in paise and
+    empty levels dropped
+    """
+    if isinstance(depth, DepthRecord):
+        bids = zip((_paise(p) for p in depth.prices["bidValues"]), depth.quantities["bidValues"])
+        asks = zip((_paise(p) for p in depth.prices["askValues"]), depth.quantities["askValues"])
+    else:
+        response = depth.get("response")
+        data = response["data"] if isinstance(response, dict) and isinstance(response.get("data"), dict) else depth
+        bids = ((_paise(level.get("price")), _qty(level.get("qty", level.get("quantity"))))
+                for level in data.get("bidValues") or ())
+        asks = ((_paise(level.get("price")), _qty(level.get("qty", level.get("quantity"))))
+                for level in data.get("askValues") or ())
+    bids = sorted(((px, int(qty)) for px, qty in bids if px > 0 and qty > 0), reverse=True)
+    asks = sorted((px, int(qty)) for px, qty in asks if px > 0 and qty > 0)
+    return (tuple(px for px, _ in bids), tuple(qty for _, qty in bids),
+            tuple(px for px, _ in asks), tuple(qty for _, qty in asks))
+
+
+class _Book:
+    """
+    Last depth snapshot of one key plus the quantity simulated orders already
+    took from it, so orders of every strategy compete for the same displayed
+    liquidity until the next tick replaces it
+    """
+
+    __slots__ = ("raw", "levels", "taken")
+
+    def __init__(self):
+        self.raw = None
+        self.levels = None
+        self.taken: Dict[tuple, int] = {}
+
+    def update(self, depth):
+        self.raw = depth  # parsed lazily - most ticks of most keys are never matched against
+
+    def snapshot(self) -> tuple:
+        if self.raw is not None:
+            levels = parse_book(self.raw)
+            self.raw = None
+            if levels != self.levels:
+                # a re-sent identical book keeps what was already taken from it
+                self.levels = levels
+                self.taken.clear()
+        return self.levels or ((), (), (), ())
+
+
+class SimOrder:
+    """One simulated order; prices in paise, limit None for market orders"""
+
+    __slots__ = ("oid", "user_id", "remark", "symbol", "streaming_symbol", "depth_key", "is_buy", "quantity",
+                 "limit", "is_ioc", "expires_at", "filled", "fill_value", "touch", "status", "reason",
+                 "placed_at", "updated_at")
+
+    def __init__(self, oid, user_id, remark, symbol, streaming_symbol, depth_key, is_buy, quantity, limit,
+                 is_ioc, expires_at, placed_at):
+        self.oid = oid
+        self.user_id = user_id
+        self.remark = remark
+        self.symbol = symbol
+        self.streaming_symbol = streaming_symbol
+        self.depth_key = depth_key
+        self.is_buy = is_buy
+        self.quantity = quantity
+        self.limit = limit
+        self.is_ioc = is_ioc
+        self.expires_at = expires_at
+        self.filled = 0
+        self.fill_value = 0  # sum of fill qty * price (paise)
+        self.touch = None    # best opposite price when the order arrived, for slippage
+        self.status = STATUS_OPEN
+        self.reason = ""
+        self.placed_at = placed_at
+        self.updated_at = placed_at
+
+    @property
+    def avg_price(self) -> float:
+        return self.fill_value / self.filled / _PRICE_SCALE if self.filled else 0.0
+
+    @property
+    def redis_key(self) -> str:
+        return f"order:{self.user_id}{self.remark}{self.oid}"
+
+    def to_update(self) -> Dict[str, Any]:
+        """Order update as the order streaming feed delivers it"""
+        return {
+            "response": {
+                "data": {
+                    "userID": self.user_id,
+                    "rmk": self.remark,
+                    "oID": self.oid,
+                    "trdSym": self.symbol,
+                    "sym": self.streaming_symbol,
+                    "trsTyp": "B" if self.is_buy else "S",
+                    "ordDur": "IOC" if self.is_ioc else "DAY",
+                    "qty": self.quantity,
+                    "fQty": self.filled,
+                    "fPrc": round(self.avg_price, 2),
+                    "prc": self.limit / _PRICE_SCALE if self.limit is not None else 0.0,
+                    "sts": self.status,
+                    "rjRsn": self.reason,
+                    "ordTm": self.placed_at,
+                    "updTm": self.updated_at,
+                },
+                "streaming_type": "simulated"
+            }
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "order_id": self.oid,
+            "user_id": self.user_id,
+            "remark": self.remark,
+            "symbol": self.symbol,
+            "depth_key": self.depth_key,
+            "action": "BUY" if self.is_buy else "SELL",
+            "quantity": self.quantity,
+            "filled_qty": self.filled,
+            "avg_price": round(self.avg_price, 2),
+            "limit_price": self.limit / _PRICE_SCALE if self.limit is not None else None,
+            "ioc": self.is_ioc,
+            "status": self.status,
+            "reason": self.reason,
+            "placed_at": self.placed_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class DepthBookSource:
+    """
+    Current depth of a key for a live (non-replayed) simulation: the
+    shared-memory book, then the binary and JSON Redis records
+    """
+
+    def __init__(self, redis_client, shared_book=None):
+        self.r = redis_client
+        self.shared_book = shared_book if shared_book is not None else SharedDepthBookReader()
+
+    def __call__(self, depth_key: str):
+        record = self.shared_book.read_record(depth_key) if self.shared_book else None
+        if record is not None:
+            return record
+        try:
+            record = decode_depth(self.r.get(binary_depth_key(depth_key)))
+            if record is not None:
+                return record
+            raw = self.r.get(depth_key)
+            return orjson.loads(raw) if raw else None
+        except Exception as e:
+            print(f"[ERROR] Simulated exchange could not read depth for {depth_key}: {e}")
+            return None
+
+
+class SimulatedExchange:
+    """
+    Price-time matching of simulated orders against the depth book
+
+    A marketable order walks the opposite side from the best level up to its
+    limit, taking at most the displayed quantity that earlier orders have not
+    already taken from the same snapshot; whatever is left rests and is
+    matched again on every new tick of its key (fills at the book's prices,
+    so a resting order only fills once the book crosses it - queue position
+    at our own price is not modelled). IOC orders rest for their "IOC"
+    window (the time the live IOC handler waits before cancelling) and are
+    then cancelled; a modify with a new price loses time priority.
+
+    Books come from on_depth() (TickDataSimulator pushes every replayed depth
+    tick) or, live, from book_source, which is read for an order's key
+    whenever the order is submitted, modified or queried. Time comes from
+    the injected clock, so with a ReplayClock IOC windows expire in replayed
+    time. One exchange can be shared by many strategies; all state is
+    guarded by one lock and a tick only touches the orders resting on its key.
+    """
+
+    def __init__(self, redis_client=None, clock=None, book_source=None, order_ttl=86400):
+        self.r = redis_client  # order updates are written here when set
+        self.clock = clock or WALL_CLOCK
+        self.book_source = book_source
+        self.order_ttl = order_ttl
+
+        self.lock = threading.RLock()
+        self.books: Dict[str, _Book] = {}
+        self.orders: Dict[str, SimOrder] = {}
+        self.resting: Dict[str, List[SimOrder]] = {}  # depth key -> open orders in time priority
+        self.expiries: List[tuple] = []               # heap of (expires_at, seq, order id) for IOC orders
+        self.symbol_keys: Dict[str, str] = {}         # streaming symbol -> depth key, from depth payloads
+        self._ids = itertools.count(1)
+        self._expiry_seq = itertools.count()
+
+        self.stats = {
+            "orders": 0, "rejected": 0, "completed": 0, "cancelled": 0, "ioc_expired": 0, "modified": 0,
+            "fills": 0, "ordered_qty": 0, "filled_qty": 0, "slippage_paise": 0, "slippage_qty": 0,
+            "depth_ticks": 0, "matched_ticks": 0, "updates_published": 0,
+        }
+
+    # ------------------------------------------------------------------ feed
+
+    def on_depth(self, depth_key: str, depth):
+        """New depth for a key (payload, its response data or a DepthRecord): match the orders resting on it"""
+        updates = []
+        with self.lock:
+            self.stats["depth_ticks"] += 1
+            book = self.books.get(depth_key)
+            if book is None:
+                book = self.books[depth_key] = _Book()
+                self._learn_symbol(depth_key, depth)
+            book.update(depth)
+            now = self.clock.time()
+            if self.expiries and self.expiries[0][0] <= now:
+                self._expire_due(now, updates)
+            if self.resting.get(depth_key):
+                self._match_resting(depth_key, book, now, updates)
+        self._publish(updates)
+
+    def _learn_symbol(self, depth_key: str, depth):
+        if isinstance(depth, dict):
+            response = depth.get("response")
+            data = response.get("data") if isinstance(response, dict) else depth
+            symbol = data.get("symbol") if isinstance(data, dict) else None
+            if symbol:
+                self.symbol_keys[str(symbol)] = depth_key
+
+    def _refresh(self, depth_key: str, now: float, updates: list):
+        """Live mode: pull the key's current depth from book_source and match against it"""
+        if self.book_source is None:
+            return
+        depth = self.book_source(depth_key)
+        if depth is None:
+            return
+        book = self.books.get(depth_key)
+        if book is None:
+            book = self.books[depth_key] = _Book()
+        book.update(depth)
+        if self.resting.get(depth_key):
+            self._match_resting(depth_key, book, now, updates)
+
+    # --------------------------------------------------------------- orders
+
+    def submit(self, order_data: Dict[str, Any], user_id=None, depth_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Accept an order template (the dict Orders.place_order takes) and match it
+
+        Slice_Quantity is the order quantity, as in Orders.place_order;
+        depth_key defaults to the key whose depth payloads carry the order's
+        Streaming_Symbol. Returns the order's to_dict() after matching.
+        """
+        updates = []
+        with self.lock:
+            now = self.clock.time()
+            self._expire_due(now, updates)
+            streaming_symbol = order_data.get("Streaming_Symbol")
+            depth_key = depth_key or self.symbol_keys.get(str(streaming_symbol))
+            is_market = _enum_is(order_data.get("Order_Type"), "MARKET", "MKT")
+            is_ioc = _enum_is(order_data.get("Duration"), "IOC")
+            ioc_window = float(order_data.get("IOC", 0) or 0) if is_ioc else 0.0
+            order = SimOrder(
+                f"SIM_{next(self._ids):06d}",
+                user_id if user_id is not None else order_data.get("user_id"),
+                order_data.get("remark", ""),
+                order_data.get("Trading_Symbol", "UNKNOWN"),
+                streaming_symbol,
+                depth_key,
+                _enum_is(order_data.get("Action"), "BUY", "B"),
+                _qty(order_data.get("Slice_Quantity", order_data.get("Quantity"))),
+                None if is_market else _paise(order_data.get("Limit_Price")),
+                is_ioc,
+                now + ioc_window if is_ioc else None,
+                now,
+            )
+            self.orders[order.oid] = order
+            self.stats["orders"] += 1
+
+            if order.quantity <= 0 or (order.limit is not None and order.limit <= 0) or not depth_key:
+                order.status = STATUS_REJECTED
+                order.reason = "no depth key for symbol" if not depth_key else "invalid quantity or price"
+                self.stats["rejected"] += 1
+                updates.append(order)
+            else:
+                self.stats["ordered_qty"] += order.quantity
+                self._refresh(depth_key, now, updates)
+                book = self.books.get(depth_key)
+                if book is not None:
+                    levels = book.snapshot()
+                    opposite = levels[2] if order.is_buy else levels[0]
+                    order.touch = opposite[0] if opposite else None
+                    self._match(order, book, now)
+                if order.status == STATUS_OPEN:
+                    if order.is_ioc and order.expires_at <= now:
+                        self._close(order, STATUS_CANCELLED, "IOC expired", now)
+                        self.stats["ioc_expired"] += 1
+                    else:
+                        self.resting.setdefault(depth_key, []).append(order)
+                        if order.is_ioc:
+                            heapq.heappush(self.expiries, (order.expires_at, next(self._expiry_seq), order.oid))
+                updates.append(order)
+            result = order.to_dict()
+        self._publish(updates)
+        return result
+
+    def modify(self, order_id: str, limit_price=None, quantity=None) -> Optional[Dict[str, Any]]:
+        """Change an open order's price and/or total quantity; None when it is unknown or no longer open"""
+        updates = []
+        with self.lock:
+            now = self.clock.time()
+            self._expire_due(now, updates)
+            order = self.orders.get(order_id)
+            if order is None or order.status != STATUS_OPEN:
+                result = None
+            else:
+                if quantity is not None:
+                    quantity = max(_qty(quantity), order.filled)
+                    self.stats["ordered_qty"] += quantity - order.quantity
+                    order.quantity = quantity
+                if limit_price is not None and order.limit is not None and _paise(limit_price) != order.limit:
+                    order.limit = _paise(limit_price)
+                    resting = self.resting.get(order.depth_key)
+                    if resting:
+                        resting.remove(order)  # a new price goes to the back of the queue
+                        resting.append(order)
+                order.updated_at = now
+                self.stats["modified"] += 1
+                if order.filled >= order.quantity:
+                    self._close(order, STATUS_COMPLETE, "", now)
+                    self.stats["completed"] += 1
+                else:
+                    self._refresh(order.depth_key, now, updates)
+                    book = self.books.get(order.depth_key)
+                    if book is not None and order.status == STATUS_OPEN:
+                        self._match(order, book, now)
+                        if order.status != STATUS_OPEN:
+                            self._unrest(order)
+                updates.append(order)
+                result = order.to_dict()
+        self._publish(updates)
+        return result
+
+    def cancel(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel an open order; None when it is unknown or no longer open"""
+        updates = []
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status != STATUS_OPEN:
+                result = None
+            else:
+                self._close(order, STATUS_CANCELLED, "cancelled by user", self.clock.time())
+                self.stats["cancelled"] += 1
+                updates.append(order)
+                result = order.to_dict()
+        self._publish(updates)
+        return result
+
+    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of an order (live mode re-reads its book first)"""
+        updates = []
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return None
+            now = self.clock.time()
+            self._expire_due(now, updates)
+            if order.status == STATUS_OPEN:
+                self._refresh(order.depth_key, now, updates)
+            result = order.to_dict()
+        self._publish(updates)
+        return result
+
+    # ------------------------------------------------------------- matching
+
+    def _match(self, order: SimOrder, book: _Book, now: float) -> bool:
+        """Take what the book offers up to the order's limit; True when anything filled"""
+        bid_px, bid_qty, ask_px, ask_qty = book.snapshot()
+        if order.is_buy:
+            prices, quantities, side = ask_px, ask_qty, "a"
+        else:
+            prices, quantities, side = bid_px, bid_qty, "b"
+        limit = order.limit
+        taken = book.taken
+        remaining = order.quantity - order.filled
+        filled = 0
+        for price, quantity in zip(prices, quantities):
+            if remaining <= 0:
+                break
+            if limit is not None and (price > limit if order.is_buy else price < limit):
+                break
+            level = (side, price)
+            available = quantity - taken.get(level, 0)
+            if available <= 0:
+                continue
+            fill = available if available < remaining else remaining
+            taken[level] = taken.get(level, 0) + fill
+            order.fill_value += fill * price
+            remaining -= fill
+            filled += fill
+            self.stats["fills"] += 1
+            if order.touch is not None:
+                self.stats["slippage_paise"] += fill * (price - order.touch if order.is_buy else order.touch - price)
+                self.stats["slippage_qty"] += fill
+
+        if not filled:
+            return False
+        order.filled += filled
+        order.updated_at = now
+        self.stats["filled_qty"] += filled
+        if order.filled >= order.quantity:
+            order.status = STATUS_COMPLETE
+            self.stats["completed"] += 1
+        return True
+
+    def _match_resting(self, depth_key: str, book: _Book, now: float, updates: list):
+        resting = self.resting[depth_key]
+        bid_px, _, ask_px, _ = book.snapshot()
+        best_bid = bid_px[0] if bid_px else None
+        best_ask = ask_px[0] if ask_px else None
+        matched = False
+        for order in list(resting):
+            # most resting orders are not crossed by the tick - skip them without walking the book
+            limit = order.limit
+            if order.is_buy:
+                if best_ask is None or (limit is not None and best_ask > limit):
+                    continue
+            elif best_bid is None or (limit is not None and best_bid < limit):
+                continue
+            if self._match(order, book, now):
+                matched = True
+                updates.append(order)
+                if order.status != STATUS_OPEN:
+                    resting.remove(order)
+        if not resting:
+            del self.resting[depth_key]
+        if matched:
+            self.stats["matched_ticks"] += 1
+
+    def _expire_due(self, now: float, updates: list):
+        expiries = self.expiries
+        while expiries and expiries[0][0] <= now:
+            _, _, order_id = heapq.heappop(expiries)
+            order = self.orders.get(order_id)
+            if order is not None and order.status == STATUS_OPEN:
+                self._close(order, STATUS_CANCELLED, "IOC expired", now)
+                self.stats["ioc_expired"] += 1
+                updates.append(order)
+
+    def _close(self, order: SimOrder, status: str, reason: str, now: float):
+        order.status = status
+        order.reason = reason
+        order.updated_at = now
+        self._unrest(order)
+
+    def _unrest(self, order: SimOrder):
+        resting = self.resting.get(order.depth_key)
+        if resting and order in resting:
+            resting.remove(order)
+            if not resting:
+                del self.resting[order.depth_key]
+
+    def _publish(self, orders: List[SimOrder]):
+        """Write the order updates (last state of each order) like OrderStreamingSocket does"""
+        if not orders or self.r is None:
+            return
+        try:
+            latest = {order.oid: order for order in orders}
+            pipe = self.r.pipeline(transaction=False)
+            for order in latest.values():
+                pipe.set(order.redis_key, orjson.dumps(order.to_update()), ex=self.order_ttl)
+            pipe.execute()
+            self.stats["updates_published"] += len(latest)
+        except Exception as e:
+            print(f"[ERROR] Simulated exchange failed to publish order updates: {e}")
+
+    # ---------------------------------------------------------------- stats
+
+    def open_orders(self) -> int:
+        with self.lock:
+            return sum(len(orders) for orders in self.resting.values())
+
+    def position_report(self) -> Dict[str, Dict[str, Any]]:
+        """Per depth key: net filled quantity, cash flow, and the pnl with the position marked at the last mid"""
+        with self.lock:
+            report = {}
+            for order in self.orders.values():
+                if not order.filled:
+                    continue
+                row = report.setdefault(order.depth_key, {"net_qty": 0, "cash": 0.0})
+                sign = 1 if order.is_buy else -1
+                row["net_qty"] += sign * order.filled
+                row["cash"] -= sign * order.fill_value / _PRICE_SCALE
+            for depth_key, row in report.items():
+                book = self.books.get(depth_key)
+                bid_px, _, ask_px, _ = book.snapshot() if book is not None else ((), (), (), ())
+                if bid_px and ask_px:
+                    mark = (bid_px[0] + ask_px[0]) / 2 / _PRICE_SCALE
+                else:
+                    mark = (bid_px or ask_px or (0,))[0] / _PRICE_SCALE
+                row["mark"] = mark
+                row["pnl"] = row["cash"] + row["net_qty"] * mark
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = self.stats.copy()
+        stats["open_orders"] = self.open_orders()
+        stats["fill_rate"] = stats["filled_qty"] / stats["ordered_qty"] if stats["ordered_qty"] else 0.0
+        stats["avg_slippage"] = (stats["slippage_paise"] / stats["slippage_qty"] / _PRICE_SCALE
+                                 if stats["slippage_qty"] else 0.0)
+        return stats
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f"[INFO] Simulated exchange: {stats['orders']:,} orders ({stats['rejected']:,} rejected), "
+              f"{stats['filled_qty']:,} of {stats['ordered_qty']:,} qty filled ({stats['fill_rate']:.1%}) "
+              f"in {stats['fills']:,} fills")
+        print(f"[INFO] Completed: {stats['completed']:,} | IOC expired: {stats['ioc_expired']:,} | "
+              f"Cancelled: {stats['cancelled']:,} | Modified: {stats['modified']:,} | Open: {stats['open_orders']:,}")
+        print(f"[INFO] Avg slippage vs touch: {stats['avg_slippage']:.3f} per unit | "
+              f"Depth ticks: {stats['depth_ticks']:,} ({stats['matched_ticks']:,} matched resting orders)")
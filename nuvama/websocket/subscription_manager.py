@@ -0,0 +1,256 @@
+"""
+Depth Subscription Manager
+Tracks which depth tokens are wanted (per owner) versus actually subscribed on
+the feed, applies only the difference and expires strikes far from ATM
+"""
+
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set
+
+# Strategy processes lease the depth keys they trade; the feed process honours them
+DEPTH_LEASES_KEY = "depth_subscription_leases"
+DEPTH_SUBSCRIPTION_CHANNEL = "depth_subscription_updates"
+DEFAULT_LEASE_TTL = 90.0
+# Tokens the feed process has subscribed, so a restart can resubscribe before rebuilding anything
+DEPTH_ACTIVE_KEY = "depth_subscription_active"
+
+MAPPER_OWNER_PREFIX = "mapper:"
+LEASE_OWNER_PREFIX = "lease:"
+
+
+def publish_depth_lease(redis_client, owner: str, depth_keys: Iterable[str]):
+    """Record/refresh the depth keys an owner needs and tell the feed process"""
+    payload = json.dumps({"keys": sorted(set(depth_keys)), "ts": time.time()})
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hset(DEPTH_LEASES_KEY, owner, payload)
+    pipe.publish(DEPTH_SUBSCRIPTION_CHANNEL, owner)
+    pipe.execute()
+
+
+def release_depth_lease(redis_client, owner: str):
+    """Drop an owner's lease so its tokens can be unsubscribed"""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hdel(DEPTH_LEASES_KEY, owner)
+    pipe.publish(DEPTH_SUBSCRIPTION_CHANNEL, owner)
+    pipe.execute()
+
+
+def save_active_tokens(redis_client, key: str, tokens: Iterable[str]):
+    redis_client.set(key, json.dumps({"tokens": sorted(tokens), "ts": time.time()}))
+
+
+def load_active_tokens(redis_client, key: str) -> list:
+    """Token list saved by save_active_tokens ([] when missing or unreadable)"""
+    raw = redis_client.get(key)
+    if not raw:
+        return []
+    try:
+        return list(json.loads(raw).get("tokens", []))
+    except (TypeError, ValueError, AttributeError):
+        return []
+
+
+def load_depth_leases(redis_client, owners: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """Read leases (all, or the given owners) as {owner: {"keys": [...], "ts": float}}"""
+    if owners is None:
+        raw = redis_client.hgetall(DEPTH_LEASES_KEY)
+    else:
+        owners = list(owners)
+        raw = dict(zip(owners, redis_client.hmget(DEPTH_LEASES_KEY, owners))) if owners else {}
+    leases = {}
+    for owner, value in raw.items():
+        if isinstance(owner, bytes):
+            owner = owner.decode()
+        if value is None:
+            continue
+        try:
+            leases[owner] = json.loads(value)
+        except (TypeError, ValueError):
+            continue
+    return leases
+
+
+class DepthSubscriptionManager:
+    """
+    Reference-counted desired set of depth tokens with delta reconciliation
+
+    Every token is held by one or more owners: an option_mapper batch
+    ('mapper:NIFTY:0') or a strategy lease ('lease:<owner>'). reconcile()
+    subscribes tokens that became wanted and unsubscribes tokens no owner
+    holds any more; mapper-held strikes drifting too far from ATM are released
+    by expire_far_strikes() so the universe does not only grow during the day.
+    """
+
+    def __init__(self, subscribe_fn: Callable[[list], None], unsubscribe_fn: Callable[[list, list], None],
+                 token_filter: Optional[Callable[[str], bool]] = None,
+                 on_active_change: Optional[Callable[[Set[str]], None]] = None):
+        """
+        Args:
+            subscribe_fn: Called with tokens to add to the feed
+            unsubscribe_fn: Called with (tokens to remove, tokens that stay subscribed)
+            token_filter: Only tokens it accepts are tracked (the shard's slice in sharded ingestion)
+            on_active_change: Called with the active set whenever it changes (persisted for warm restarts)
+        """
+        self.subscribe_fn = subscribe_fn
+        self.unsubscribe_fn = unsubscribe_fn
+        self.token_filter = token_filter
+        self.on_active_change = on_active_change
+        self.lock = threading.RLock()
+
+        self.owner_tokens: Dict[str, Set[str]] = {}
+        self.refcounts: Dict[str, int] = {}
+        self.active: Set[str] = set()
+
+        self.stats = {
+            "subscribed_total": 0,
+            "unsubscribed_total": 0,
+            "expired_total": 0,
+            "reconciles": 0,
+            "restored_total": 0,
+            "errors": 0
+        }
+
+    def set_owner_tokens(self, owner: str, tokens: Iterable[str]):
+        """Replace what one owner holds, adjusting refcounts by the difference"""
+        new_tokens = set(t for t in tokens if t and (self.token_filter is None or self.token_filter(t)))
+        with self.lock:
+            old_tokens = self.owner_tokens.get(owner, set())
+            for token in new_tokens - old_tokens:
+                self.refcounts[token] = self.refcounts.get(token, 0) + 1
+            for token in old_tokens - new_tokens:
+                self._decref(token)
+            if new_tokens:
+                self.owner_tokens[owner] = new_tokens
+            else:
+                self.owner_tokens.pop(owner, None)
+
+    def release_owner(self, owner: str):
+        self.set_owner_tokens(owner, ())
+
+    def _decref(self, token: str):
+        count = self.refcounts.get(token, 0) - 1
+        if count > 0:
+            self.refcounts[token] = count
+        else:
+            self.refcounts.pop(token, None)
+
+    def owners(self, prefix: str = "") -> list:
+        with self.lock:
+            return [owner for owner in self.owner_tokens if owner.startswith(prefix)]
+
+    def desired(self) -> Set[str]:
+        with self.lock:
+            return set(self.refcounts)
+
+    def restore_active(self, tokens: Iterable[str]) -> list:
+        """
+        Subscribe a previously active token set straight away (warm restart)
+
+        The tokens are marked active without an owner; the owners re-register
+        as the mapper and leases are re-applied, and whatever none of them
+        claims is unsubscribed by the next reconcile that allows removals.
+
+        Returns:
+            The tokens that were subscribed
+        """
+        tokens = sorted(set(t for t in tokens if t and (self.token_filter is None or self.token_filter(t))))
+        with self.lock:
+            self.active = set()
+            if tokens:
+                try:
+                    self.subscribe_fn(tokens)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"[ERROR] Depth subscription restore failed: {e}")
+                    return []
+            self.active = set(tokens)
+            self.stats["restored_total"] += len(tokens)
+            self._notify_active_change()
+        return tokens
+
+    def _notify_active_change(self):
+        if self.on_active_change is None:
+            return
+        try:
+            self.on_active_change(set(self.active))
+        except Exception as e:
+            print(f"[WARNING] Could not record active depth subscriptions: {e}")
+
+    def expire_far_strikes(self, options_data: Dict[str, dict], atm_by_symbol: Dict[str, float],
+                           max_distance_by_symbol: Dict[str, float]) -> int:
+        """
+        Release mapper-held option tokens whose strike is too far from ATM
+
+        Strategy leases are never expired here - a leg a strategy trades stays
+        subscribed however far the market moves.
+        """
+        expired = 0
+        with self.lock:
+            for owner in self.owners(MAPPER_OWNER_PREFIX):
+                keep = set()
+                for token in self.owner_tokens[owner]:
+                    details = options_data.get(token, {})
+                    symbol = str(details.get('symbolname', '')).upper()
+                    atm = atm_by_symbol.get(symbol)
+                    max_distance = max_distance_by_symbol.get(symbol)
+                    if atm is None or max_distance is None or details.get('optiontype') not in ("CE", "PE"):
+                        keep.add(token)
+                        continue
+                    try:
+                        distance = abs(float(details.get('strikeprice')) - atm)
+                    except (TypeError, ValueError):
+                        keep.add(token)
+                        continue
+                    if distance <= max_distance:
+                        keep.add(token)
+                expired += len(self.owner_tokens[owner]) - len(keep)
+                self.set_owner_tokens(owner, keep)
+            self.stats["expired_total"] += expired
+        return expired
+
+    def reconcile(self, allow_removals: bool = True):
+        """
+        Apply desired - active to the feed
+
+        Removals can be deferred (allow_removals=False) when the feed can only
+        unsubscribe by resubscribing everything, so they are batched into the
+        periodic maintenance pass.
+
+        Returns:
+            (added, removed) token lists
+        """
+        with self.lock:
+            desired = set(self.refcounts)
+            to_add = sorted(desired - self.active)
+            to_remove = sorted(self.active - desired) if allow_removals else []
+            try:
+                if to_remove:
+                    remaining = sorted((self.active - set(to_remove)) | set(to_add))
+                    self.unsubscribe_fn(to_remove, remaining)
+                    # the unsubscribe path already resubscribed everything that stays
+                    self.active = set(remaining)
+                elif to_add:
+                    self.subscribe_fn(to_add)
+                    self.active |= set(to_add)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[ERROR] Depth subscription reconcile failed: {e}")
+                return [], []
+            self.stats["subscribed_total"] += len(to_add)
+            self.stats["unsubscribed_total"] += len(to_remove)
+            self.stats["reconciles"] += 1
+            if to_add or to_remove:
+                print(f"[INFO] Depth subscriptions: +{len(to_add)} -{len(to_remove)} (active {len(self.active)})")
+                self._notify_active_change()
+            return to_add, to_remove
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            current_stats = self.stats.copy()
+            current_stats["active_tokens"] = len(self.active)
+            current_stats["desired_tokens"] = len(self.refcounts)
+            current_stats["owners"] = len(self.owner_tokens)
+            current_stats["lease_owners"] = len(self.owners(LEASE_OWNER_PREFIX))
+        return current_stats
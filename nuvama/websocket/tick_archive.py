@@ -0,0 +1,305 @@
+"""
+Columnar Tick Archive
+Depth and quotes ticks flattened into typed numpy columns and written as .npz
+parts next to the JSONL files, so analysis and replay filter whole arrays
+instead of parsing JSON line by line
+"""
+
+import glob
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+import orjson
+
+try:
+    from depth_codec import encode_depth, DEFAULT_LEVELS
+except ImportError:
+    from .depth_codec import encode_depth, DEFAULT_LEVELS
+
+
+# Same layout as a depth_codec record, so a buffer of encode_depth() output is
+# read as columns with one np.frombuffer call
+DEPTH_RECORD_DTYPE = np.dtype([
+    ("version", "u1"), ("levels", "u1"), ("n_bid", "u1"), ("n_ask", "u1"),
+    ("ltp", "<i4"), ("ts", "<f8"), ("tbq", "<i8"), ("taq", "<i8"),
+    ("bid_px", "<i4", (DEFAULT_LEVELS,)), ("bid_qty", "<u4", (DEFAULT_LEVELS,)),
+    ("ask_px", "<i4", (DEFAULT_LEVELS,)), ("ask_qty", "<u4", (DEFAULT_LEVELS,)),
+])
+PRICE_SCALE = 100  # prices are stored in paise
+
+DEPTH_COLUMNS = ("ts", "token", "ltp", "tbq", "taq", "n_bid", "n_ask", "bid_px", "bid_qty", "ask_px", "ask_qty")
+QUOTES_COLUMNS = ("ts", "token", "ltp")
+
+# {feed}_{YYYYMMDD}_{HH}_{part}_{writer}.npz (parts written before writer ids had no suffix)
+_PART_RE = re.compile(r"^(depth|quotes)_(\d{8})_(\d{2})_(\d{4})(?:_([A-Za-z0-9-]+))?\.npz$")
+
+
+class ColumnarTickWriter:
+    """
+    Buffers flattened ticks and writes one .npz part per feed type, hour and
+    rows_per_part rows
+
+    A part holds: ts (float64 receive time), token (int32 index into keys),
+    ltp/tbq/taq, n_bid/n_ask and bid_px/bid_qty/ask_px/ask_qty shaped
+    (rows, levels) - the level is the second axis. Prices are int paise.
+    Quotes parts hold ts, token and ltp only. Not thread safe: it is driven by
+    the TickDataManager worker thread.
+
+    Part names end in writer_id (the process id by default), so several
+    ingestion shards can write into one {date}/columnar directory without
+    picking the same part number or temp file.
+    """
+
+    def __init__(self, directory: str, rows_per_part: int = 250000, compress: bool = True, writer_id=None):
+        self.directory = directory
+        self.writer_id = str(writer_id if writer_id is not None else f"p{os.getpid()}")
+        self.rows_per_part = rows_per_part
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+
+        self.depth_records = bytearray()
+        self.depth_rows = 0
+        self.depth_tokens: List[int] = []
+        self.quotes_ts: List[float] = []
+        self.quotes_ltp: List[float] = []
+        self.quotes_tokens: List[int] = []
+        self.keys: Dict[str, Dict[str, int]] = {"depth": {}, "quotes": {}}
+        self.buffer_hour: Dict[str, Optional[str]] = {"depth": None, "quotes": None}
+        self.part_numbers: Dict[tuple, int] = {}
+        self.lock = threading.Lock()
+
+        self.stats = {"rows_written": 0, "parts_written": 0, "errors": 0}
+
+    @staticmethod
+    def _data(tick_data):
+        if isinstance(tick_data, (bytes, bytearray, memoryview)):
+            tick_data = orjson.loads(tick_data)
+        response = tick_data.get("response") if isinstance(tick_data, dict) else None
+        return response.get("data", {}) if isinstance(response, dict) else tick_data
+
+    def _token(self, feed_type: str, key: str) -> int:
+        keys = self.keys[feed_type]
+        token = keys.get(key)
+        if token is None:
+            token = keys[key] = len(keys)
+        return token
+
+    def _roll(self, feed_type: str, timestamp: float, executor=None):
+        """Flush the buffer of a feed type when the tick belongs to a new hour"""
+        hour = _hour_of(timestamp)
+        if self.buffer_hour[feed_type] != hour:
+            if self.buffer_hour[feed_type] is not None:
+                self.flush(feed_type, executor)
+            self.buffer_hour[feed_type] = hour
+
+    def add_depth(self, key: str, tick_data, timestamp: float, executor=None):
+        """Flatten one depth tick (full payload dict or its JSON bytes)"""
+        self._roll("depth", timestamp, executor)
+        self.depth_records += encode_depth(self._data(tick_data), recv_ts=timestamp)
+        self.depth_tokens.append(self._token("depth", key))
+        self.depth_rows += 1
+        if self.depth_rows >= self.rows_per_part:
+            self.flush("depth", executor)
+
+    def add_quotes(self, symbol: str, tick_data, timestamp: float, executor=None):
+        self._roll("quotes", timestamp, executor)
+        try:
+            ltp = float(self._data(tick_data).get("ltp") or 0)
+        except (TypeError, ValueError):
+            ltp = 0.0
+        self.quotes_ts.append(timestamp)
+        self.quotes_ltp.append(ltp)
+        self.quotes_tokens.append(self._token("quotes", symbol))
+        if len(self.quotes_ts) >= self.rows_per_part:
+            self.flush("quotes", executor)
+
+    def _take_depth(self) -> Optional[Dict[str, np.ndarray]]:
+        if not self.depth_rows:
+            return None
+        records = np.frombuffer(bytes(self.depth_records), dtype=DEPTH_RECORD_DTYPE)
+        columns = {name: records[name] for name in DEPTH_COLUMNS if name != "token"}
+        columns["token"] = np.asarray(self.depth_tokens, dtype=np.int32)
+        self.depth_records = bytearray()
+        self.depth_tokens = []
+        self.depth_rows = 0
+        return columns
+
+    def _take_quotes(self) -> Optional[Dict[str, np.ndarray]]:
+        if not self.quotes_ts:
+            return None
+        columns = {
+            "ts": np.asarray(self.quotes_ts, dtype=np.float64),
+            "token": np.asarray(self.quotes_tokens, dtype=np.int32),
+            "ltp": np.asarray(self.quotes_ltp, dtype=np.float64),
+        }
+        self.quotes_ts, self.quotes_ltp, self.quotes_tokens = [], [], []
+        return columns
+
+    def flush(self, feed_type: Optional[str] = None, executor=None):
+        """Write buffered rows (one feed type, or both) as new parts"""
+        for name in ((feed_type,) if feed_type else ("depth", "quotes")):
+            columns = self._take_depth() if name == "depth" else self._take_quotes()
+            if columns is None:
+                continue
+            # token ids are per part, so each part carries its own key table
+            keys = self.keys[name]
+            columns["keys"] = np.array(sorted(keys, key=keys.get), dtype=str)
+            self.keys[name] = {}
+            hour = self.buffer_hour[name] or _hour_of(float(columns["ts"][0]))
+            part = self.part_numbers.get((name, hour), 0)
+            self.part_numbers[(name, hour)] = part + 1
+            while os.path.exists(self._part_path(name, hour, part)):
+                # a restarted process keeps adding parts to the same hour
+                part += 1
+                self.part_numbers[(name, hour)] = part + 1
+            path = self._part_path(name, hour, part)
+            if executor is not None:
+                executor.submit(self._write_part, path, columns)
+            else:
+                self._write_part(path, columns)
+
+    def _part_path(self, feed_type: str, hour: str, part: int) -> str:
+        return os.path.join(self.directory, f"{feed_type}_{hour}_{part:04d}_{self.writer_id}.npz")
+
+    def _write_part(self, path: str, columns: Dict[str, np.ndarray]):
+        try:
+            tmp_path = path + ".tmp"  # carries writer_id, so only a crashed earlier process can have left it
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with open(tmp_path, "xb") as f:
+                (np.savez_compressed if self.compress else np.savez)(f, **columns)
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.stats["rows_written"] += len(columns["ts"])
+                self.stats["parts_written"] += 1
+        except Exception as e:
+            with self.lock:
+                self.stats["errors"] += 1
+            print(f"[ERROR] Error writing columnar part {path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            current_stats = self.stats.copy()
+        current_stats["buffered_rows"] = self.depth_rows + len(self.quotes_ts)
+        return current_stats
+
+
+def _hour_of(timestamp: float) -> str:
+    """'YYYYMMDD_HH' in local time, matching the JSONL file naming"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H")
+
+
+class ColumnarTickReader:
+    """Vectorized reads of the .npz parts written by ColumnarTickWriter"""
+
+    def __init__(self, base_directory="tick_data"):
+        self.base_directory = base_directory
+
+    def list_parts(self, date_str: str, feed_type: str = "depth", start_hour=None, end_hour=None) -> list:
+        """Part paths for a date, optionally limited to start_hour <= hour < end_hour"""
+        parts = []
+        pattern = os.path.join(self.base_directory, date_str, "columnar", f"{feed_type}_*.npz")
+        for path in sorted(glob.glob(pattern)):
+            match = _PART_RE.match(os.path.basename(path))
+            if not match:
+                continue
+            hour = int(match.group(3))
+            if start_hour is not None and hour < start_hour:
+                continue
+            if end_hour is not None and hour >= end_hour:
+                continue
+            parts.append(path)
+        return parts
+
+    def read_part(self, path: str, names=None) -> Dict[str, np.ndarray]:
+        """Columns of one part (all, or `names`) plus 'key' per row, prices in rupees"""
+        with np.load(path) as part:
+            names = names or [name for name in part.files if name != "keys"]
+            columns = {name: part[name] for name in names}
+            columns["key"] = part["keys"][part["token"]]
+        for name in ("ltp", "bid_px", "ask_px"):
+            if name in columns and columns[name].dtype.kind == "i":
+                columns[name] = columns[name] / PRICE_SCALE
+        return columns
+
+    def read(self, date_str: str, feed_type: str = "depth", symbol=None, start_time=None, end_time=None,
+             start_hour=None, end_hour=None) -> Dict[str, np.ndarray]:
+        """
+        Columns for one feed type, filtered by key substring and time range
+
+        Args:
+            symbol: Keep keys containing this text (as TickDataReader matches file names)
+            start_time/end_time: Receive-time bounds (epoch seconds, inclusive)
+
+        Returns:
+            Column dict sorted by ts; 'key' holds the depth redis key / quotes
+            symbol per row and prices are floats in rupees
+        """
+        names = DEPTH_COLUMNS if feed_type == "depth" else QUOTES_COLUMNS
+        chunks = {name: [] for name in names}
+        chunks["key"] = []
+        for path in self.list_parts(date_str, feed_type, start_hour, end_hour):
+            with np.load(path) as part:
+                # npz members load lazily: parts without the symbol cost only their key table
+                keys = part["keys"]
+                if symbol:
+                    wanted = np.flatnonzero(np.char.find(keys, symbol) >= 0)
+                    if not len(wanted):
+                        continue
+                token = part["token"]
+                ts = part["ts"]
+                mask = np.ones(len(ts), dtype=bool)
+                if start_time is not None:
+                    mask &= ts >= start_time
+                if end_time is not None:
+                    mask &= ts <= end_time
+                if symbol:
+                    mask &= np.isin(token, wanted)
+                if not mask.any():
+                    continue
+                for name in names:
+                    chunks[name].append(part[name][mask])
+                chunks["key"].append(keys[token[mask]])
+
+        if not chunks["ts"]:
+            return {}
+        columns = {name: np.concatenate(values) for name, values in chunks.items()}
+        order = np.argsort(columns["ts"], kind="stable")
+        columns = {name: values[order] for name, values in columns.items()}
+        if feed_type == "depth":
+            for name in ("ltp", "bid_px", "ask_px"):
+                columns[name] = columns[name] / PRICE_SCALE
+        return columns
+
+    def read_depth(self, date_str: str, symbol=None, start_time=None, end_time=None, **kwargs):
+        return self.read(date_str, "depth", symbol, start_time, end_time, **kwargs)
+
+    def read_quotes(self, date_str: str, symbol=None, start_time=None, end_time=None, **kwargs):
+        return self.read(date_str, "quotes", symbol, start_time, end_time, **kwargs)
+
+    def iter_depth_ticks(self, date_str: str, symbol=None, start_time=None, end_time=None, **kwargs):
+        """
+        Yield depth ticks shaped like TickDataReader.read_tick_file entries
+
+        Only book fields are archived (no option metadata or vendor strings),
+        so the JSONL files remain the full-fidelity record.
+        """
+        columns = self.read_depth(date_str, symbol, start_time, end_time, **kwargs)
+        if not columns:
+            return
+        rows = zip(columns["ts"].tolist(), columns["key"].tolist(), columns["ltp"].tolist(),
+                   columns["tbq"].tolist(), columns["taq"].tolist(),
+                   columns["n_bid"].tolist(), columns["n_ask"].tolist(),
+                   columns["bid_px"].tolist(), columns["bid_qty"].tolist(),
+                   columns["ask_px"].tolist(), columns["ask_qty"].tolist())
+        for ts, key, ltp, tbq, taq, n_bid, n_ask, bid_px, bid_qty, ask_px, ask_qty in rows:
+            data = {
+                "bidValues": [{"price": p, "qty": q} for p, q in zip(bid_px[:n_bid], bid_qty[:n_bid])],
+                "askValues": [{"price": p, "qty": q} for p, q in zip(ask_px[:n_ask], ask_qty[:n_ask])],
+                "ltp": ltp, "tbq": tbq, "taq": taq,
+            }
+            yield {"timestamp": ts, "type": "depth", "redis_key": key, "data": {"response": {"data": data}}}
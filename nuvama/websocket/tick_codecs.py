@@ -0,0 +1,241 @@
+"""
+Tick File Codecs
+Compression codecs for tick JSONL files (none/gzip/lz4/zstd): block writers
+for TickDataManager, format detection for TickDataReader and the sparse
+time-index sidecar that lets readers seek to a time window
+"""
+
+import gzip
+import io
+import os
+import zlib
+from typing import Dict, List, Optional
+
+import orjson
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODEC_NONE = "none"
+CODEC_GZIP = "gzip"
+CODEC_LZ4 = "lz4"
+CODEC_ZSTD = "zstd"
+
+CODEC_EXTENSIONS: Dict[str, str] = {
+    CODEC_NONE: ".jsonl",
+    CODEC_GZIP: ".jsonl.gz",
+    CODEC_LZ4: ".jsonl.lz4",
+    CODEC_ZSTD: ".jsonl.zst",
+}
+TICK_FILE_EXTENSIONS = tuple(CODEC_EXTENSIONS.values())
+
+DEFAULT_LEVELS: Dict[str, Optional[int]] = {CODEC_NONE: None, CODEC_GZIP: 6, CODEC_LZ4: 0, CODEC_ZSTD: 3}
+
+_MAGIC = (
+    (b"\x1f\x8b", CODEC_GZIP),
+    (b"\x04\x22\x4d\x18", CODEC_LZ4),
+    (b"\x28\xb5\x2f\xfd", CODEC_ZSTD),
+)
+
+
+def available_codecs() -> list:
+    """Codecs whose library is installed"""
+    codecs = [CODEC_NONE, CODEC_GZIP]
+    if lz4_frame is not None:
+        codecs.append(CODEC_LZ4)
+    if zstandard is not None:
+        codecs.append(CODEC_ZSTD)
+    return codecs
+
+
+def check_codec(codec: str) -> str:
+    """Validate a codec name, raising ValueError/ImportError early instead of on the first flush"""
+    if codec not in CODEC_EXTENSIONS:
+        raise ValueError(f"Unknown tick codec '{codec}' - expected one of {', '.join(CODEC_EXTENSIONS)}")
+    if codec == CODEC_LZ4 and lz4_frame is None:
+        raise ImportError("lz4 codec needs the 'lz4' package")
+    if codec == CODEC_ZSTD and zstandard is None:
+        raise ImportError("zstd codec needs the 'zstandard' package")
+    return codec
+
+
+def codec_for_path(filepath: str) -> str:
+    """Codec implied by a tick file name"""
+    for codec, extension in CODEC_EXTENSIONS.items():
+        if codec != CODEC_NONE and filepath.endswith(extension):
+            return codec
+    return CODEC_NONE
+
+
+def detect_codec(filepath: str) -> str:
+    """Codec from the file's magic bytes, falling back to its extension (empty files)"""
+    with open(filepath, "rb") as f:
+        head = f.read(4)
+    for magic, codec in _MAGIC:
+        if head.startswith(magic):
+            return codec
+    return codec_for_path(filepath) if not head else CODEC_NONE
+
+
+class TickBlockWriter:
+    """
+    Append writer that emits a tick file as independently decompressible blocks
+
+    Every block is a complete gzip member / lz4 frame / zstd frame, so a
+    reader can start decoding at any block offset recorded in the index.
+    flush() pushes the open block's data to disk (decodable up to that
+    point) without ending it, so flushes within a block share context.
+    """
+
+    def __init__(self, filepath: str, codec: str, level: Optional[int] = None):
+        self.codec = check_codec(codec)
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.raw = open(filepath, "ab")
+        self.offset = self.raw.tell()  # append mode starts at the end of any earlier run
+        self.block_offset = self.offset
+        self._compressor = None
+
+    def _begin_block(self):
+        self.block_offset = self.offset
+        if self.codec == CODEC_GZIP:
+            self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)  # wbits 31: gzip member
+            return b""
+        if self.codec == CODEC_LZ4:
+            self._compressor = lz4_frame.LZ4FrameCompressor(compression_level=self.level, auto_flush=True)
+            return self._compressor.begin()
+        if self.codec == CODEC_ZSTD:
+            self._compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+            return b""
+        self._compressor = True
+        return b""
+
+    def _emit(self, data: bytes):
+        if data:
+            self.raw.write(data)
+            self.offset += len(data)
+
+    def write(self, data: bytes):
+        if self._compressor is None:
+            self._emit(self._begin_block())
+        if self.codec == CODEC_NONE:
+            self._emit(data)
+        else:
+            self._emit(self._compressor.compress(data))
+
+    def flush(self):
+        if self._compressor is not None:
+            if self.codec == CODEC_GZIP:
+                self._emit(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+            elif self.codec == CODEC_ZSTD:
+                self._emit(self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+        self.raw.flush()
+
+    def end_block(self) -> Optional[tuple]:
+        """Finish the open block; returns its (offset, length), None when no block is open"""
+        if self._compressor is None:
+            return None
+        if self.codec in (CODEC_GZIP, CODEC_LZ4, CODEC_ZSTD):
+            self._emit(self._compressor.flush())
+        self._compressor = None
+        self.raw.flush()
+        return self.block_offset, self.offset - self.block_offset
+
+    def close(self) -> Optional[tuple]:
+        block = self.end_block()
+        self.raw.close()
+        return block
+
+
+def _decompressor(codec: str):
+    if codec == CODEC_GZIP:
+        return zlib.decompressobj(31)
+    if codec == CODEC_LZ4:
+        return lz4_frame.LZ4FrameDecompressor()
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def iter_decoded(codec: str, f, length: Optional[int] = None, chunk_size: int = 65536):
+    """
+    Decompressed bytes of one block - `length` bytes from f's position, or the
+    unindexed tail up to EOF, which may hold several frames and end mid-frame -
+    read and decoded chunk_size compressed bytes at a time, so a reader never
+    holds a whole decoded block; whatever decodes cleanly is yielded
+    """
+    remaining = length
+    decompressor = None
+    while remaining is None or remaining > 0:
+        data = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+        if not data:
+            return
+        if remaining is not None:
+            remaining -= len(data)
+        if codec == CODEC_NONE:
+            yield data
+            continue
+        while data:
+            if decompressor is None:
+                decompressor = _decompressor(codec)
+            try:
+                # yielded without a local reference, so a suspended reader holds only what it consumes
+                yield decompressor.decompress(data)
+            except Exception:
+                return  # torn block left by a crash - the next indexed block starts clean
+            if decompressor.eof:
+                data = decompressor.unused_data  # next frame of a multi-frame tail
+                decompressor = None
+            else:
+                data = b""
+
+
+# Sparse time index: one JSON line per finished block next to the tick file
+INDEX_SUFFIX = ".idx"
+
+
+def index_path(filepath: str) -> str:
+    return filepath + INDEX_SUFFIX
+
+
+def append_block_index(filepath: str, offset: int, length: int, first_ts: float, last_ts: float, ticks: int):
+    entry = {"offset": offset, "length": length, "ts0": first_ts, "ts1": last_ts, "ticks": ticks}
+    with open(index_path(filepath), "ab") as f:
+        f.write(orjson.dumps(entry) + b"\n")
+
+
+def load_block_index(filepath: str) -> List[dict]:
+    """Index entries ordered by offset ([] when the file has no sidecar)"""
+    path = index_path(filepath)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                entries.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                continue  # half-written last line
+    entries.sort(key=lambda entry: entry["offset"])
+    return entries
+
+
+def open_tick_reader(filepath: str):
+    """Text-mode line reader for a tick file of any codec (detected from its content)"""
+    codec = detect_codec(filepath)
+    if codec == CODEC_GZIP:
+        return gzip.open(filepath, "rt", encoding="utf-8")
+    if codec == CODEC_LZ4:
+        check_codec(codec)
+        return lz4_frame.open(filepath, "rt", encoding="utf-8")
+    if codec == CODEC_ZSTD:
+        check_codec(codec)
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"), read_across_frames=True,
+                                                              closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8")
+    return open(filepath, "r", encoding="utf-8")
@@ -6,15 +6,93 @@ Efficiently saves tick data to files for later simulation and analysis
 import os
 import time
 import threading
-import queue
 import orjson
 from datetime import datetime, date
 from typing import Dict, Any
-import gzip
 import asyncio
 import redis
 import re
-from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from tick_ring_buffer import SpscRingBuffer
+except ImportError:
+    from .tick_ring_buffer import SpscRingBuffer
+
+try:
+    from tick_codecs import (
+        CODEC_GZIP, CODEC_NONE, CODEC_EXTENSIONS, TICK_FILE_EXTENSIONS,
+        TickBlockWriter, check_codec, open_tick_reader, detect_codec, iter_decoded,
+        append_block_index, load_block_index
+    )
+except ImportError:
+    from .tick_codecs import (
+        CODEC_GZIP, CODEC_NONE, CODEC_EXTENSIONS, TICK_FILE_EXTENSIONS,
+        TickBlockWriter, check_codec, open_tick_reader, detect_codec, iter_decoded,
+        append_block_index, load_block_index
+    )
+
+try:
+    from depth_delta import DepthDeltaEncoder, DepthDeltaDecoder
+except ImportError:
+    from .depth_delta import DepthDeltaEncoder, DepthDeltaDecoder
+
+# hour suffix of per-key tick file names, any codec: depth_X_20250811_14.jsonl.lz4
+_HOUR_FILE_RE = re.compile(r"_(\d+)\.jsonl(\.\w+)?$")
+
+# Multiplexed day files are sorted per drained batch only: a producer can push
+# an older tick into a ring the drain already passed, so consecutive batches
+# overlap by up to a drain cycle. Readers buffer this much market time to
+# restore the order.
+DAY_FILE_REORDER_SECONDS = 2.0
+
+
+def depth_file_key(redis_key: str) -> str:
+    """Tick file key for a depth Redis key (depth:NIFTY_25000_CE-28NOV24 -> depth_NIFTY_25000_CE-28NOV24)"""
+    if redis_key.startswith("depth:"):
+        file_suffix = redis_key[6:]  # Remove 'depth:' prefix
+    else:
+        file_suffix = redis_key
+    
+    # Clean filename (replace invalid characters)
+    file_suffix = file_suffix.replace(":", "_").replace("/", "_").replace("\\", "_")
+    return f"depth_{file_suffix}"
+
+
+def is_day_file(filepath: str) -> bool:
+    """Multiplexed ticks_{date} file (time-sorted per batch, not globally)"""
+    return os.path.basename(filepath).startswith("ticks_")
+
+
+def reorder_ticks(ticks, window: float = DAY_FILE_REORDER_SECONDS):
+    """Ticks whose timestamps are out of order by at most `window` seconds, in timestamp order"""
+    pending = []
+    for seq, tick in enumerate(ticks):
+        heapq.heappush(pending, (tick['timestamp'], seq, tick))
+        horizon = tick['timestamp'] - window
+        while pending[0][0] <= horizon:
+            yield heapq.heappop(pending)[2]
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def encode_tick_line(tick_entry: Dict[Any, Any]) -> bytes:
+    """
+    One JSONL record for a queued tick
+
+    When the payload was already serialized by the feed callback (bytes), the
+    same bytes are spliced in as the "data" value instead of being parsed and
+    dumped again; readers still get {"timestamp": float, ..., "data": {...}}.
+    """
+    data = tick_entry.get("data")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        header = orjson.dumps({k: v for k, v in tick_entry.items() if k != "data"})
+        return header[:-1] + b',"data":' + bytes(data) + b'}\n'
+    return orjson.dumps(tick_entry) + b'\n'
 
 
 class TickDataManager:
@@ -23,7 +101,10 @@ class TickDataManager:
     with minimal impact on real-time performance
     """
     
-    def __init__(self, base_directory="tick_data", enable_compression=True, buffer_size=1000, flush_interval=5.0):
+    def __init__(self, base_directory="tick_data", enable_compression=True, buffer_size=1000, flush_interval=5.0,
+                 enable_columnar=False, columnar_rows_per_part=250000, multiplex_day_file=False,
+                 codec=None, compression_level=None, ring_capacity=131072, index_block_ticks=2000,
+                 depth_delta=False, depth_keyframe_interval=500):
         """
         Initialize tick data manager
         
@@ -32,36 +113,90 @@ class TickDataManager:
             enable_compression: Whether to compress files (saves space but uses more CPU)
             buffer_size: Number of ticks to buffer before writing to disk
             flush_interval: Time interval (seconds) to force flush buffers
+            enable_columnar: Also write ticks as typed .npz columns under {date}/columnar
+                             (needs numpy; read with tick_archive.ColumnarTickReader)
+            columnar_rows_per_part: Rows buffered per columnar part before it is written
+            multiplex_day_file: Write every tick to one {date}/ticks_{date}.jsonl[.gz] file
+                                instead of one file per key per hour
+            codec: 'none', 'gzip', 'lz4' or 'zstd' (default: gzip, or none when
+                   enable_compression is False); TickDataReader detects it per file
+            compression_level: Codec level (codec default when omitted)
+            ring_capacity: Ticks each producer thread can have in flight before new ones are dropped
+            index_block_ticks: Ticks per independently decompressible block; each finished
+                               block gets a line in the file's .idx time index
+            depth_delta: Write depth ticks as per-key keyframes plus changed levels/fields
+                         only (TickDataReader rebuilds the full snapshots); every index
+                         block starts with a keyframe per key
+            depth_keyframe_interval: Ticks of a key between its full keyframes
         """
         self.base_directory = base_directory
-        self.enable_compression = enable_compression
+        self.codec = check_codec(codec or (CODEC_GZIP if enable_compression else CODEC_NONE))
+        self.compression_level = compression_level
+        self.index_block_ticks = index_block_ticks
+        self.depth_delta = depth_delta
+        self.depth_keyframe_interval = depth_keyframe_interval
+        self.enable_compression = self.codec != CODEC_NONE
         self.buffer_size = buffer_size
         self.flush_interval = flush_interval
+        self.multiplex_day_file = multiplex_day_file
         
         # Create base directory structure
         self._setup_directories()
+        
+        # Columnar archive next to the JSONL files (flattened in the worker thread)
+        self.columnar = None
+        if enable_columnar:
+            try:
+                try:
+                    from tick_archive import ColumnarTickWriter
+                except ImportError:
+                    from .tick_archive import ColumnarTickWriter
+                self.columnar = ColumnarTickWriter(
+                    os.path.join(os.path.dirname(self.directories["stats"]), "columnar"),
+                    rows_per_part=columnar_rows_per_part,
+                    compress=self.enable_compression
+                )
+            except Exception as e:
+                print(f"[ERROR] Columnar tick archive disabled: {e}")
        
         
-        # Threading components for async processing
-        self.tick_queue = queue.Queue(maxsize=100000)  # Large queue to handle bursts
+        # Threading components for async processing: one preallocated SPSC ring per
+        # producer thread (normally just the feed callback thread), drained by the worker
+        self.ring_capacity = ring_capacity
+        self._rings = ()
+        self._ring_owners = {}  # ring -> weakref to its producer thread
+        self._retired_rings = (0, 0)  # (pushed, dropped) of the rings dropped with their threads
+        self._ring_lock = threading.Lock()  # only taken when a producer thread appears or is retired
+        self._local = threading.local()
+        self.idle_sleep = 0.005
+        self.last_tick_time = None
         self.worker_thread = None
         self.is_running = False
         
         # File handles and buffers
+        # file_key -> (filepath, TickBlockWriter, open block [first ts, last ts, ticks],
+        # DepthDeltaEncoder or None); only touched by the file writer thread
         self.file_handles = {}
         self.tick_buffers = {}
         self.last_flush_time = time.time()
         
-        # Thread pool for I/O operations
+        # Thread pool for I/O operations (columnar parts)
         self.executor = ThreadPoolExecutor(max_workers=2)
+        # One thread owns the long-lived file writers, which also keeps each file's flushes in order
+        self.file_writer = ThreadPoolExecutor(max_workers=1)
         
-        # Statistics
-        self.stats = {
-            "total_ticks_received": 0,
+        # Statistics - every counter has a single owning thread (producers count in
+        # their ring), so nothing is lost to unsynchronized read-modify-writes
+        self.worker_stats = {"ticks_processed": 0, "errors": 0}
+        self.writer_stats = {
             "total_ticks_written": 0,
             "files_created": 0,
-            "errors": 0,
-            "last_tick_time": None
+            "files_closed": 0,
+            "write_calls": 0,
+            "bytes_written": 0,
+            "index_blocks": 0,
+            "depth_deltas": 0,
+            "errors": 0
         }
         
         # Start background processing
@@ -91,99 +226,127 @@ class TickDataManager:
     def stop(self):
         """Stop the background processing and flush all buffers"""
         if self.is_running:
+            # The worker drains every ring before it exits
             self.is_running = False
             
-            # Signal stop by putting None in queue
-            self.tick_queue.put(None)
-            
             # Wait for worker thread to finish
             if self.worker_thread and self.worker_thread.is_alive():
                 self.worker_thread.join(timeout=10)
             
             # Final flush
             self._flush_all_buffers()
-            self._close_all_files()
+            if self.columnar:
+                self.columnar.flush(executor=self.executor)
             
-            # Shutdown executor
+            # Close writers once every queued write has run, then shutdown executors
+            self.file_writer.submit(self._close_all_files)
+            self.file_writer.shutdown(wait=True)
             self.executor.shutdown(wait=True)
             
-            print(f"[SUCCESS] TickDataManager stopped - Total ticks processed: {self.stats['total_ticks_written']}")
+            print(f"[SUCCESS] TickDataManager stopped - Total ticks processed: {self.writer_stats['total_ticks_written']}")
+    
+    def _producer_ring(self) -> SpscRingBuffer:
+        """This thread's ring, created the first time the thread produces a tick"""
+        try:
+            return self._local.ring
+        except AttributeError:
+            ring = SpscRingBuffer(self.ring_capacity)
+            with self._ring_lock:
+                self._ring_owners[ring] = weakref.ref(threading.current_thread())
+                self._rings = self._rings + (ring,)
+            self._local.ring = ring
+            return ring
+    
+    def _dropped(self, ring: SpscRingBuffer, what: str):
+        # rate limited - printing every drop from the feed thread would make the overload worse
+        if ring.dropped % 10000 == 1:
+            print(f"[WARNING] Tick ring full - dropped {ring.dropped:,} ticks so far (latest: {what})")
+    
+    def _owner_alive(self, ring: SpscRingBuffer) -> bool:
+        thread = self._ring_owners[ring]()
+        return thread is not None and thread.is_alive()
     
-    def save_quotes_tick(self, symbol: str, tick_data: Dict[Any, Any]):
+    def _retire_rings(self, rings: list):
+        """Forget the rings of exited producer threads (warm reconnects start new ones), keeping their counters"""
+        with self._ring_lock:
+            pushed, dropped = self._retired_rings
+            for ring in rings:
+                del self._ring_owners[ring]
+                pushed += ring.head
+                dropped += ring.dropped
+            self._rings = tuple(ring for ring in self._rings if ring in self._ring_owners)
+            self._retired_rings = (pushed, dropped)
+    
+    def save_quotes_tick(self, symbol: str, tick_data: Dict[Any, Any], timestamp: float = None):
         """
-        Save a quotes tick to the processing queue
+        Save a quotes tick to the processing ring
         
         Args:
             symbol: Symbol name (e.g., 'NIFTY', 'SENSEX')
-            tick_data: The tick data dictionary
+            tick_data: The tick data dictionary, or its orjson bytes (written as is)
+            timestamp: Receive time (epoch seconds), now when omitted
         """
-        try:
+        if timestamp is None:
             timestamp = time.time()
-            tick_entry = {
-                "timestamp": timestamp,
-                "datetime": datetime.fromtimestamp(timestamp).isoformat(),
-                "type": "quotes",
-                "symbol": symbol,
-                "data": tick_data
-            }
-            
-            # Non-blocking put with timeout to prevent blocking the callback
-            self.tick_queue.put(tick_entry, timeout=0.01)
-            self.stats["total_ticks_received"] += 1
-            self.stats["last_tick_time"] = timestamp
-            
-        except queue.Full:
-            self.stats["errors"] += 1
-            print(f"[WARNING] Tick queue full - dropping quotes tick for {symbol}")
-        except Exception as e:
-            self.stats["errors"] += 1
-            print(f"[ERROR] Error queuing quotes tick for {symbol}: {e}")
+        ring = self._producer_ring()
+        # Never blocks the callback: a full ring drops the tick and counts it
+        if ring.push(("quotes", symbol, None, tick_data, timestamp)):
+            self.last_tick_time = timestamp
+        else:
+            self._dropped(ring, symbol)
     
-    def save_depth_tick(self, redis_key: str, tick_data: Dict[Any, Any]):
+    def save_depth_tick(self, redis_key: str, tick_data: Dict[Any, Any], file_key: str = None,
+                        timestamp: float = None):
         """
-        Save a depth tick to the processing queue
+        Save a depth tick to the processing ring
         
         Args:
             redis_key: Redis key (e.g., 'depth:NIFTY_25000_CE-28NOV24')
-            tick_data: The tick data dictionary
+            tick_data: The tick data dictionary, or its orjson bytes (written as is)
+            file_key: Precomputed depth_file_key(redis_key), derived when omitted
+            timestamp: Receive time (epoch seconds), now when omitted
         """
-        try:
+        if timestamp is None:
             timestamp = time.time()
-            tick_entry = {
-                "timestamp": timestamp,
-                "datetime": datetime.fromtimestamp(timestamp).isoformat(),
-                "type": "depth",
-                "redis_key": redis_key,
-                "data": tick_data
-            }
-            
-            # Non-blocking put with timeout
-            self.tick_queue.put(tick_entry, timeout=0.01)
-            self.stats["total_ticks_received"] += 1
-            self.stats["last_tick_time"] = timestamp
-            
-        except queue.Full:
-            self.stats["errors"] += 1
-            print(f"[WARNING] Tick queue full - dropping depth tick for {redis_key}")
-        except Exception as e:
-            self.stats["errors"] += 1
-            print(f"[ERROR] Error queuing depth tick for {redis_key}: {e}")
+        ring = self._producer_ring()
+        if ring.push(("depth", redis_key, file_key, tick_data, timestamp)):
+            self.last_tick_time = timestamp
+        else:
+            self._dropped(ring, redis_key)
+    
+    def _drain_rings(self) -> int:
+        """Process everything currently in the rings; returns the number of ticks handled"""
+        handled = 0
+        rings = self._rings
+        batches = [ring.drain() for ring in rings]
+        # a dead thread pushes nothing more, so its ring can go once it is empty
+        dead = [ring for ring, batch in zip(rings, batches)
+                if not batch and not self._owner_alive(ring) and not len(ring)]
+        if dead:
+            self._retire_rings(dead)
+        if self.multiplex_day_file and len(batches) > 1:
+            # every ring is in time order; the day file takes them interleaved, not one ring after another
+            batches = [heapq.merge(*batches, key=lambda item: item[4])]
+        for batch in batches:
+            for tick_type, key, file_key, tick_data, timestamp in batch:
+                # the JSONL envelope dict is built here, off the feed thread
+                if tick_type == "depth":
+                    tick_entry = {"timestamp": timestamp, "type": "depth", "redis_key": key,
+                                  "file_key": file_key, "data": tick_data}
+                else:
+                    tick_entry = {"timestamp": timestamp, "type": tick_type, "symbol": key, "data": tick_data}
+                self._process_single_tick(tick_entry)
+                handled += 1
+        self.worker_stats["ticks_processed"] += handled
+        return handled
     
     def _process_ticks(self):
-        """Background thread function to process ticks from queue"""
+        """Background thread function to process ticks from the rings"""
         print("[INFO] Tick processing thread started")
         
         while self.is_running:
             try:
-                # Get tick from queue with timeout
-                tick_entry = self.tick_queue.get(timeout=1.0)
-                
-                # Check for stop signal
-                if tick_entry is None:
-                    break
-                
-                # Process the tick
-                self._process_single_tick(tick_entry)
+                handled = self._drain_rings()
                 
                 # Check if we need to flush buffers
                 current_time = time.time()
@@ -191,17 +354,20 @@ class TickDataManager:
                     self._flush_all_buffers()
                     self.last_flush_time = current_time
                 
-            except queue.Empty:
-                # Timeout occurred, check for periodic flush
-                current_time = time.time()
-                if current_time - self.last_flush_time >= self.flush_interval:
-                    self._flush_all_buffers()
-                    self.last_flush_time = current_time
-                continue
+                if not handled:
+                    time.sleep(self.idle_sleep)
             except Exception as e:
-                self.stats["errors"] += 1
+                self.worker_stats["errors"] += 1
                 print(f"[ERROR] Error processing tick: {e}")
         
+        # Ticks captured before stop() are still written
+        try:
+            while self._drain_rings():
+                pass
+        except Exception as e:
+            self.worker_stats["errors"] += 1
+            print(f"[ERROR] Error draining tick rings: {e}")
+        
         print("[INFO] Tick processing thread stopped")
     
     def _process_single_tick(self, tick_entry: Dict[Any, Any]):
@@ -217,19 +383,21 @@ class TickDataManager:
                 print(f"[WARNING] Unknown tick type: {tick_type}")
                 
         except Exception as e:
-            self.stats["errors"] += 1
+            self.worker_stats["errors"] += 1
             print(f"[ERROR] Error processing single tick: {e}")
     
     def _process_quotes_tick(self, tick_entry: Dict[Any, Any]):
         """Process a quotes tick and add to buffer"""
         symbol = tick_entry["symbol"]
-        file_key = f"quotes_{symbol}"
+        file_key = "ticks" if self.multiplex_day_file else f"quotes_{symbol}"
         
         # Add to buffer
         if file_key not in self.tick_buffers:
             self.tick_buffers[file_key] = []
         
         self.tick_buffers[file_key].append(tick_entry)
+        if self.columnar:
+            self.columnar.add_quotes(symbol, tick_entry["data"], tick_entry["timestamp"], self.executor)
         
         # Check if buffer needs flushing
         if len(self.tick_buffers[file_key]) >= self.buffer_size:
@@ -237,113 +405,176 @@ class TickDataManager:
     
     def _process_depth_tick(self, tick_entry: Dict[Any, Any]):
         """Process a depth tick and add to buffer"""
-        redis_key = tick_entry["redis_key"]
-        
-        # Extract symbol info from redis key for file naming
-        # Format: depth:NIFTY_25000_CE-28NOV24
-        if redis_key.startswith("depth:"):
-            file_suffix = redis_key[6:]  # Remove 'depth:' prefix
-        else:
-            file_suffix = redis_key
-        
-        # Clean filename (replace invalid characters)
-        file_suffix = file_suffix.replace(":", "_").replace("/", "_").replace("\\", "_")
-        file_key = f"depth_{file_suffix}"
+        # Routed ticks carry their file key (not persisted); derive it for direct callers
+        file_key = tick_entry.pop("file_key", None) or depth_file_key(tick_entry["redis_key"])
+        if self.multiplex_day_file:
+            file_key = "ticks"
         
         # Add to buffer
         if file_key not in self.tick_buffers:
             self.tick_buffers[file_key] = []
         
         self.tick_buffers[file_key].append(tick_entry)
+        if self.columnar:
+            self.columnar.add_depth(tick_entry["redis_key"], tick_entry["data"], tick_entry["timestamp"], self.executor)
         
         # Check if buffer needs flushing
         if len(self.tick_buffers[file_key]) >= self.buffer_size:
             self._flush_buffer(file_key)
     
+    def _file_path(self, file_key: str) -> str:
+        """Current file for a buffer: hourly per key, or the day's multiplexed file"""
+        today = date.today().strftime("%Y%m%d")
+        extension = CODEC_EXTENSIONS[self.codec]
+        
+        if file_key == "ticks":
+            return os.path.join(self.base_directory, today, f"ticks_{today}{extension}")
+        
+        # Get the appropriate directory
+        if file_key.startswith("quotes_"):
+            directory = self.directories["quotes"]
+        elif file_key.startswith("depth_"):
+            directory = self.directories["depth"]
+        else:
+            directory = self.directories["stats"]
+        
+        # Create filename with timestamp
+        hour = datetime.now().strftime("%H")
+        return os.path.join(directory, f"{file_key}_{today}_{hour}{extension}")
+    
     def _flush_buffer(self, file_key: str):
         """Flush a specific buffer to file"""
         if file_key not in self.tick_buffers or not self.tick_buffers[file_key]:
             return
         
         try:
-            # Get the appropriate directory
-            if file_key.startswith("quotes_"):
-                directory = self.directories["quotes"]
-            elif file_key.startswith("depth_"):
-                directory = self.directories["depth"]
-            else:
-                directory = self.directories["stats"]
-            
-            # Create filename with timestamp
-            today = date.today().strftime("%Y%m%d")
-            hour = datetime.now().strftime("%H")
-            
-            if self.enable_compression:
-                filename = f"{file_key}_{today}_{hour}.jsonl.gz"
-            else:
-                filename = f"{file_key}_{today}_{hour}.jsonl"
-            
-            filepath = os.path.join(directory, filename)
+            filepath = self._file_path(file_key)
             
             # Write buffer to file
-            ticks_to_write = self.tick_buffers[file_key].copy()
-            self.tick_buffers[file_key].clear()
+            ticks_to_write = self.tick_buffers[file_key]
+            self.tick_buffers[file_key] = []
             
-            # Submit to thread pool for I/O
-            self.executor.submit(self._write_ticks_to_file, filepath, ticks_to_write)
+            # Submit to the file writer thread for I/O
+            self.file_writer.submit(self._write_ticks_to_file, file_key, filepath, ticks_to_write)
             
         except Exception as e:
-            self.stats["errors"] += 1
+            self.worker_stats["errors"] += 1
             print(f"[ERROR] Error flushing buffer for {file_key}: {e}")
     
-    def _write_ticks_to_file(self, filepath: str, ticks: list):
-        """Write ticks to file (runs in thread pool)"""
+    def _open_writer(self, file_key: str, filepath: str):
+        """Writer and open-block state for a file key, rotating (closing) the previous file when its path changed"""
+        current = self.file_handles.get(file_key)
+        if current is not None:
+            if current[0] == filepath:
+                return current
+            self._close_file(file_key)
+        
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        # compressed blocks of index_block_ticks instead of one member per flush
+        encoder = DepthDeltaEncoder(self.depth_keyframe_interval) if self.depth_delta and not file_key.startswith("quotes_") else None
+        current = (filepath, TickBlockWriter(filepath, self.codec, self.compression_level), [None, None, 0], encoder)
+        self.file_handles[file_key] = current
+        self.writer_stats["files_created"] += 1
+        print(f"[INFO] Created tick data file: {os.path.basename(filepath)}")
+        return current
+    
+    def _end_block(self, filepath: str, writer: TickBlockWriter, block: list, encoder=None, closing: bool = False):
+        """Finish the open block and record it in the file's time index"""
+        finished = writer.close() if closing else writer.end_block()
+        if finished and block[2]:
+            append_block_index(filepath, finished[0], finished[1], block[0], block[1], block[2])
+            self.writer_stats["index_blocks"] += 1
+        block[:] = [None, None, 0]
+        if encoder is not None:
+            encoder.reset()  # the next block opens with a keyframe per key, so it decodes on its own
+    
+    def _write_ticks_to_file(self, file_key: str, filepath: str, ticks: list):
+        """Append ticks through the file's long-lived writer (runs on the file writer thread)"""
         try:
-            mode = 'ab' if self.enable_compression else 'a'
-            
-            if self.enable_compression:
-                with gzip.open(filepath, mode) as f:
-                    for tick in ticks:
-                        line = orjson.dumps(tick) + b'\n'
-                        f.write(line)
+            filepath, writer, block, encoder = self._open_writer(file_key, filepath)
+            if encoder is not None:
+                encoded = [encoder.encode(tick) for tick in ticks]
+                self.writer_stats["depth_deltas"] += sum(1 for tick in encoded if "delta" in tick)
+                data = b''.join(encode_tick_line(tick) for tick in encoded)
             else:
-                with open(filepath, mode, encoding='utf-8') as f:
-                    for tick in ticks:
-                        line = orjson.dumps(tick).decode() + '\n'
-                        f.write(line)
+                data = b''.join(encode_tick_line(tick) for tick in ticks)
+            writer.write(data)
             
-            self.stats["total_ticks_written"] += len(ticks)
+            first_ts = min(tick["timestamp"] for tick in ticks)
+            last_ts = max(tick["timestamp"] for tick in ticks)
+            block[0] = first_ts if block[0] is None else min(block[0], first_ts)
+            block[1] = last_ts if block[1] is None else max(block[1], last_ts)
+            block[2] += len(ticks)
+            if block[2] >= self.index_block_ticks:
+                self._end_block(filepath, writer, block, encoder)
+            else:
+                # sync flush: complete lines reach the disk every flush, the block's compression context is kept
+                writer.flush()
             
-            # Track file creation
-            if filepath not in self.file_handles:
-                self.stats["files_created"] += 1
-                print(f"[INFO] Created tick data file: {os.path.basename(filepath)}")
+            self.writer_stats["total_ticks_written"] += len(ticks)
+            self.writer_stats["write_calls"] += 1
+            self.writer_stats["bytes_written"] += len(data)
             
         except Exception as e:
-            self.stats["errors"] += 1
+            self.writer_stats["errors"] += 1
             print(f"[ERROR] Error writing to file {filepath}: {e}")
     
+    def _close_file(self, file_key: str):
+        filepath, writer, block, encoder = self.file_handles.pop(file_key)
+        try:
+            self._end_block(filepath, writer, block, encoder, closing=True)
+            self.writer_stats["files_closed"] += 1
+        except Exception as e:
+            print(f"[ERROR] Error closing tick data file {os.path.basename(filepath)}: {e}")
+    
+    def _close_stale_files(self):
+        """Close writers of previous hours for keys that have stopped ticking"""
+        for file_key, (filepath, *_) in list(self.file_handles.items()):
+            if filepath != self._file_path(file_key):
+                self._close_file(file_key)
+    
     def _flush_all_buffers(self):
         """Flush all buffers to disk"""
         for file_key in list(self.tick_buffers.keys()):
             if self.tick_buffers[file_key]:  # Only flush non-empty buffers
                 self._flush_buffer(file_key)
+        self.file_writer.submit(self._close_stale_files)
     
     def _close_all_files(self):
         """Close all open file handles"""
-        for handle in self.file_handles.values():
-            try:
-                handle.close()
-            except Exception as e:
-                print(f"[ERROR] Error closing file handle: {e}")
-        self.file_handles.clear()
+        for file_key in list(self.file_handles.keys()):
+            self._close_file(file_key)
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get current statistics"""
-        current_stats = self.stats.copy()
-        current_stats["queue_size"] = self.tick_queue.qsize()
+        """
+        Get current statistics
+        
+        Each counter is read once from the thread that owns it, so the ring
+        figures (received = consumed + queued, dropped) agree with each other.
+        """
+        with self._ring_lock:
+            live_rings, (retired_pushed, retired_dropped) = self._rings, self._retired_rings
+        rings = [ring.snapshot() for ring in live_rings]
+        writer_stats = self.writer_stats.copy()
+        worker_stats = self.worker_stats.copy()
+        
+        current_stats = {
+            "total_ticks_received": retired_pushed + sum(r["pushed"] for r in rings),
+            "total_ticks_dropped": retired_dropped + sum(r["dropped"] for r in rings),
+            "total_ticks_processed": worker_stats["ticks_processed"],
+            "queue_size": sum(r["size"] for r in rings),
+            "queue_capacity": sum(r["capacity"] for r in rings),
+            "queue_high_watermark": max((r["high_watermark"] for r in rings), default=0),
+            "producer_threads": len(rings),
+            "last_tick_time": self.last_tick_time,
+        }
+        current_stats.update(writer_stats)
+        current_stats["errors"] = writer_stats["errors"] + worker_stats["errors"]
         current_stats["buffer_count"] = len(self.tick_buffers)
-        current_stats["total_buffered_ticks"] = sum(len(buffer) for buffer in self.tick_buffers.values())
+        current_stats["open_files"] = len(self.file_handles)
+        current_stats["total_buffered_ticks"] = sum(len(buffer) for buffer in list(self.tick_buffers.values()))
+        if self.columnar:
+            current_stats["columnar"] = self.columnar.get_stats()
         return current_stats
     
     def print_stats(self):
@@ -353,10 +584,19 @@ class TickDataManager:
         print("-" * 40)
         print(f"[INFO] Total ticks received: {stats['total_ticks_received']:,}")
         print(f"[INFO] Total ticks written: {stats['total_ticks_written']:,}")
-        print(f"[INFO] Files created: {stats['files_created']}")
-        print(f"[INFO] Queue size: {stats['queue_size']}")
+        print(f"[INFO] Files created: {stats['files_created']} (open: {stats['open_files']})")
+        print(f"[INFO] Write calls: {stats['write_calls']:,} ({stats['bytes_written'] / 1024 / 1024:.1f} MB raw)")
+        if self.depth_delta:
+            print(f"[INFO] Depth ticks written as deltas: {stats['depth_deltas']:,}")
+        print(f"[INFO] Ticks dropped (ring full): {stats['total_ticks_dropped']:,}")
+        print(f"[INFO] Queue size: {stats['queue_size']} / {stats['queue_capacity']} "
+              f"(high watermark {stats['queue_high_watermark']})")
         print(f"[INFO] Active buffers: {stats['buffer_count']}")
         print(f"[INFO] Buffered ticks: {stats['total_buffered_ticks']}")
+        if "columnar" in stats:
+            columnar = stats["columnar"]
+            print(f"[INFO] Columnar rows written: {columnar['rows_written']:,} "
+                  f"({columnar['parts_written']} parts, {columnar['buffered_rows']:,} buffered)")
         print(f"[ERROR] Errors: {stats['errors']}")
         if stats['last_tick_time']:
             last_tick = datetime.fromtimestamp(stats['last_tick_time']).strftime("%H:%M:%S")
@@ -369,8 +609,15 @@ class TickDataReader:
     Utility class to read and simulate tick data from saved files
     """
     
-    def __init__(self, base_directory="tick_data"):
+    def __init__(self, base_directory="tick_data", read_chunk_size=16384):
+        """
+        Args:
+            base_directory: Base directory for tick data files
+            read_chunk_size: Compressed bytes decoded at a time from indexed files
+                             (per open file, so it bounds a merged replay's memory)
+        """
         self.base_directory = base_directory
+        self.read_chunk_size = read_chunk_size
     
     def list_available_dates(self) -> list:
         """List all available dates with tick data"""
@@ -385,13 +632,16 @@ class TickDataReader:
     def list_available_files(self, date_str: str) -> Dict[str, list]:
         """List all available files for a specific date"""
         date_path = os.path.join(self.base_directory, date_str)
-        files = {"quotes": [], "depth": []}
+        files = {"quotes": [], "depth": [], "ticks": []}
         
         if os.path.exists(date_path):
             for data_type in ["quotes", "depth"]:
                 type_path = os.path.join(date_path, data_type)
                 if os.path.exists(type_path):
-                    files[data_type] = [f for f in os.listdir(type_path) if f.endswith(('.jsonl', '.jsonl.gz'))]
+                    files[data_type] = [f for f in os.listdir(type_path) if f.endswith(TICK_FILE_EXTENSIONS)]
+            # multiplexed day files sit directly under the date directory
+            files["ticks"] = [f for f in os.listdir(date_path)
+                              if f.startswith("ticks_") and f.endswith(TICK_FILE_EXTENSIONS)]
         
         return files
     
@@ -405,31 +655,210 @@ class TickDataReader:
             end_time: End timestamp (optional)
             
         Yields:
-            Individual tick data entries
+            Individual tick data entries (delta-encoded depth ticks rebuilt to full snapshots),
+            in file order - only roughly time-ordered for a multiplexed day file (see reorder_ticks)
         """
+        index = load_block_index(filepath)
+        if index:
+            yield from self._read_indexed(filepath, index, start_time, end_time)
+            return
+        ordered = not is_day_file(filepath)
         try:
-            if filepath.endswith('.gz'):
-                file_obj = gzip.open(filepath, 'rt', encoding='utf-8')
-            else:
-                file_obj = open(filepath, 'r', encoding='utf-8')
+            # codec detected from the file content (none/gzip/lz4/zstd)
+            file_obj = open_tick_reader(filepath)
+            decoder = DepthDeltaDecoder()
             
             with file_obj as f:
                 for line in f:
                     if line.strip():
-                        tick = orjson.loads(line.strip())
+                        tick = decoder.decode(orjson.loads(line.strip()))
+                        if tick is None:
+                            continue
                         
                         # Apply time filtering if specified
                         if start_time and tick['timestamp'] < start_time:
                             continue
                         if end_time and tick['timestamp'] > end_time:
-                            break
+                            if ordered:
+                                break
+                            continue
                         
                         yield tick
                         
+        except EOFError:
+            # compressed stream still being written (or cut by a crash) - every synced line was read
+            pass
         except Exception as e:
             print(f"[ERROR] Error reading tick file {filepath}: {e}")
     
-    def simulate_tick_replay(self, date_str: str, symbol=None, speed_multiplier=1.0,start_hour=10,end_hour=15):
+    @staticmethod
+    def _index_spans(index: list, start_time=None, end_time=None, ordered=True) -> list:
+        """(offset, length) of the indexed blocks overlapping the window, then the unindexed tail (length None)"""
+        tail_offset = 0
+        spans = []
+        for entry in index:
+            tail_offset = max(tail_offset, entry["offset"] + entry["length"])
+            if start_time and entry["ts1"] < start_time:
+                continue
+            if end_time and entry["ts0"] > end_time:
+                if not ordered:
+                    continue  # a later day file block can still reach back into the window
+                break
+            spans.append((entry["offset"], entry["length"]))
+        else:
+            spans.append((tail_offset, None))
+        return spans
+    
+    def tick_spans(self, filepath: str, start_time=None, end_time=None) -> list:
+        """Units a file decodes in independently: its index blocks in the window, or [None] (whole file) without an index"""
+        index = load_block_index(filepath)
+        return self._index_spans(index, start_time, end_time, not is_day_file(filepath)) if index else [None]
+    
+    def read_tick_span(self, filepath: str, span, start_time=None, end_time=None):
+        """Ticks of one tick_spans() unit (None reads the whole file)"""
+        if span is None:
+            yield from self.read_tick_file(filepath, start_time, end_time)
+            return
+        try:
+            with open(filepath, 'rb') as f:
+                yield from self._read_span(f, detect_codec(filepath), span[0], span[1], start_time, end_time,
+                                           not is_day_file(filepath))
+        except Exception as e:
+            print(f"[ERROR] Error reading indexed tick file {filepath}: {e}")
+    
+    def _read_indexed(self, filepath: str, index: list, start_time=None, end_time=None):
+        """
+        Read through the .idx time index: blocks ending before start_time are
+        skipped without being read or decompressed, then blocks are decoded
+        one at a time (in chunks) until end_time; the unindexed tail (block
+        still being written) is decoded last
+        """
+        ordered = not is_day_file(filepath)
+        try:
+            codec = detect_codec(filepath)
+            with open(filepath, 'rb') as f:
+                for offset, length in self._index_spans(index, start_time, end_time, ordered):
+                    yield from self._read_span(f, codec, offset, length, start_time, end_time, ordered)
+        except Exception as e:
+            print(f"[ERROR] Error reading indexed tick file {filepath}: {e}")
+    
+    def _read_span(self, f, codec: str, offset: int, length, start_time=None, end_time=None, ordered=True):
+        """Ticks of one block; every block starts with its own depth keyframes"""
+        decoder = DepthDeltaDecoder()
+        f.seek(offset)
+        # decoded a chunk at a time; a trailing line without its newline was cut by an unfinished flush
+        pending = b''
+        for chunk in iter_decoded(codec, f, length, chunk_size=self.read_chunk_size):
+            lines = (pending + chunk).split(b'\n')
+            del chunk  # a merged replay keeps one of these loops suspended per file
+            pending = lines.pop()
+            for line in lines:
+                if not line.strip():
+                    continue
+                tick = decoder.decode(orjson.loads(line))
+                if tick is None:
+                    continue
+                if start_time and tick['timestamp'] < start_time:
+                    continue
+                if end_time and tick['timestamp'] > end_time:
+                    if ordered:
+                        return
+                    continue
+                yield tick
+    
+    @staticmethod
+    def _day_file_filter(ticks, symbol=None, start_hour=10, end_hour=15):
+        """Ticks of a multiplexed day file (hour and symbol are taken from each tick)"""
+        for tick in ticks:
+            if not start_hour <= datetime.fromtimestamp(tick['timestamp']).hour < end_hour:
+                continue
+            if symbol and symbol not in (tick.get('symbol') or tick.get('redis_key') or ''):
+                continue
+            yield tick
+    
+    def _replay_files(self, date_str: str, symbol=None, start_hour=10, end_hour=15):
+        """(per-key hourly file lists in hour order, multiplexed day files) of a date"""
+        files = self.list_available_files(date_str)
+        date_path = os.path.join(self.base_directory, date_str)
+        
+        # key (file name without the hour) -> [(hour, path), ...]
+        key_files = {}
+        for data_type in ("quotes", "depth"):
+            for filename in files[data_type]:
+                match = _HOUR_FILE_RE.search(filename)
+                if not match:
+                    continue
+                hour = int(match.group(1))
+                if not start_hour <= hour < end_hour:
+                    continue
+                if symbol and symbol not in filename:
+                    continue
+                key_files.setdefault(filename[:match.start()], []).append(
+                    (hour, os.path.join(date_path, data_type, filename)))
+        
+        key_paths = [[path for _, path in sorted(hours)] for hours in key_files.values()]
+        return key_paths, [os.path.join(date_path, filename) for filename in files["ticks"]]
+    
+    def iter_ticks(self, date_str: str, symbol=None, start_hour=10, end_hour=15, start_time=None, end_time=None,
+                   workers=None):
+        """
+        All ticks of a date in timestamp order, streamed
+        
+        Each key's hourly files are chained (opened one after the other, only
+        when reached) into one time-ordered iterator, and the keys are merged
+        with a heap; memory is one pending tick (plus one decoded block) per
+        key, not the whole day, and the first tick is available right away.
+        With workers > 1 the blocks are decoded in a process pool instead.
+        """
+        if workers and workers > 1:
+            return self._iter_ticks_pooled(date_str, symbol, start_hour, end_hour, start_time, end_time, workers)
+        key_paths, day_files = self._replay_files(date_str, symbol, start_hour, end_hour)
+        
+        streams = [itertools.chain.from_iterable(self.read_tick_file(path, start_time, end_time) for path in paths)
+                   for paths in key_paths]
+        for filepath in day_files:
+            # only roughly time-ordered - restored before it joins the merge
+            streams.append(reorder_ticks(self._day_file_filter(self.read_tick_file(filepath, start_time, end_time),
+                                                               symbol, start_hour, end_hour)))
+        
+        return heapq.merge(*streams, key=lambda tick: tick['timestamp'])
+    
+    def _iter_ticks_pooled(self, date_str: str, symbol, start_hour, end_hour, start_time, end_time, workers,
+                           prefetch=2):
+        """
+        iter_ticks with decompression, delta rebuild and JSON parsing done in
+        worker processes, one index block (or unindexed file) per task; every
+        stream keeps `prefetch` blocks in flight, so the pool stays busy while
+        the heap merge consumes the batches in order. The tick dicts are still
+        built here (one orjson.loads per batch), which bounds the speedup -
+        it pays off for gzip/zstd files and slow consumers, not for lz4.
+        """
+        key_paths, day_files = self._replay_files(date_str, symbol, start_hour, end_hour)
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            streams = [self._pooled_ticks(executor, paths, start_time, end_time, prefetch) for paths in key_paths]
+            for filepath in day_files:
+                streams.append(reorder_ticks(self._day_file_filter(
+                    self._pooled_ticks(executor, [filepath], start_time, end_time, prefetch),
+                    symbol, start_hour, end_hour)))
+            yield from heapq.merge(*streams, key=lambda tick: tick['timestamp'])
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _pooled_ticks(self, executor, paths: list, start_time=None, end_time=None, prefetch=2):
+        """Ticks of consecutive files, decoded span by span in the pool"""
+        pending = deque()
+        for filepath in paths:
+            for span in self.tick_spans(filepath, start_time, end_time):
+                pending.append(executor.submit(decode_tick_span, filepath, span, start_time, end_time,
+                                               self.read_chunk_size))
+                if len(pending) > prefetch:
+                    yield from orjson.loads(pending.popleft().result())
+        while pending:
+            yield from orjson.loads(pending.popleft().result())
+    
+    def simulate_tick_replay(self, date_str: str, symbol=None, speed_multiplier=1.0,start_hour=10,end_hour=15,
+                             start_time=None, end_time=None, workers=None):
         """
         Simulate tick data replay for a specific date
         
@@ -437,57 +866,23 @@ class TickDataReader:
             date_str: Date in YYYYMMDD format
             symbol: Specific symbol to replay (optional)
             speed_multiplier: Speed multiplier for replay (1.0 = real-time)
+            start_time/end_time: Replay window (epoch seconds); indexed files seek straight to it
+            workers: Decode the files in this many processes (single process when omitted)
         """
-        files = self.list_available_files(date_str)
-        date_path = os.path.join(self.base_directory, date_str)
-        
         print(f"[INFO] Starting tick replay for {date_str}")
         if symbol:
             print(f"[INFO] Filtering for symbol: {symbol}")
         
-        # Collect all ticks with timestamps
-        all_ticks = []
-        
-        # Read quotes files
-        for filename in files["quotes"]:
-            match = re.search(r"_(\d+)\.jsonl\.gz$", filename)
-            if match:
-                num = int(match.group(1))
-                if start_hour <= num < end_hour:
-                    if symbol and symbol not in filename:
-                        continue
-                    filepath = os.path.join(date_path, "quotes", filename)
-                    for tick in self.read_tick_file(filepath):
-                        # print("Tick : ",tick)
-                        all_ticks.append(tick)
-        
-        # Read depth files
-        for filename in files["depth"]:
-            match = re.search(r"_(\d+)\.jsonl\.gz$", filename)
-            if match:
-                num = int(match.group(1))
-                if start_hour <= num < end_hour:
-                    if symbol and symbol not in filename:
-                        continue
-                    filepath = os.path.join(date_path, "depth", filename)
-                    for tick in self.read_tick_file(filepath):
-                        all_ticks.append(tick)
-                    print("READING DEPTH FILES COMPLETED")
-        
-        # Sort by timestamp
-        all_ticks.sort(key=lambda x: x['timestamp'])
-    
-        if not all_ticks:
-            print(f"[ERROR] No tick data found for {date_str}")
-            return
-        
-        print(f"[INFO] Found {len(all_ticks)} ticks to replay")
-        
-        # Replay ticks
-        start_timestamp = all_ticks[0]['timestamp']
-        start_replay_time = time.time()
+        # Streamed k-way merge of the files - ticks are yielded as they are read, never collected
+        start_timestamp = None
+        start_replay_time = None
+        replayed = 0
         
-        for i, tick in enumerate(all_ticks):
+        for tick in self.iter_ticks(date_str, symbol, start_hour, end_hour, start_time, end_time, workers):
+            if start_timestamp is None:
+                start_timestamp = tick['timestamp']
+                start_replay_time = time.time()
+            
             # Calculate delay
             elapsed_market_time = tick['timestamp'] - start_timestamp
             elapsed_replay_time = time.time() - start_replay_time
@@ -498,11 +893,26 @@ class TickDataReader:
             
             # Yield the tick for processing
             yield tick
+            replayed += 1
             
-            if (i + 1) % 1000 == 0:
-                print(f"[INFO] Replayed {i + 1:,}/{len(all_ticks):,} ticks")
+            if replayed % 1000 == 0:
+                print(f"[INFO] Replayed {replayed:,} ticks")
+        
+        if not replayed:
+            print(f"[ERROR] No tick data found for {date_str}")
+            return
         
-        print(f"[SUCCESS] Tick replay completed for {date_str}")
+        print(f"[SUCCESS] Tick replay completed for {date_str} - {replayed:,} ticks")
+
+
+def decode_tick_span(filepath: str, span, start_time=None, end_time=None, read_chunk_size=16384) -> bytes:
+    """
+    Process pool task: the ticks of one TickDataReader.tick_spans() unit as
+    a single orjson array - one pickled bytes object per batch instead of
+    thousands of dicts
+    """
+    reader = TickDataReader(os.path.dirname(filepath), read_chunk_size=read_chunk_size)
+    return orjson.dumps(list(reader.read_tick_span(filepath, span, start_time, end_time)))
 
 
 if __name__ == "__main__":
@@ -1,183 +1,526 @@
 """
 Tick Data Utilities - Tools for analyzing and replaying saved tick data
+
+Analysis loads a day into numpy/pandas columns and caches the results in
+the day's stats directory (see TickDataAnalyzer)
 """
 
+import math
 import os
 import time
+from typing import Dict, Any
+
+import numpy as np
 import orjson
+import pandas as pd
 from datetime import datetime, date
 from tick_data_manager import TickDataReader
+from tick_archive import ColumnarTickReader
+from tick_codecs import load_block_index
+from clock import WALL_CLOCK, ReplayClock
+from replay_targets import RedisReplayTarget
 import argparse
 import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+
+ANALYSIS_VERSION = 1
+RATE_EDGES = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]  # ticks per second
+SPREAD_EDGES = [0, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20]  # rupees
+PERCENTILES = (50, 90, 99, 99.9)
+_STRIKE_RE = r"^depth:([^_]+)_(\d+(?:\.\d+)?)_(CE|PE)"
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _best_price(levels):
+    return _float(levels[0].get("price")) if levels else math.nan
+
+
+def load_tick_columns(filepath, span=None):
+    """
+    One TickDataReader.tick_spans() unit (the whole file when span is None)
+    flattened into numpy columns - ts, depth flag, key token, ltp and best
+    bid/ask (NaN when absent); a process pool task, so only the arrays and
+    the small key table travel back instead of the ticks
+    """
+    reader = TickDataReader(os.path.dirname(filepath))
+    ts, depth, tokens, ltp, bid, ask = [], [], [], [], [], []
+    keys = {}
+    for tick in reader.read_tick_span(filepath, span):
+        is_depth = tick.get('type') == 'depth' or 'redis_key' in tick
+        key = tick.get('redis_key', '') if is_depth else tick.get('symbol', 'UNKNOWN')
+        token = keys.get(key)
+        if token is None:
+            token = keys[key] = len(keys)
+        payload = tick.get('data')
+        response = payload.get('response') if isinstance(payload, dict) else None
+        data = response.get('data', {}) if isinstance(response, dict) else (payload or {})
+        ts.append(tick['timestamp'])
+        depth.append(is_depth)
+        tokens.append(token)
+        ltp.append(_float(data.get('ltp')))
+        bid.append(_best_price(data.get('bidValues')) if is_depth else math.nan)
+        ask.append(_best_price(data.get('askValues')) if is_depth else math.nan)
+    return {
+        "ts": np.asarray(ts, dtype=np.float64), "depth": np.asarray(depth, dtype=bool),
+        "token": np.asarray(tokens, dtype=np.int32), "keys": list(keys),
+        "ltp": np.asarray(ltp, dtype=np.float64), "bid": np.asarray(bid, dtype=np.float64),
+        "ask": np.asarray(ask, dtype=np.float64),
+    }
+
+
+def _percentiles(values, percentiles=PERCENTILES):
+    if not len(values):
+        return {}
+    return {f"p{p:g}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+
+
+def _histogram(values, edges):
+    """Counts per [edge, next edge) bin, the last bin open-ended"""
+    counts = np.bincount(np.searchsorted(edges, values, side="right") - 1, minlength=len(edges))
+    return {"edges": list(edges), "counts": counts[:len(edges)].tolist()}
 
 
 class TickDataAnalyzer:
-    """Analyze saved tick data files"""
+    """
+    Analyze saved tick data files
+
+    A day is loaded once into columns (from the .npz archive when it was
+    written, otherwise decoded from the tick files) and every statistic is a
+    vectorized pass over them: per-file counts, ticks/sec distribution,
+    inter-arrival percentiles, best bid/ask spreads, hourly and per-strike
+    activity. The results go to {date}/stats/analysis.json with a signature of
+    the input files, so reruns on a finished day skip the load entirely.
+    """
     
-    def __init__(self, base_directory="tick_data"):
+    def __init__(self, base_directory="tick_data", workers=None, source="auto", use_cache=True):
+        """
+        Args:
+            base_directory: Base directory for tick data files
+            workers: Decode files in this many processes, one index block per task
+                     (single process when omitted)
+            source: 'files', 'columnar' (the .npz archive) or 'auto' (the archive when it
+                    covers the day's tick files, which it may not: it is enabled per process)
+            use_cache: Reuse {date}/stats/analysis.json while the inputs are unchanged
+        """
         self.reader = TickDataReader(base_directory)
+        self.columnar = ColumnarTickReader(base_directory)
         self.base_directory = base_directory
-        
+        self.workers = workers
+        self.source = source
+        self.use_cache = use_cache
     
-    def analyze_date(self, date_str):
-        """Analyze tick data for a specific date"""
-        print(f"\n[INFO] ANALYZING TICK DATA FOR {date_str}")
-        print("=" * 50)
-        
+    def _tick_files(self, date_str):
+        """(file type, path) of every tick file of a date"""
         files = self.reader.list_available_files(date_str)
         date_path = os.path.join(self.base_directory, date_str)
+        paths = [(file_type, os.path.join(date_path, file_type, filename))
+                 for file_type in ("quotes", "depth") for filename in sorted(files[file_type])]
+        paths += [("ticks", os.path.join(date_path, filename)) for filename in sorted(files["ticks"])]
+        return paths
+    
+    def _archive_covers(self, parts, files) -> bool:
+        """
+        Whether the archive parts hold every tick of the files: their time
+        span reaches both ends of the files' .idx span and they have at least
+        as many rows. Files without an index (or still open, with an
+        unindexed tail) can't be checked cheaply and count as not covered.
+        """
+        first_ts, last_ts, ticks = math.inf, -math.inf, 0
+        for _, path in files:
+            index = load_block_index(path)
+            if not index:
+                return False
+            first_ts = min(first_ts, min(entry["ts0"] for entry in index))
+            last_ts = max(last_ts, max(entry["ts1"] for entry in index))
+            ticks += sum(entry["ticks"] for entry in index)
         
-        total_ticks = 0
-        total_size = 0
-        symbols_analyzed = set()
+        archive_first, archive_last, rows = math.inf, -math.inf, 0
+        for _, path in parts:
+            ts = self.columnar.read_part(path, ["ts", "token"])["ts"]
+            if len(ts):
+                archive_first = min(archive_first, float(ts.min()))
+                archive_last = max(archive_last, float(ts.max()))
+                rows += len(ts)
+        return archive_first <= first_ts and archive_last >= last_ts and rows >= ticks
+    
+    def _inputs(self, date_str):
+        """(source, [(file type, path)]) the analysis of a date reads"""
+        files = self._tick_files(date_str) if self.source != "columnar" else []
+        if self.source != "files":
+            parts = [(feed_type, path) for feed_type in ("quotes", "depth")
+                     for path in self.columnar.list_parts(date_str, feed_type)]
+            if self.source == "columnar" or (parts and self._archive_covers(parts, files)):
+                return "columnar", parts
+            if parts:
+                print(f"[WARNING] Columnar archive of {date_str} does not cover its tick files - reading the files")
+        return "files", files
+    
+    def _load_files(self, paths):
+        """Decoded columns per file path - split into index blocks across the process pool when workers > 1"""
+        filepaths = [path for _, path in paths]
+        if not self.workers or self.workers <= 1:
+            return {filepath: [load_tick_columns(filepath)] for filepath in filepaths}
+        tasks = [(filepath, span) for filepath in filepaths for span in self.reader.tick_spans(filepath)]
+        by_file = {filepath: [] for filepath in filepaths}
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(load_tick_columns, [t[0] for t in tasks], [t[1] for t in tasks],
+                                   chunksize=max(1, len(tasks) // (self.workers * 8)))
+            for (filepath, _), columns in zip(tasks, results):
+                by_file[filepath].append(columns)
+        return by_file
+    
+    def load_frame(self, date_str, inputs=None) -> pd.DataFrame:
+        """
+        One row per tick: ts, file, file_type, depth, key, symbol, strike,
+        option_type, ltp, bid, ask, spread (categoricals for the string columns)
+        """
+        source, paths = inputs or self._inputs(date_str)
+        chunks = []
+        if source == "columnar":
+            for feed_type, path in paths:
+                names = ["ts", "ltp"] + (["n_bid", "n_ask", "bid_px", "ask_px"] if feed_type == "depth" else [])
+                part = self.columnar.read_part(path, names + ["token"])
+                rows = len(part["ts"])
+                if feed_type == "depth":
+                    bid = np.where(part["n_bid"] > 0, part["bid_px"][:, 0], np.nan)
+                    ask = np.where(part["n_ask"] > 0, part["ask_px"][:, 0], np.nan)
+                else:
+                    bid = ask = np.full(rows, np.nan)
+                chunks.append(pd.DataFrame({
+                    "ts": part["ts"], "file": os.path.basename(path), "file_type": feed_type,
+                    "depth": feed_type == "depth", "key": part["key"],
+                    "ltp": part["ltp"].astype(np.float64), "bid": bid, "ask": ask,
+                }))
+        else:
+            file_types = {path: file_type for file_type, path in paths}
+            for filepath, blocks in self._load_files(paths).items():
+                for columns in blocks:
+                    if not len(columns["ts"]):
+                        continue
+                    chunks.append(pd.DataFrame({
+                        "ts": columns["ts"], "file": os.path.basename(filepath), "file_type": file_types[filepath],
+                        "depth": columns["depth"], "key": np.asarray(columns["keys"], dtype=object)[columns["token"]],
+                        "ltp": columns["ltp"], "bid": columns["bid"], "ask": columns["ask"],
+                    }))
+        if not chunks:
+            return pd.DataFrame(columns=["ts", "file", "file_type", "depth", "key", "symbol", "strike",
+                                         "option_type", "ltp", "bid", "ask", "spread"])
+        frame = pd.concat(chunks, ignore_index=True)
+        for name in ("file", "file_type", "key"):
+            frame[name] = frame[name].astype("category")
         
-        # Analyze quotes files
-        print("\n[INFO] QUOTES DATA:")
-        print("-" * 20)
-        for filename in files["quotes"]:
-            filepath = os.path.join(date_path, "quotes", filename)
-            file_size = os.path.getsize(filepath)
-            total_size += file_size
-            
-            tick_count = 0
-            timestamps = []
-            
-            for tick in self.reader.read_tick_file(filepath):
-                tick_count += 1
-                timestamps.append(tick['timestamp'])
-                symbols_analyzed.add(tick.get('symbol', 'UNKNOWN'))
-            
-            total_ticks += tick_count
-            
-            if timestamps:
-                start_time = datetime.fromtimestamp(min(timestamps)).strftime("%H:%M:%S")
-                end_time = datetime.fromtimestamp(max(timestamps)).strftime("%H:%M:%S")
-                duration = max(timestamps) - min(timestamps)
-                avg_frequency = tick_count / duration if duration > 0 else 0
-                
-                print(f"  [INFO] {filename}")
-                print(f"     [INFO] Ticks: {tick_count:,}")
-                print(f"     [INFO] Size: {file_size/1024/1024:.2f} MB")
-                print(f"     [INFO] Time: {start_time} - {end_time}")
-                print(f"     [INFO] Freq: {avg_frequency:.1f} ticks/sec")
-                print()
+        # symbol/strike/type parsed once per distinct key, then mapped through the key codes
+        keys = pd.Series(frame["key"].cat.categories)
+        parsed = keys.str.extract(_STRIKE_RE)
+        is_depth_key = keys.str.startswith("depth:")
+        symbols = parsed[0].fillna(keys.where(~is_depth_key, keys.str[6:].str.split("_").str[0]))
+        codes = frame["key"].cat.codes.to_numpy()
+        frame["symbol"] = pd.Categorical(symbols.to_numpy()[codes])
+        frame["strike"] = pd.to_numeric(parsed[1], errors="coerce").to_numpy()[codes]
+        frame["option_type"] = pd.Categorical(parsed[2].to_numpy()[codes])
+        frame["spread"] = (frame["ask"] - frame["bid"]).round(2)  # whole paise, so bin edges are exact
+        frame.sort_values("ts", kind="stable", inplace=True, ignore_index=True)
+        return frame
+    
+    def _signature(self, inputs):
+        """Source plus (path, size, mtime) of every input - a growing file of today invalidates the cache"""
+        source, paths = inputs
+        signature = [source]
+        for _, path in paths:
+            stat = os.stat(path)
+            signature.append([os.path.relpath(path, self.base_directory), stat.st_size, stat.st_mtime_ns])
+        return signature
+    
+    def _cache_path(self, date_str):
+        return os.path.join(self.base_directory, date_str, "stats", "analysis.json")
+    
+    def analyze(self, date_str, refresh=False) -> Dict[str, Any]:
+        """Statistics of a date, from the stats cache while its inputs are unchanged"""
+        inputs = self._inputs(date_str)
+        signature = self._signature(inputs)
+        cache_path = self._cache_path(date_str)
+        if self.use_cache and not refresh and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "rb") as f:
+                    cached = orjson.loads(f.read())
+                if cached.get("version") == ANALYSIS_VERSION and cached.get("signature") == signature:
+                    cached["cached"] = True
+                    return cached
+            except Exception as e:
+                print(f"[WARNING] Ignoring unreadable analysis cache {cache_path}: {e}")
         
-        # Analyze depth files
-        print("\n[INFO] DEPTH DATA:")
-        print("-" * 20)
-        for filename in files["depth"]:
-            filepath = os.path.join(date_path, "depth", filename)
-            file_size = os.path.getsize(filepath)
-            total_size += file_size
-            
-            tick_count = 0
-            timestamps = []
-            
-            for tick in self.reader.read_tick_file(filepath):
-                tick_count += 1
-                timestamps.append(tick['timestamp'])
-                
-                # Extract symbol from redis_key
-                redis_key = tick.get('redis_key', '')
-                if redis_key.startswith('depth:'):
-                    symbol_part = redis_key[6:].split('_')[0]
-                    symbols_analyzed.add(symbol_part)
-            
-            total_ticks += tick_count
-            
-            if timestamps:
-                start_time = datetime.fromtimestamp(min(timestamps)).strftime("%H:%M:%S")
-                end_time = datetime.fromtimestamp(max(timestamps)).strftime("%H:%M:%S")
-                duration = max(timestamps) - min(timestamps)
-                avg_frequency = tick_count / duration if duration > 0 else 0
-                
-                print(f"  [INFO] {filename}")
-                print(f"     [INFO] Ticks: {tick_count:,}")
-                print(f"     [INFO] Size: {file_size/1024/1024:.2f} MB")
-                print(f"     [INFO] Time: {start_time} - {end_time}")
-                print(f"     [INFO] Freq: {avg_frequency:.1f} ticks/sec")
-                print()
+        started = time.time()
+        results = self.compute(date_str, self.load_frame(date_str, inputs), inputs[1])
+        results["version"] = ANALYSIS_VERSION
+        results["signature"] = signature
+        results["source"] = signature[0]
+        results["seconds"] = round(time.time() - started, 3)
+        results["cached"] = False
+        if self.use_cache and signature[1:]:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp_path = cache_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+                os.replace(tmp_path, cache_path)
+            except Exception as e:
+                print(f"[WARNING] Could not write analysis cache {cache_path}: {e}")
+        return results
+    
+    def compute(self, date_str, frame: pd.DataFrame, paths) -> Dict[str, Any]:
+        """The statistics of a load_frame() result read from paths ([(file type, path)])"""
+        sizes = {os.path.basename(path): (file_type, os.path.getsize(path)) for file_type, path in paths}
+        results = {"date": date_str, "total_ticks": int(len(frame)),
+                   "total_size": int(sum(size for _, size in sizes.values())), "files": []}
+        
+        per_file = frame.groupby("file", observed=True)["ts"].agg(["count", "min", "max"]) if len(frame) else None
+        for name, (file_type, size) in sizes.items():
+            row = {"name": name, "type": file_type, "size": size, "ticks": 0, "first_ts": None, "last_ts": None}
+            if per_file is not None and name in per_file.index:
+                count, first_ts, last_ts = per_file.loc[name]
+                row.update(ticks=int(count), first_ts=float(first_ts), last_ts=float(last_ts))
+            results["files"].append(row)
+        if not len(frame):
+            return results
+        
+        ts = frame["ts"].to_numpy()
+        results["first_ts"] = float(ts[0])
+        results["last_ts"] = float(ts[-1])
+        results["symbols"] = sorted(str(s) for s in frame["symbol"].dropna().unique())
+        
+        # ticks/sec over every second of the session, idle seconds included
+        per_second = np.bincount((ts - np.floor(ts[0])).astype(np.int64))
+        busiest = int(np.argmax(per_second))
+        results["rate"] = {
+            "seconds": int(len(per_second)), "active_seconds": int(np.count_nonzero(per_second)),
+            "mean": float(per_second.mean()), **_percentiles(per_second),
+            "max": int(per_second[busiest]), "max_at": float(np.floor(ts[0]) + busiest),
+            "histogram": _histogram(per_second, RATE_EDGES),
+        }
+        
+        # gaps between consecutive ticks of the feed, and of each key on its own
+        codes = frame["key"].cat.codes.to_numpy()
+        order = np.lexsort((ts, codes))
+        key_gaps = np.diff(ts[order])[codes[order][1:] == codes[order][:-1]]
+        results["inter_arrival_ms"] = {
+            "all": {**_percentiles(np.diff(ts) * 1000), "max": float(np.diff(ts).max() * 1000) if len(ts) > 1 else 0.0},
+            "per_key": {**_percentiles(key_gaps * 1000), "max": float(key_gaps.max() * 1000) if len(key_gaps) else 0.0},
+        }
+        
+        # best-level spreads of two-sided depth ticks (a crossed/locked book shows as <= 0)
+        books = frame[frame["depth"] & frame["spread"].notna()]
+        if len(books):
+            spreads = books["spread"].to_numpy()
+            by_symbol = books.groupby("symbol", observed=True)["spread"]
+            results["spread"] = {
+                "ticks": int(len(spreads)), "mean": float(spreads.mean()), "min": float(spreads.min()),
+                **_percentiles(spreads, (10, 50, 90, 99)),
+                "by_symbol": {str(symbol): {"ticks": int(len(values)), **_percentiles(values.to_numpy(), (50, 90, 99))}
+                              for symbol, values in by_symbol},
+                "histogram": _histogram(np.clip(spreads, 0, None), SPREAD_EDGES),
+            }
+        
+        # local hour of each tick from the date's local midnight
+        midnight = datetime.strptime(date_str, "%Y%m%d").timestamp()
+        hours = np.clip(((ts - midnight) // 3600).astype(np.int64), 0, 23)
+        symbol_codes = frame["symbol"].cat.codes.to_numpy()
+        hourly = np.zeros((len(frame["symbol"].cat.categories) + 1, 24), dtype=np.int64)
+        np.add.at(hourly, (symbol_codes + 1, hours), 1)  # row 0: ticks without a symbol
+        results["hourly"] = {
+            (str(symbol) if row else ""): {f"{hour:02d}": int(count) for hour, count in enumerate(hourly[row]) if count}
+            for row, symbol in enumerate([None] + list(frame["symbol"].cat.categories)) if hourly[row].any()
+        }
+        
+        options = frame[frame["strike"].notna()]
+        if len(options):
+            strikes = options.groupby(["symbol", "strike", "option_type"], observed=True).agg(
+                ticks=("ts", "size"), first_ts=("ts", "min"), last_ts=("ts", "max"),
+                median_spread=("spread", "median"), p90_spread=("spread", lambda s: s.quantile(0.9)))
+            strikes = strikes.sort_values("ticks", ascending=False).reset_index()
+            strikes["strike"] = strikes["strike"].astype(float)
+            strikes = strikes.astype({"symbol": str, "option_type": str, "median_spread": object, "p90_spread": object})
+            results["strikes"] = strikes.where(strikes.notna(), None).to_dict("records")
+        return results
+    
+    def analyze_date(self, date_str, refresh=False):
+        """Analyze tick data for a specific date"""
+        print(f"\n[INFO] ANALYZING TICK DATA FOR {date_str}")
+        print("=" * 50)
+        
+        results = self.analyze(date_str, refresh)
+        for file_type in ("quotes", "depth", "ticks"):
+            rows = [row for row in results["files"] if row["type"] == file_type]
+            if not rows:
+                continue
+            print(f"\n[INFO] {file_type.upper()} DATA:")
+            print("-" * 20)
+            for row in rows:
+                if row["ticks"]:
+                    duration = row["last_ts"] - row["first_ts"]
+                    avg_frequency = row["ticks"] / duration if duration > 0 else 0
+                    print(f"  [INFO] {row['name']}")
+                    print(f"     [INFO] Ticks: {row['ticks']:,}")
+                    print(f"     [INFO] Size: {row['size']/1024/1024:.2f} MB")
+                    print(f"     [INFO] Time: {_clock(row['first_ts'])} - {_clock(row['last_ts'])}")
+                    print(f"     [INFO] Freq: {avg_frequency:.1f} ticks/sec")
+                    print()
         
+        total_ticks = results["total_ticks"]
+        total_size = results["total_size"]
         # Summary
         print("\n[INFO] SUMMARY:")
         print("-" * 15)
+        print(f"[INFO] Source: {results['source']} " +
+              (f"(cached in {self._cache_path(date_str)})" if results["cached"] else f"(computed in {results['seconds']:.2f}s)"))
         print(f"[INFO] Total ticks: {total_ticks:,}")
         print(f"[INFO] Total size: {total_size/1024/1024:.2f} MB")
-        print(f"[INFO] Total files: {len(files['quotes']) + len(files['depth'])}")
-        print(f"[INFO] Symbols: {', '.join(sorted(symbols_analyzed))}")
+        print(f"[INFO] Total files: {len(results['files'])}")
+        print(f"[INFO] Symbols: {', '.join(results.get('symbols', []))}")
         print(f"[INFO] Compression ratio: ~{(total_ticks * 200) / total_size:.1f}x" if total_size > 0 else "")
+        if not total_ticks:
+            return
+        
+        rate = results["rate"]
+        print("\n[INFO] TICKS/SEC:")
+        print("-" * 15)
+        print(f"[INFO] Mean {rate['mean']:.1f} | p50 {rate['p50']:.0f} | p90 {rate['p90']:.0f} | p99 {rate['p99']:.0f} | "
+              f"max {rate['max']:,} at {_clock(rate['max_at'])} | {rate['active_seconds']:,}/{rate['seconds']:,} seconds active")
+        _print_histogram(rate["histogram"], "{:g}")
+        
+        print("\n[INFO] INTER-ARRIVAL (ms):")
+        print("-" * 15)
+        for scope, gaps in results["inter_arrival_ms"].items():
+            if gaps:
+                print(f"[INFO] {scope:<8} " + " | ".join(f"{name} {value:.2f}" for name, value in gaps.items()))
+        
+        spread = results.get("spread")
+        if spread:
+            print("\n[INFO] SPREADS (best ask - best bid):")
+            print("-" * 15)
+            print(f"[INFO] {spread['ticks']:,} books | mean {spread['mean']:.2f} | p10 {spread['p10']:.2f} | "
+                  f"p50 {spread['p50']:.2f} | p90 {spread['p90']:.2f} | p99 {spread['p99']:.2f}")
+            for symbol, values in spread["by_symbol"].items():
+                print(f"  [INFO] {symbol}: p50 {values['p50']:.2f} | p90 {values['p90']:.2f} | p99 {values['p99']:.2f} "
+                      f"({values['ticks']:,} books)")
+            _print_histogram(spread["histogram"], "{:.2f}")
+        
+        strikes = results.get("strikes")
+        if strikes:
+            print("\n[INFO] MOST ACTIVE STRIKES:")
+            print("-" * 15)
+            for row in strikes[:15]:
+                spread_text = f" | median spread {row['median_spread']:.2f}" if row["median_spread"] is not None else ""
+                print(f"  [INFO] {row['symbol']} {row['strike']:g} {row['option_type']}: {row['ticks']:,} ticks"
+                      f"{spread_text} | {_clock(row['first_ts'])} - {_clock(row['last_ts'])}")
     
-    def compare_dates(self, date1, date2):
+    def compare_dates(self, date1, date2, refresh=False):
         """Compare tick data between two dates"""
         print(f"\n[INFO] COMPARING {date1} vs {date2}")
         print("=" * 40)
         
         for date_str in [date1, date2]:
-            files = self.reader.list_available_files(date_str)
-            date_path = os.path.join(self.base_directory, date_str)
-            
-            total_ticks = 0
-            total_size = 0
-            
-            for file_type in ["quotes", "depth"]:
-                for filename in files[file_type]:
-                    filepath = os.path.join(date_path, file_type, filename)
-                    if os.path.exists(filepath):
-                        total_size += os.path.getsize(filepath)
-                        for tick in self.reader.read_tick_file(filepath):
-                            total_ticks += 1
+            results = self.analyze(date_str, refresh)
             
             print(f"\n[INFO] {date_str}:")
-            print(f"   [INFO] Ticks: {total_ticks:,}")
-            print(f"   [INFO] Size: {total_size/1024/1024:.2f} MB")
-            print(f"   [INFO] Files: {len(files['quotes']) + len(files['depth'])}")
+            print(f"   [INFO] Ticks: {results['total_ticks']:,}")
+            print(f"   [INFO] Size: {results['total_size']/1024/1024:.2f} MB")
+            print(f"   [INFO] Files: {len(results['files'])}")
+            if results["total_ticks"]:
+                rate = results["rate"]
+                print(f"   [INFO] Ticks/sec: p50 {rate['p50']:.0f} | p99 {rate['p99']:.0f} | max {rate['max']:,}")
+                print(f"   [INFO] Inter-arrival p99: {results['inter_arrival_ms']['all'].get('p99', 0):.2f} ms")
+            if results.get("spread"):
+                print(f"   [INFO] Spread p50/p90: {results['spread']['p50']:.2f} / {results['spread']['p90']:.2f}")
     
-    def find_active_hours(self, date_str, symbol=None):
+    def find_active_hours(self, date_str, symbol=None, refresh=False):
         """Find the most active trading hours"""
         print(f"\n[INFO] FINDING ACTIVE HOURS FOR {date_str}")
         if symbol:
             print(f"[INFO] Symbol: {symbol}")
         print("=" * 40)
         
-        files = self.reader.list_available_files(date_str)
-        date_path = os.path.join(self.base_directory, date_str)
-        
         hourly_counts = {}
-        
-        # Process all files
-        for file_type in ["quotes", "depth"]:
-            for filename in files[file_type]:
-                if symbol and symbol not in filename:
-                    continue
-                    
-                filepath = os.path.join(date_path, file_type, filename)
-                
-                for tick in self.reader.read_tick_file(filepath):
-                    hour = datetime.fromtimestamp(tick['timestamp']).hour
-                    hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
+        for name, hours in self.analyze(date_str, refresh).get("hourly", {}).items():
+            if symbol and symbol not in name:
+                continue
+            for hour, count in hours.items():
+                hourly_counts[int(hour)] = hourly_counts.get(int(hour), 0) + count
         
         # Sort by hour and display
+        peak = max(hourly_counts.values()) if hourly_counts else 0
         for hour in sorted(hourly_counts.keys()):
             count = hourly_counts[hour]
-            bar_length = min(50, count // max(hourly_counts.values()) * 50) if hourly_counts.values() else 0
-            bar = "#" * int(bar_length)
+            bar = "#" * (count * 50 // peak)
             print(f"{hour:02d}:00 |{bar:<50}| {count:,} ticks")
 
+
+def _clock(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+
+
+def _print_histogram(histogram, label):
+    """Bars of a _histogram() result, skipping empty bins"""
+    edges, counts = histogram["edges"], histogram["counts"]
+    peak = max(counts) if counts else 0
+    for i, count in enumerate(counts):
+        if not count:
+            continue
+        upper = label.format(edges[i + 1]) if i + 1 < len(edges) else "+"
+        bar = "#" * max(1, count * 40 // peak)
+        print(f"  {label.format(edges[i]):>7} - {upper:<7} |{bar:<40}| {count:,}")
+
+
 import redis
 class TickDataSimulator:
-    """Simulate market data using saved tick files"""
+    """
+    Simulate market data using saved tick files
+    
+    With a ReplayClock shared with the strategies under test (strategy
+    classes take clock=...), the session is replayed as fast as it can be
+    read: the clock jumps to each tick's timestamp before the tick is
+    published, so the strategies' observation windows, sleeps and IOC
+    timeouts elapse in replayed time and speed_multiplier is ignored.
+
+    With a SimulatedExchange (the one the strategies' execution helpers use)
+    every replayed depth tick is matched against its resting simulated orders
+    before the strategies see it.
+
+    Ticks go to `target` (replay_targets): Redis by default, in pipelined
+    batches flushed before any strategy is woken, or a MarketCache the
+    strategies in this process read directly (market=...), skipping Redis.
+    """
     
-    def __init__(self, base_directory="tick_data"):
+    def __init__(self, base_directory="tick_data", clock=None, exchange=None, redis_client=None,
+                 target=None, option_mapper=None):
         self.reader = TickDataReader(base_directory)
-        self.r = redis.Redis(host='localhost', port=6379, db=0)
-        self.options_data = orjson.loads(self.r.get("option_mapper").decode())
+        self.clock = clock or WALL_CLOCK
+        self.exchange = exchange
+        # a backtest passes its own Redis instead of the live one
+        self.r = redis_client or redis.Redis(host='localhost', port=6379, db=0)
+        self.target = target if target is not None else RedisReplayTarget(self.r)
+        self.options_data = option_mapper if option_mapper is not None else orjson.loads(self.r.get("option_mapper").decode())
         
-    def simulate_market_session(self, date_str, symbol=None, speed_multiplier=1.0, start_hour=9, end_hour=16):
-        """Simulate a market session with saved tick data"""
+    def simulate_market_session(self, date_str, symbol=None, speed_multiplier=1.0, start_hour=9, end_hour=16,
+                                workers=None, warmup=0.0, on_warmup=None):
+        """
+        Simulate a market session with saved tick data (files decoded in `workers` processes when > 1)
+
+        on_warmup() is called once from the replay loop, before the first tick
+        more than `warmup` seconds into the session, so strategies built there
+        find the books of the opening minutes in Redis; the replay waits for it.
+        """
         print(f"\n[INFO] SIMULATING MARKET SESSION FOR {date_str}")
         if symbol:
             print(f"[INFO] Symbol: {symbol}")
-        print(f"[INFO] Speed: {speed_multiplier}x")
+        replay_clock = self.clock if isinstance(self.clock, ReplayClock) else None
+        print(f"[INFO] Speed: {'max (replay clock)' if replay_clock else f'{speed_multiplier}x'}")
         print(f"[INFO] Hours: {start_hour:02d}:00 - {end_hour:02d}:00")
         print("=" * 50)
         
@@ -189,16 +532,37 @@ class TickDataSimulator:
         tick_count = 0
         start_time = time.time()
         
+        if replay_clock:
+            # unpaced - the strategies wait on replayed time, not on this loop sleeping
+            replay_clock.set_time(start_timestamp)
+            ticks = self.reader.iter_ticks(date_str, symbol, int(start_hour), int(end_hour),
+                                           start_timestamp, end_timestamp, workers)
+        else:
+            ticks = self.reader.simulate_tick_replay(date_str, symbol, speed_multiplier, int(start_hour), int(end_hour),
+                                                     start_time=start_timestamp, end_time=end_timestamp,
+                                                     workers=workers)
+        
         try:
-            for tick in self.reader.simulate_tick_replay(date_str, symbol, speed_multiplier, int(start_hour), int(end_hour)):
+            for tick in ticks:
                 # Filter by time range
                 if tick['timestamp'] < start_timestamp or tick['timestamp'] > end_timestamp:
                     continue
                 
                 tick_count += 1
+                if on_warmup is not None and tick['timestamp'] >= start_timestamp + warmup:
+                    callback, on_warmup = on_warmup, None
+                    self.target.flush()
+                    callback()
+                if replay_clock:
+                    # timers due before this tick fire (and see the book as it was) before it is published
+                    if replay_clock.due(tick['timestamp']):
+                        self.target.flush()
+                    replay_clock.advance(tick['timestamp'])
                 
                 # Process the tick (you can customize this)
                 self._process_simulated_tick(tick)
+                if not replay_clock:
+                    self.target.flush()  # paced replay: every tick is visible as it is replayed
                 
                 # Print progress every 1000 ticks
                 if tick_count % 1000 == 0:
@@ -209,12 +573,23 @@ class TickDataSimulator:
         
         except KeyboardInterrupt:
             print(f"\n[INFO] Simulation stopped by user")
+        finally:
+            self.target.flush()
+            if replay_clock:
+                replay_clock.stop()  # release strategies still waiting on replayed time
         
         elapsed = time.time() - start_time
         print(f"\n[SUCCESS] Simulation completed")
         print(f"[INFO] Processed {tick_count:,} ticks in {elapsed:.1f} seconds")
+        if self.exchange is not None:
+            self.exchange.print_stats()
+        print(f"[INFO] Replay target: {self.target.get_stats()}")
         # print(f"[INFO] Average rate: {tick_count/elapsed:.0f} ticks/sec")
     
+    def _store_and_notify(self, redis_key, payload):
+        """Store the replayed tick and wake strategies waiting on the key, like the live feed"""
+        self.target.store(redis_key, payload, self.clock.time())
+
     def _process_simulated_tick(self, tick):
         """Process a simulated tick (customize this method)"""
         # This is where you would implement your trading logic
@@ -232,7 +607,7 @@ class TickDataSimulator:
                 response['response']['data']['symbol'] = symbol
                 
                 # Continue with original Redis storage
-                self.r.set(f"reduced_quotes:{symbol}", orjson.dumps(response).decode())
+                self._store_and_notify(f"reduced_quotes:{symbol}", response)
             except Exception as e:
                 print(f"Error processing response (callbackfun): {str(e)}")
         
@@ -265,8 +640,12 @@ class TickDataSimulator:
 
                 # Save tick data to files for simulation (high-performance, non-blocking)
 
+                # resting simulated orders trade against the tick before strategies react to it
+                if self.exchange is not None:
+                    self.exchange.on_depth(redis_key, response)
+
                 # Continue with original Redis storage
-                self.r.set(redis_key, orjson.dumps(response).decode())
+                self._store_and_notify(redis_key, response)
             except Exception as e:
                 print(f"Error processing response (DepthStreamerCallback): {str(e)}")
 
@@ -283,6 +662,13 @@ def main():
     parser.add_argument("--start-hour", type=int, default=9, help="Start hour for simulation")
     parser.add_argument("--end-hour", type=int, default=16, help="End hour for simulation")
     parser.add_argument("--base-dir", default="tick_data", help="Base directory for tick data")
+    parser.add_argument("--workers", type=int, default=None, help="Processes decoding tick files (analyze/compare/simulate)")
+    parser.add_argument("--source", choices=["auto", "files", "columnar"], default="auto",
+                        help="Analysis input: tick files, the .npz columnar archive, or the archive when it covers the files")
+    parser.add_argument("--refresh", action="store_true", help="Recompute the analysis instead of using the stats cache")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write {date}/stats/analysis.json")
+    parser.add_argument("--namespace", default="replay:",
+                        help="Key prefix for simulated ticks in Redis, so live keys are untouched ('' writes the live keys)")
     
     args = parser.parse_args()
     
@@ -300,31 +686,32 @@ def main():
         if not args.date:
             print("[ERROR] --date required for analyze command")
             return
-        analyzer = TickDataAnalyzer(args.base_dir)
-        analyzer.analyze_date(args.date)
+        analyzer = TickDataAnalyzer(args.base_dir, workers=args.workers, source=args.source, use_cache=not args.no_cache)
+        analyzer.analyze_date(args.date, refresh=args.refresh)
     
     elif args.command == "compare":
         if not args.date or not args.date2:
             print("[ERROR] --date and --date2 required for compare command")
             return
-        analyzer = TickDataAnalyzer(args.base_dir)
-        analyzer.compare_dates(args.date, args.date2)
+        analyzer = TickDataAnalyzer(args.base_dir, workers=args.workers, source=args.source, use_cache=not args.no_cache)
+        analyzer.compare_dates(args.date, args.date2, refresh=args.refresh)
     
     elif args.command == "hours":
         if not args.date:
             print("[ERROR] --date required for hours command")
             return
-        analyzer = TickDataAnalyzer(args.base_dir)
-        analyzer.find_active_hours(args.date, args.symbol)
+        analyzer = TickDataAnalyzer(args.base_dir, workers=args.workers, source=args.source, use_cache=not args.no_cache)
+        analyzer.find_active_hours(args.date, args.symbol, refresh=args.refresh)
     
     elif args.command == "simulate":
         if not args.date:
             print("[ERROR] --date required for simulate command")
             return
-        simulator = TickDataSimulator(args.base_dir)
+        r = redis.Redis(host='localhost', port=6379, db=0)
+        simulator = TickDataSimulator(args.base_dir, redis_client=r, target=RedisReplayTarget(r, namespace=args.namespace))
         simulator.simulate_market_session(
             args.date, args.symbol, args.speed, 
-            args.start_hour, args.end_hour
+            args.start_hour, args.end_hour, workers=args.workers
         )
 
 
@@ -0,0 +1,257 @@
+"""
+Tick Notifications
+Per-key update channel emitted by CentralSocketData and a strategy-side
+subscription so strategies block until one of their legs actually ticks
+"""
+
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import redis
+
+try:
+    from subscription_manager import publish_depth_lease, release_depth_lease
+except ImportError:
+    from .subscription_manager import publish_depth_lease, release_depth_lease
+
+try:
+    from clock import WALL_CLOCK
+except ImportError:
+    from .clock import WALL_CLOCK
+
+
+TICK_CHANNEL_PREFIX = "tick_updates:"
+LEASE_REFRESH_INTERVAL = 30.0
+
+
+def tick_channel(redis_key: str) -> str:
+    """Pub/sub channel carrying update notifications for a market data key"""
+    return f"{TICK_CHANNEL_PREFIX}{redis_key}"
+
+
+class TickSubscription:
+    """
+    Listens on the tick channels of a set of Redis market data keys
+
+    A single listener thread keeps a version counter per key; any number of
+    TickWaiter objects (one per observing loop) block on those counters.
+    The same thread leases the watched keys to the feed process so their
+    tokens stay subscribed while this strategy runs (see subscription_manager).
+    Waiter timeouts run on `clock` (replayed time in a backtest); the listener
+    and lease bookkeeping always use wall time.
+
+    With a replay target as `market` (see replay_targets) no lease is taken:
+    a MarketCache calls notify_tick() directly and there is no listener
+    thread, a RedisReplayTarget's namespaced channels are listened to instead.
+    """
+
+    def __init__(self, redis_client, keys: Iterable[str] = (), lease_owner: Optional[str] = None, clock=None,
+                 market=None):
+        self.r = redis_client
+        self.clock = clock or WALL_CLOCK
+        self.market = market
+        self.in_process = market is not None and hasattr(market, "attach")
+        self.channel_prefix = TICK_CHANNEL_PREFIX + getattr(market, "namespace", "")
+        self.lease_owner = lease_owner or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._lease_dirty = market is None  # replays have no feed to lease tokens from
+        self._lease_refreshed = 0.0
+        self.pubsub = None if self.in_process else self.r.pubsub(ignore_subscribe_messages=True)
+        self.condition = threading.Condition()
+        self.versions: Dict[str, int] = {}
+        self.last_tick_time: Dict[str, float] = {}
+        self.active_since: Dict[str, float] = {}
+        self.keys = set()
+
+        self._pending_subscribe = set()
+        self._pending_unsubscribe = set()
+        self._stopped = False
+        self._connected = False
+
+        self.subscribe(keys)
+        if self.in_process:
+            self.listener_thread = None
+            market.attach(self)
+        else:
+            self.listener_thread = threading.Thread(target=self._listen, daemon=True)
+            self.listener_thread.start()
+
+    def subscribe(self, keys: Iterable[str]):
+        """Start receiving notifications for keys (applied by the listener thread)"""
+        with self.condition:
+            for key in keys:
+                if key and key not in self.keys:
+                    self.keys.add(key)
+                    self._pending_unsubscribe.discard(key)
+                    if self.in_process:
+                        self.active_since[key] = time.time()  # notified from the next store on
+                    else:
+                        self._pending_subscribe.add(key)
+
+    def unsubscribe(self, keys: Iterable[str]):
+        """Stop receiving notifications for keys"""
+        with self.condition:
+            for key in keys:
+                if key in self.keys:
+                    self.keys.discard(key)
+                    self._pending_subscribe.discard(key)
+                    if self.in_process:
+                        self.active_since.pop(key, None)
+                    else:
+                        self._pending_unsubscribe.add(key)
+
+    def set_keys(self, keys: Iterable[str]):
+        """Replace the subscribed key set, only touching the difference"""
+        wanted = set(k for k in keys if k)
+        with self.condition:
+            current = set(self.keys)
+        self.unsubscribe(current - wanted)
+        self.subscribe(wanted - current)
+
+    def _refresh_lease(self):
+        """Re-publish the depth lease when keys changed or the refresh interval passed"""
+        if self.market is not None:
+            return
+        now = time.time()
+        if not self._lease_dirty and now - self._lease_refreshed < LEASE_REFRESH_INTERVAL:
+            return
+        with self.condition:
+            keys = list(self.keys)
+        try:
+            publish_depth_lease(self.r, self.lease_owner, keys)
+            self._lease_dirty = False
+            self._lease_refreshed = now
+        except redis.RedisError as e:
+            print(f"ERROR: failed to refresh depth lease {self.lease_owner}: {e}")
+            self._lease_refreshed = now
+
+    def _apply_pending(self):
+        with self.condition:
+            to_subscribe = list(self._pending_subscribe)
+            to_unsubscribe = list(self._pending_unsubscribe)
+            self._pending_subscribe.clear()
+            self._pending_unsubscribe.clear()
+        if to_subscribe or to_unsubscribe:
+            self._lease_dirty = self.market is None
+        if to_subscribe:
+            self.pubsub.subscribe(*[self.channel_prefix + k for k in to_subscribe])
+            now = time.time()
+            with self.condition:
+                for key in to_subscribe:
+                    if key in self.keys:
+                        self.active_since[key] = now
+        if to_unsubscribe:
+            with self.condition:
+                for key in to_unsubscribe:
+                    self.active_since.pop(key, None)
+            self.pubsub.unsubscribe(*[self.channel_prefix + k for k in to_unsubscribe])
+
+    def notify_tick(self, key: str):
+        """Record an update of key and wake its waiters"""
+        with self.condition:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.last_tick_time[key] = time.time()
+            self.condition.notify_all()
+
+    def _listen(self):
+        prefix_len = len(self.channel_prefix)
+        while not self._stopped:
+            try:
+                self._apply_pending()
+                self._refresh_lease()
+                if not self.pubsub.subscribed:
+                    time.sleep(0.1)
+                    continue
+                self._connected = True
+                message = self.pubsub.get_message(timeout=0.5)
+                if not message or message.get("type") != "message":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                self.notify_tick(channel[prefix_len:])
+            except redis.RedisError as e:
+                print(f"ERROR: tick subscription lost redis connection: {e}")
+                self._connected = False
+                with self.condition:
+                    # Resubscribe everything once the connection comes back
+                    self.active_since.clear()
+                    self._pending_subscribe |= self.keys
+                    self.condition.notify_all()
+                time.sleep(1)
+            except Exception as e:
+                print(f"ERROR: tick subscription listener error: {e}")
+                time.sleep(0.1)
+
+    def is_alive(self) -> bool:
+        """True while notifications can be trusted to reflect every key update"""
+        if self.in_process:
+            return not self._stopped
+        return self._connected and not self._stopped and self.listener_thread.is_alive()
+
+    def version(self, key: str) -> int:
+        return self.versions.get(key, 0)
+
+    def watched_since(self, key: str) -> Optional[float]:
+        """Time from which every update of key is guaranteed to bump its version (None if not watched)"""
+        if not self.is_alive():
+            return None
+        return self.active_since.get(key)
+
+    def waiter(self, keys: Iterable[str]) -> "TickWaiter":
+        """Create a waiter for a subset of keys, starting from their current versions"""
+        keys = [k for k in keys if k]
+        self.subscribe(keys)
+        return TickWaiter(self, keys)
+
+    def close(self):
+        self._stopped = True
+        with self.condition:
+            self.condition.notify_all()
+        if self.in_process:
+            self.market.detach(self)
+            return
+        try:
+            self.pubsub.close()
+        except Exception:
+            pass
+        if self.market is not None:
+            return
+        try:
+            release_depth_lease(self.r, self.lease_owner)
+        except Exception as e:
+            print(f"ERROR: failed to release depth lease {self.lease_owner}: {e}")
+
+
+class TickWaiter:
+    """Blocks one loop until any of its keys ticks, remembering what it has already seen"""
+
+    def __init__(self, subscription: TickSubscription, keys):
+        self.subscription = subscription
+        self.keys = list(keys)
+        with subscription.condition:
+            self.seen = {k: subscription.versions.get(k, 0) for k in self.keys}
+
+    def _changed(self):
+        versions = self.subscription.versions
+        return [k for k in self.keys if versions.get(k, 0) != self.seen[k]]
+
+    def wait(self, timeout: Optional[float] = None) -> list:
+        """
+        Wait until a key ticks or the timeout expires
+
+        Returns:
+            List of keys that ticked since the previous wait (empty on timeout)
+        """
+        condition = self.subscription.condition
+        with condition:
+            changed = self._changed()
+            if not changed and not self.subscription._stopped:
+                self.subscription.clock.wait_for(
+                    condition, lambda: self._changed() or self.subscription._stopped, timeout)
+                changed = self._changed()
+            for key in changed:
+                self.seen[key] = self.subscription.versions.get(key, 0)
+        return changed
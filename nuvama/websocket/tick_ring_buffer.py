@@ -0,0 +1,79 @@
+"""
+Tick Capture Ring Buffer
+Preallocated single-producer/single-consumer ring used to hand ticks from the
+feed callback thread to the TickDataManager worker without locks
+"""
+
+from typing import Any, List
+
+
+class SpscRingBuffer:
+    """
+    Bounded SPSC ring of object slots
+
+    Exactly one thread may call push() (the feed callback thread) and exactly
+    one thread may call drain() (the tick worker). Each index is written by one
+    side only and published after the slot store, so under the GIL the pair
+    needs no lock: push is a slot store plus an int store, and a full ring
+    drops the new item and counts it instead of blocking the feed.
+    """
+
+    def __init__(self, capacity: int = 131072):
+        # power of two so the slot index is a mask instead of a modulo
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self.mask = size - 1
+        self.slots: List[Any] = [None] * size
+
+        # producer-owned
+        self.head = 0
+        self.dropped = 0
+        # consumer-owned
+        self.tail = 0
+        self.high_watermark = 0
+
+    def push(self, item) -> bool:
+        """Producer side: False (and a counted drop) when the ring is full"""
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        self.slots[head & self.mask] = item
+        self.head = head + 1  # publish after the slot is filled
+        return True
+
+    def drain(self, max_items: int = 4096) -> list:
+        """Consumer side: take up to max_items in arrival order"""
+        tail = self.tail
+        available = self.head - tail
+        if available <= 0:
+            return []
+        if available > self.high_watermark:
+            self.high_watermark = available
+        count = min(available, max_items)
+        slots = self.slots
+        mask = self.mask
+        items = []
+        for index in range(tail, tail + count):
+            slot = index & mask
+            items.append(slots[slot])
+            slots[slot] = None  # release the payload for GC
+        self.tail = tail + count  # free the slots only after they were read
+        return items
+
+    def __len__(self):
+        return max(0, self.head - self.tail)
+
+    def snapshot(self) -> dict:
+        """Counters read once each, so size/pushed/consumed agree with each other"""
+        head, tail = self.head, self.tail
+        return {
+            "capacity": self.capacity,
+            "size": max(0, head - tail),
+            "pushed": head,
+            "consumed": tail,
+            "dropped": self.dropped,
+            "high_watermark": self.high_watermark,
+        }